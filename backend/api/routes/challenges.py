@@ -1,55 +1,118 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from fastapi.responses import JSONResponse
-from typing import Optional
+from typing import List, Optional
+from config import settings
 from models.challenge import (
     Challenge, ChallengeCreate, ChallengeUpdate, ChallengeFilters, 
-    ChallengeList, DifficultyLevel, ChallengeCategory
+    ChallengeList, DifficultyLevel, ChallengeCategory, SUMMARY_FIELDS
 )
 from services.challenge_service import ChallengeService
+from utils.pagination import InvalidCursor
+from utils.http_cache import conditional_response, make_etag
+from utils.responses import model_response
 
 router = APIRouter()
 
-def get_challenge_service() -> ChallengeService:
-    return ChallengeService()
+def get_challenge_service(request: Request) -> ChallengeService:
+    return ChallengeService(request.app.state.db, request.app.state.challenge_catalog)
 
-@router.get("/challenges", response_model=ChallengeList)
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated ?fields= value, rejecting unknown names"""
+    if not fields:
+        return None
+    
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in Challenge.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+async def catalog_cache_check(
+    request: Request,
+    response: Response,
+    service: ChallengeService,
+    private: bool = False
+) -> Optional[Response]:
+    """Validate a catalog read against the catalog version, before doing the work
+    
+    The ETag covers the path and query, so every listing, page and field
+    selection is cached separately. Returns a 304 response when the
+    client's copy is still current. Without a catalog version there is
+    nothing to validate against, so no ETag is sent. ``private`` keeps
+    full challenges (with their test scripts) out of shared caches.
+    """
+    version, updated_at = await service.get_catalog_version()
+    etag = None
+    if version is not None:
+        etag = make_etag(version, request.url.path, sorted(request.query_params.multi_items()))
+    return conditional_response(request, response, etag, updated_at, settings.HTTP_CACHE_MAX_AGE, private)
+
+def static_cache_check(request: Request, response: Response, content) -> Optional[Response]:
+    """Validate a response that only changes on deploy"""
+    etag = make_etag(content)
+    return conditional_response(request, response, etag, None, settings.HTTP_CACHE_STATIC_MAX_AGE)
+
+@router.get("/challenges", response_model=ChallengeList, response_model_exclude_unset=True)
 async def get_challenges(
+    request: Request,
+    response: Response,
     difficulty: Optional[DifficultyLevel] = Query(None, description="Filter by difficulty"),
     category: Optional[ChallengeCategory] = Query(None, description="Filter by category"),
     is_premium: Optional[bool] = Query(None, description="Filter by premium status"),
-    search: Optional[str] = Query(None, description="Search in challenge titles"),
+    search: Optional[str] = Query(None, description="Search challenge titles and descriptions (ranked, prefix matching)"),
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(10, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page"),
     user_is_pro: bool = Query(False, description="User has pro access"),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated challenge fields to return (default: summary fields)"
+    ),
     service: ChallengeService = Depends(get_challenge_service)
 ):
     """Get challenges with filtering and pagination"""
+    selected_fields = parse_fields(fields)
     filters = ChallengeFilters(
         difficulty=difficulty,
         category=category,
         is_premium=is_premium,
         search=search,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        cursor=cursor
     )
     
     try:
-        result = await service.get_challenges(filters, user_is_pro)
-        return result
+        # Summaries may be shared; other fields are only for the client itself
+        private = selected_fields is not None and not set(selected_fields) <= set(SUMMARY_FIELDS)
+        not_modified = await catalog_cache_check(request, response, service, private)
+        if not_modified:
+            return not_modified
+        result = await service.get_challenges(filters, user_is_pro, selected_fields)
+        # Only the fields each listing asked for are serialized
+        return model_response(result, response, exclude_unset=True)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch challenges: {str(e)}")
 
 @router.get("/challenges/{challenge_id}", response_model=Challenge)
 async def get_challenge(
     challenge_id: str,
+    request: Request,
+    response: Response,
     service: ChallengeService = Depends(get_challenge_service)
 ):
     """Get a specific challenge by ID"""
     try:
+        # Looked up first: If-None-Match: * or an If-Modified-Since date would
+        # otherwise answer 304 for an id that does not exist
         challenge = await service.get_challenge_by_id(challenge_id)
         if not challenge:
             raise HTTPException(status_code=404, detail="Challenge not found")
-        return challenge
+        not_modified = await catalog_cache_check(request, response, service, private=True)
+        if not_modified:
+            return not_modified
+        return model_response(challenge, response)
     except HTTPException:
         raise
     except Exception as e:
@@ -105,21 +168,28 @@ async def delete_challenge(
 
 @router.get("/challenges-stats")
 async def get_challenge_statistics(
+    request: Request,
+    response: Response,
     service: ChallengeService = Depends(get_challenge_service)
 ):
     """Get challenge statistics"""
     try:
+        not_modified = await catalog_cache_check(request, response, service)
+        if not_modified:
+            return not_modified
         stats = await service.get_challenge_statistics()
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch statistics: {str(e)}")
 
 @router.get("/categories")
-async def get_categories():
+async def get_categories(request: Request, response: Response):
     """Get all available challenge categories"""
-    return [{"value": cat.value, "label": cat.value.title()} for cat in ChallengeCategory]
+    categories = [{"value": cat.value, "label": cat.value.title()} for cat in ChallengeCategory]
+    return static_cache_check(request, response, categories) or categories
 
 @router.get("/difficulties")
-async def get_difficulties():
+async def get_difficulties(request: Request, response: Response):
     """Get all available difficulty levels"""
-    return [{"value": diff.value, "label": diff.value.title()} for diff in DifficultyLevel]
\ No newline at end of file
+    difficulties = [{"value": diff.value, "label": diff.value.title()} for diff in DifficultyLevel]
+    return static_cache_check(request, response, difficulties) or difficulties
\ No newline at end of file
@@ -1,28 +1,224 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
-from models.submission import CodeExecutionRequest, CodeExecutionResponse
-from utils.sandbox_runner import DartCodeRunner
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, Optional
+from models.submission import CodeExecutionRequest, CodeExecutionResponse, ExecutionJobResponse
+from utils.execution_scheduler import ExecutionScheduler, ExecutionJob, ExecutionQueueFull
+from utils.output_stream import OutputStream
+from utils.auth import Caller, get_caller
+from utils.rate_limit import EXECUTE_REQUESTS, EXECUTION_SECONDS, client_key, execution_charge, limit_requests
+from api.routes.challenges import get_challenge_service
 from datetime import datetime
 
 router = APIRouter()
 
+def get_execution_scheduler(request: Request) -> ExecutionScheduler:
+    """Return the app-scoped execution scheduler created at startup"""
+    scheduler = getattr(request.app.state, "execution_scheduler", None)
+    if scheduler is None:
+        raise HTTPException(status_code=503, detail="Code execution is unavailable")
+    return scheduler
+
+async def _cancel_on_disconnect(request: Request, coro):
+    """Await coro, cancelling it if the client goes away first"""
+    task = asyncio.ensure_future(coro)
+    
+    async def watch_disconnect():
+        # The body is already read, so the next message is the disconnect
+        while True:
+            message = await request.receive()
+            if message["type"] == "http.disconnect":
+                task.cancel()
+                return
+    
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        return await task
+    finally:
+        watcher.cancel()
+
+async def _resolve_tests(request: CodeExecutionRequest, http_request: Request) -> Optional[str]:
+    """Return the test script to run: the challenge's, or the one sent with the code"""
+    if not request.challenge_id:
+        return request.test_script
+    
+    service = get_challenge_service(http_request)
+    challenge = await service.get_challenge_by_id(request.challenge_id)
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Challenge not found")
+    return challenge.test_script
+
+async def _limit_executions(http_request: Request, caller: Caller) -> Dict[str, str]:
+    """Take an execute call for the client, who also needs a second of sandbox time left"""
+    return await limit_requests(
+        http_request, [EXECUTION_SECONDS, EXECUTE_REQUESTS], caller.user_id, caller.is_pro
+    )
+
+def _queue_full(e: ExecutionQueueFull) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many executions in progress, try again later",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def _execution_response(result: Dict, debug: bool = False) -> CodeExecutionResponse:
+    return CodeExecutionResponse(
+        success=result["success"],
+        output=result["output"],
+        errors=result.get("errors"),
+        execution_time=result["execution_time"],
+        cached=result.get("cached", False),
+        test_results=result.get("test_results"),
+        diagnostics=result.get("diagnostics"),
+        phases=result.get("phases") if debug else None,
+        timestamp=datetime.utcnow()
+    )
+
+def _sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _job_response(job: ExecutionJob) -> ExecutionJobResponse:
+    return ExecutionJobResponse(
+        id=job.id,
+        status=job.status,
+        result=_execution_response(job.result) if job.result else None,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
 @router.post("/execute", response_model=CodeExecutionResponse)
-async def execute_code(request: CodeExecutionRequest):
+async def execute_code(
+    request: CodeExecutionRequest,
+    http_request: Request,
+    response: Response,
+    debug: bool = Query(False, description="Include per-phase timings in the response"),
+    no_cache: bool = Query(False, description="Run the code even if a cached result exists"),
+    scheduler: ExecutionScheduler = Depends(get_execution_scheduler),
+    caller: Caller = Depends(get_caller)
+):
     """Execute Dart/Flutter code in a secure sandbox environment"""
+    response.headers.update(await _limit_executions(http_request, caller))
+    test_script = await _resolve_tests(request, http_request)
     try:
-        runner = DartCodeRunner()
-        result = await runner.run_code(request.code, request.test_script)
-        
-        return CodeExecutionResponse(
-            success=result["success"],
-            output=result["output"],
-            errors=result.get("errors"),
-            execution_time=result["execution_time"],
-            timestamp=datetime.utcnow()
+        result = await _cancel_on_disconnect(
+            http_request,
+            scheduler.run(
+                request.code, test_script, is_pro=caller.is_pro,
+                charge=execution_charge(http_request, caller.user_id, caller.is_pro),
+                use_cache=not no_cache
+            )
         )
+        
+        return _execution_response(result, debug)
+    
+    except ExecutionQueueFull as e:
+        raise _queue_full(e)
+    
+    except asyncio.CancelledError:
+        raise HTTPException(status_code=499, detail="Client disconnected")
     
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Code execution failed: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/execute/stream")
+async def execute_code_stream(
+    request: CodeExecutionRequest,
+    http_request: Request,
+    debug: bool = Query(False, description="Include per-phase timings in the result event"),
+    no_cache: bool = Query(False, description="Run the code even if a cached result exists"),
+    scheduler: ExecutionScheduler = Depends(get_execution_scheduler),
+    caller: Caller = Depends(get_caller)
+):
+    """Execute code and stream its output as server-sent events
+    
+    Emits ``stdout``/``stderr`` events while the program runs and a final
+    ``result`` event carrying the CodeExecutionResponse summary.
+    """
+    rate_limit_headers = await _limit_executions(http_request, caller)
+    test_script = await _resolve_tests(request, http_request)
+    output = OutputStream()
+    try:
+        job = await scheduler.submit(
+            request.code, test_script, is_pro=caller.is_pro, output=output,
+            charge=execution_charge(http_request, caller.user_id, caller.is_pro),
+            use_cache=not no_cache,
+            owner=client_key(http_request, caller.user_id)
+        )
+    except ExecutionQueueFull as e:
+        raise _queue_full(e)
+    
+    async def events():
+        waiter = asyncio.ensure_future(scheduler.wait(job))
+        try:
+            async for stream, text in output.iter_until(waiter):
+                yield _sse_event(stream, {"text": text})
+            
+            result = await waiter
+            if result.get("cached") or result.get("diagnostics"):
+                # Nothing ran, so replay the stored output
+                if result["output"]:
+                    yield _sse_event("stdout", {"text": result["output"]})
+                if result.get("errors"):
+                    yield _sse_event("stderr", {"text": result["errors"]})
+            
+            yield _sse_event("result", _execution_response(result, debug).model_dump(mode="json"))
+        
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"Code execution failed: {str(e)}"})
+        
+        finally:
+            # Runs on client disconnect too, which cancels the execution
+            output.close()
+            waiter.cancel()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **rate_limit_headers}
+    )
+
+@router.post("/execute/jobs", response_model=ExecutionJobResponse, status_code=202)
+async def submit_execution_job(
+    request: CodeExecutionRequest,
+    http_request: Request,
+    response: Response,
+    no_cache: bool = Query(False, description="Run the code even if a cached result exists"),
+    scheduler: ExecutionScheduler = Depends(get_execution_scheduler),
+    caller: Caller = Depends(get_caller)
+):
+    """Queue code for execution and return a job to poll"""
+    response.headers.update(await _limit_executions(http_request, caller))
+    test_script = await _resolve_tests(request, http_request)
+    try:
+        job = await scheduler.submit(
+            request.code, test_script, is_pro=caller.is_pro,
+            charge=execution_charge(http_request, caller.user_id, caller.is_pro),
+            use_cache=not no_cache,
+            owner=client_key(http_request, caller.user_id)
+        )
+        return _job_response(job)
+    except ExecutionQueueFull as e:
+        raise _queue_full(e)
+
+@router.get("/execute/jobs/{job_id}", response_model=ExecutionJobResponse)
+async def get_execution_job(
+    job_id: str,
+    http_request: Request,
+    scheduler: ExecutionScheduler = Depends(get_execution_scheduler),
+    caller: Caller = Depends(get_caller)
+):
+    """Get the status and, once finished, the result of an execution job
+    
+    Only the user (or, without an access token, the address) that
+    submitted the job can see it; anyone else gets a 404.
+    """
+    job = scheduler.get_job(job_id, client_key(http_request, caller.user_id))
+    if not job:
+        raise HTTPException(status_code=404, detail="Execution job not found")
+    return _job_response(job)
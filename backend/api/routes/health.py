@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 from datetime import datetime
 
@@ -15,4 +15,20 @@ async def health_check():
             "service": "fluence-api",
             "version": "1.0.0"
         }
-    )
\ No newline at end of file
+    )
+
+@router.get("/health/sandbox")
+async def sandbox_health(request: Request):
+    """State of each Docker host that runs code; 503 when none can take runs"""
+    runner = request.app.state.code_runner
+    hosts = runner.fleet.status() if runner is not None else []
+    available = any(host["healthy"] and not host["draining"] for host in hosts)
+    return JSONResponse(
+        status_code=200 if available else 503,
+        content={
+            "status": "healthy" if available else "unavailable",
+            "timestamp": datetime.utcnow().isoformat(),
+            "placement": runner.fleet.placement if runner is not None else None,
+            "hosts": hosts
+        }
+    )
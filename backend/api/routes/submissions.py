@@ -1,12 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Query, Response
 from typing import List, Optional
-from models.submission import Submission, SubmissionCreate
+from models.submission import ChallengeProgress, Submission, SubmissionCreate, SubmissionPage, SubmissionStats
 from services.submission_service import SubmissionService
+from services.submission_buffer import SubmissionBufferFull
+from utils.pagination import InvalidCursor
+from utils.responses import model_response, stream_models
+from utils.auth import Caller, get_caller
+from utils.rate_limit import SUBMISSIONS, limit_requests
 
 router = APIRouter()
 
-def get_submission_service() -> SubmissionService:
-    return SubmissionService()
+def get_submission_service(request: Request) -> SubmissionService:
+    return SubmissionService(request.app.state.db, request.app.state.submission_buffer)
 
 # For now, we'll use a simple header-based auth (in production, use proper JWT)
 def get_current_user_id(x_user_id: str = Header(...)) -> str:
@@ -16,26 +21,47 @@ def get_current_user_id(x_user_id: str = Header(...)) -> str:
 @router.post("/submissions", response_model=Submission)
 async def create_submission(
     submission: SubmissionCreate,
+    request: Request,
+    response: Response,
     user_id: str = Depends(get_current_user_id),
-    service: SubmissionService = Depends(get_submission_service)
+    service: SubmissionService = Depends(get_submission_service),
+    caller: Caller = Depends(get_caller)
 ):
-    """Create a new code submission"""
+    """Create a new code submission
+    
+    Answers 202 Accepted when the submission was queued to be saved in the
+    next batch rather than written straight away.
+    """
+    response.headers.update(await limit_requests(request, [SUBMISSIONS], caller.user_id, caller.is_pro))
     try:
         result = await service.create_submission(submission, user_id)
+        if service.buffer:
+            response.status_code = 202
         return result
+    except SubmissionBufferFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many submissions in progress, try again later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create submission: {str(e)}")
 
-@router.get("/submissions", response_model=List[Submission])
+@router.get("/submissions", response_model=SubmissionPage)
 async def get_user_submissions(
     challenge_id: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page"),
+    limit: int = Query(20, ge=1, le=100, description="Submissions per page"),
+    include_code: bool = Query(False, description="Include each submission's code"),
     user_id: str = Depends(get_current_user_id),
     service: SubmissionService = Depends(get_submission_service)
 ):
-    """Get submissions for the current user"""
+    """Get submissions for the current user, newest first"""
     try:
-        submissions = await service.get_user_submissions(user_id, challenge_id)
-        return submissions
+        page = await service.get_user_submissions(user_id, challenge_id, cursor, limit, include_code)
+        return model_response(page)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch submissions: {str(e)}")
 
@@ -48,21 +74,31 @@ async def get_latest_submission(
     """Get the latest submission for a challenge"""
     try:
         submission = await service.get_latest_submission(user_id, challenge_id)
-        return submission
+        return model_response(submission)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch submission: {str(e)}")
 
-@router.get("/submissions/stats")
+@router.get("/submissions/stats", response_model=SubmissionStats)
 async def get_submission_stats(
     user_id: str = Depends(get_current_user_id),
     service: SubmissionService = Depends(get_submission_service)
 ):
     """Get submission statistics for the current user"""
     try:
-        successful_count = await service.get_successful_submissions_count(user_id)
-        return {
-            "successful_submissions": successful_count,
-            "user_id": user_id
-        }
+        stats = await service.get_user_stats(user_id)
+        return model_response(stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch stats: {str(e)}")
+
+@router.get("/submissions/progress", response_model=List[ChallengeProgress])
+async def get_challenge_progress(
+    user_id: str = Depends(get_current_user_id),
+    service: SubmissionService = Depends(get_submission_service)
+):
+    """Get attempts and solve times for every challenge the current user has tried"""
+    try:
+        progress = await service.get_challenge_progress(user_id)
+        # One row per challenge ever attempted, so this can grow long
+        return stream_models(progress)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch stats: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to fetch progress: {str(e)}")
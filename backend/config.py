@@ -13,10 +13,98 @@ class Settings:
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_ANON_KEY: str = os.getenv("SUPABASE_ANON_KEY", "")
     SUPABASE_SERVICE_ROLE_KEY: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
+    # PostgREST endpoint; override to point at a bare PostgREST (e.g. benchmarks/)
+    SUPABASE_REST_URL: str = os.getenv("SUPABASE_REST_URL") or f"{SUPABASE_URL}/rest/v1"
+    # Secret Supabase signs access tokens with; without it no caller is authenticated
+    SUPABASE_JWT_SECRET: str = os.getenv("SUPABASE_JWT_SECRET", "")
+    
+    # Database HTTP connection pool
+    DB_MAX_CONNECTIONS: int = int(os.getenv("DB_MAX_CONNECTIONS", "50"))
+    DB_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("DB_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    DB_KEEPALIVE_EXPIRY: float = float(os.getenv("DB_KEEPALIVE_EXPIRY", "60"))
+    DB_TIMEOUT: float = float(os.getenv("DB_TIMEOUT", "10"))
+    DB_QUERY_TIMEOUT: float = float(os.getenv("DB_QUERY_TIMEOUT", "5"))
+    
+    # In-memory challenge catalog (seconds between version checks, full reload interval)
+    CATALOG_CACHE_ENABLED: bool = os.getenv("CATALOG_CACHE_ENABLED", "True").lower() == "true"
+    CATALOG_CHECK_INTERVAL: float = float(os.getenv("CATALOG_CHECK_INTERVAL", "5"))
+    CATALOG_TTL: float = float(os.getenv("CATALOG_TTL", "300"))
+    
+    # HTTP caching of read-only catalog responses (Cache-Control max-age in seconds)
+    HTTP_CACHE_MAX_AGE: int = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+    HTTP_CACHE_STATIC_MAX_AGE: int = int(os.getenv("HTTP_CACHE_STATIC_MAX_AGE", "86400"))
+    
+    # Write-behind submission buffer
+    SUBMISSION_BUFFER_ENABLED: bool = os.getenv("SUBMISSION_BUFFER_ENABLED", "True").lower() == "true"
+    SUBMISSION_BATCH_SIZE: int = int(os.getenv("SUBMISSION_BATCH_SIZE", "200"))
+    SUBMISSION_FLUSH_INTERVAL: float = float(os.getenv("SUBMISSION_FLUSH_INTERVAL", "0.5"))
+    SUBMISSION_BUFFER_MAX_PENDING: int = int(os.getenv("SUBMISSION_BUFFER_MAX_PENDING", "10000"))
+    SUBMISSION_ENQUEUE_TIMEOUT: float = float(os.getenv("SUBMISSION_ENQUEUE_TIMEOUT", "2"))
     
     # Code execution
     EXECUTION_TIMEOUT: int = int(os.getenv("EXECUTION_TIMEOUT", "30"))
     MAX_MEMORY_MB: int = int(os.getenv("MAX_MEMORY_MB", "128"))
+    MAX_OUTPUT_BYTES: int = int(os.getenv("MAX_OUTPUT_BYTES", str(1024 * 1024)))
+    STREAM_MAX_PENDING_CHUNKS: int = int(os.getenv("STREAM_MAX_PENDING_CHUNKS", "64"))
+    TEST_MAX_SHARDS: int = int(os.getenv("TEST_MAX_SHARDS", "4"))
+    
+    # Pre-flight static analysis
+    ANALYSIS_ENABLED: bool = os.getenv("ANALYSIS_ENABLED", "True").lower() == "true"
+    ANALYSIS_TIMEOUT: float = float(os.getenv("ANALYSIS_TIMEOUT", "2"))
+    ANALYSIS_STARTUP_TIMEOUT: float = float(os.getenv("ANALYSIS_STARTUP_TIMEOUT", "60"))
+    ANALYSIS_MEMORY_MB: int = int(os.getenv("ANALYSIS_MEMORY_MB", "1024"))
+    
+    # Docker
+    DOCKER_MAX_POOL_SIZE: int = int(os.getenv("DOCKER_MAX_POOL_SIZE", "32"))
+    SANDBOX_EXECUTOR_WORKERS: int = int(os.getenv("SANDBOX_EXECUTOR_WORKERS", "32"))
+
+    # Sandbox hosts (comma-separated [name=]url: local, unix://..., tcp://host:2376; empty for the local daemon)
+    DOCKER_HOSTS: str = os.getenv("DOCKER_HOSTS", "")
+    # least_loaded or consistent_hash
+    DOCKER_PLACEMENT: str = os.getenv("DOCKER_PLACEMENT", "least_loaded")
+    # Hosts that take no new runs (names from DOCKER_HOSTS)
+    DOCKER_DRAINED_HOSTS: str = os.getenv("DOCKER_DRAINED_HOSTS", "")
+    DOCKER_HEALTH_CHECK_INTERVAL: float = float(os.getenv("DOCKER_HEALTH_CHECK_INTERVAL", "10"))
+    DOCKER_HEALTH_CHECK_TIMEOUT: float = float(os.getenv("DOCKER_HEALTH_CHECK_TIMEOUT", "3"))
+    # Directory with ca.pem, cert.pem and key.pem for tcp:// hosts
+    DOCKER_TLS_CERT_PATH: str = os.getenv("DOCKER_TLS_CERT_PATH", "")
+
+    # Warm sandbox container pool
+    SANDBOX_POOL_MIN_SIZE: int = int(os.getenv("SANDBOX_POOL_MIN_SIZE", "2"))
+    SANDBOX_POOL_MAX_SIZE: int = int(os.getenv("SANDBOX_POOL_MAX_SIZE", "8"))
+    SANDBOX_POOL_MAX_RUNS: int = int(os.getenv("SANDBOX_POOL_MAX_RUNS", "50"))
+    SANDBOX_POOL_ACQUIRE_TIMEOUT: float = float(os.getenv("SANDBOX_POOL_ACQUIRE_TIMEOUT", "10"))
+    
+    # Execution queue
+    EXECUTION_CONCURRENCY: int = int(os.getenv("EXECUTION_CONCURRENCY", "8"))
+    EXECUTION_QUEUE_MAX_DEPTH: int = int(os.getenv("EXECUTION_QUEUE_MAX_DEPTH", "100"))
+    EXECUTION_JOB_TTL: int = int(os.getenv("EXECUTION_JOB_TTL", "300"))
+    
+    # Execution result cache
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "True").lower() == "true"
+    RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000"))
+    RESULT_CACHE_MAX_BYTES: int = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    RESULT_CACHE_TTL: int = int(os.getenv("RESULT_CACHE_TTL", "3600"))
+    
+    # Shared state across workers (optional)
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+
+    # Pro status of authenticated users (seconds it is cached, users cached)
+    PROFILE_CACHE_TTL: float = float(os.getenv("PROFILE_CACHE_TTL", "60"))
+    PROFILE_CACHE_MAX_ENTRIES: int = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "10000"))
+
+    # Per-client rate limits (token buckets refilled over RATE_LIMIT_WINDOW seconds;
+    # execute calls, seconds of sandbox time and submissions, times the multiplier for pro users)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    RATE_LIMIT_WINDOW: float = float(os.getenv("RATE_LIMIT_WINDOW", "60"))
+    RATE_LIMIT_EXECUTE_REQUESTS: float = float(os.getenv("RATE_LIMIT_EXECUTE_REQUESTS", "30"))
+    RATE_LIMIT_EXECUTION_SECONDS: float = float(os.getenv("RATE_LIMIT_EXECUTION_SECONDS", "60"))
+    RATE_LIMIT_SUBMISSIONS: float = float(os.getenv("RATE_LIMIT_SUBMISSIONS", "20"))
+    RATE_LIMIT_PRO_MULTIPLIER: float = float(os.getenv("RATE_LIMIT_PRO_MULTIPLIER", "3"))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+    # Prometheus metrics at /metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
     
     # CORS
     ALLOWED_ORIGINS: list = [
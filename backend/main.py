@@ -1,16 +1,86 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
 from config import settings
-from api.routes import health, execute_code, challenges, submissions
+from api.routes import health, execute_code, challenges, submissions, metrics
+from utils.sandbox_runner import DartCodeRunner
+from utils.execution_scheduler import ExecutionScheduler
+from utils.result_cache import ResultCache
+from utils.rate_limit import RateLimiter
+from utils.dart_analyzer import DartAnalysisService
+from services.database import create_database_client
+from services.challenge_catalog import ChallengeCatalog
+from services.submission_buffer import SubmissionBuffer
+from services.user_profiles import UserProfiles
+from utils.metrics import track_app_state, track_request_latency
+from utils.responses import DEFAULT_RESPONSE_CLASS
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create process-wide resources on startup and release them on shutdown"""
+    app.state.db = create_database_client()
+    app.state.challenge_catalog = (
+        ChallengeCatalog(app.state.db) if settings.CATALOG_CACHE_ENABLED else None
+    )
+    app.state.submission_buffer = None
+    if settings.SUBMISSION_BUFFER_ENABLED:
+        app.state.submission_buffer = SubmissionBuffer(app.state.db)
+        await app.state.submission_buffer.start()
+    app.state.user_profiles = UserProfiles(app.state.db)
+    app.state.rate_limiter = RateLimiter() if settings.RATE_LIMIT_ENABLED else None
+    app.state.code_runner = None
+    app.state.execution_scheduler = None
+    analyzer = None
+    result_cache = ResultCache() if settings.RESULT_CACHE_ENABLED else None
+    try:
+        app.state.code_runner = DartCodeRunner()
+        await app.state.code_runner.start()
+        runner = app.state.code_runner
+        if settings.ANALYSIS_ENABLED:
+            analyzer = DartAnalysisService(runner.client, runner.image_name, runner.executor)
+            await analyzer.start()
+        app.state.execution_scheduler = ExecutionScheduler(runner, result_cache, analyzer)
+        await app.state.execution_scheduler.start()
+    except Exception:
+        # The rest of the API stays usable without Docker
+        logger.exception("Code execution disabled: could not connect to Docker")
+    
+    if settings.METRICS_ENABLED:
+        track_app_state(app)
+    
+    try:
+        yield
+    finally:
+        if app.state.execution_scheduler is not None:
+            await app.state.execution_scheduler.close()
+        if analyzer is not None:
+            await analyzer.close()
+        if app.state.code_runner is not None:
+            await app.state.code_runner.close()
+        if result_cache is not None:
+            await result_cache.close()
+        if app.state.rate_limiter is not None:
+            await app.state.rate_limiter.close()
+        if app.state.submission_buffer is not None:
+            # Save everything still queued before the database client goes away
+            await app.state.submission_buffer.close()
+        if app.state.challenge_catalog is not None:
+            await app.state.challenge_catalog.close()
+        await app.state.db.aclose()
 
 def create_app() -> FastAPI:
     app = FastAPI(
         title="Fluence API",
         description="Backend API for Flutter Learning Platform",
         version="1.0.0",
-        debug=settings.DEBUG
+        debug=settings.DEBUG,
+        default_response_class=DEFAULT_RESPONSE_CLASS,
+        lifespan=lifespan
     )
     
     # Add CORS middleware
@@ -22,11 +92,16 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    if settings.METRICS_ENABLED:
+        app.middleware("http")(track_request_latency)
+    
     # Include routers
     app.include_router(health.router, prefix="/api", tags=["Health"])
     app.include_router(execute_code.router, prefix="/api", tags=["Code Execution"])
     app.include_router(challenges.router, prefix="/api", tags=["Challenges"])
     app.include_router(submissions.router, prefix="/api", tags=["Submissions"])
+    if settings.METRICS_ENABLED:
+        app.include_router(metrics.router, tags=["Metrics"])
     
     return app
 
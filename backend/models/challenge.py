@@ -50,13 +50,33 @@ class Challenge(ChallengeBase):
     class Config:
         from_attributes = True
 
+# Fields returned for each challenge in listings unless ``fields`` is given
+SUMMARY_FIELDS = ["id", "title", "difficulty", "category", "is_premium", "sort_order"]
+
+class ChallengeSummary(BaseModel):
+    """A challenge in a listing; only the requested fields are set"""
+    id: str
+    title: Optional[str] = None
+    difficulty: Optional[DifficultyLevel] = None
+    category: Optional[ChallengeCategory] = None
+    is_premium: Optional[bool] = None
+    sort_order: Optional[int] = None
+    description: Optional[str] = None
+    starter_code: Optional[str] = None
+    test_script: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class ChallengeList(BaseModel):
-    challenges: List[Challenge]
-    total: int
+    challenges: List[ChallengeSummary]
+    # Not counted for cursor pages served straight from the database
+    total: Optional[int] = None
     page: int
     per_page: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 class ChallengeFilters(BaseModel):
     difficulty: Optional[DifficultyLevel] = None
@@ -64,4 +84,6 @@ class ChallengeFilters(BaseModel):
     is_premium: Optional[bool] = None
     search: Optional[str] = None
     page: int = Field(1, ge=1)
-    per_page: int = Field(10, ge=1, le=100)
\ No newline at end of file
+    per_page: int = Field(10, ge=1, le=100)
+    # Opaque cursor from a previous page's next_cursor or prev_cursor
+    cursor: Optional[str] = None
\ No newline at end of file
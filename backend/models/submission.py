@@ -1,31 +1,101 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
-from datetime import datetime
+from typing import Optional, Dict, Any, List
+from datetime import date, datetime
+from enum import Enum
 
 class SubmissionBase(BaseModel):
     challenge_id: str
-    code: str = Field(..., min_length=1)
+    # The CodeExecutionResponse of the graded run, including test_results
     result: Optional[Dict[str, Any]] = None
     is_successful: bool = False
 
 class SubmissionCreate(SubmissionBase):
-    pass
+    code: str = Field(..., min_length=1)
 
 class Submission(SubmissionBase):
     id: str
     user_id: str
     created_at: datetime
+    # SHA-256 of the code, which is stored once in code_blobs under it
+    code_hash: str
+    # Only filled in when the code was asked for
+    code: Optional[str] = None
 
     class Config:
         from_attributes = True
 
+class SubmissionPage(BaseModel):
+    submissions: List[Submission]
+    # Opaque cursors for the older and newer neighbouring pages
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+class SolvedByDifficulty(BaseModel):
+    easy: int = 0
+    medium: int = 0
+    hard: int = 0
+
+class SubmissionStats(BaseModel):
+    user_id: str
+    total_submissions: int = 0
+    successful_submissions: int = 0
+    solved_challenges: int = 0
+    solved_by_difficulty: SolvedByDifficulty = Field(default_factory=SolvedByDifficulty)
+    # Consecutive UTC days with a submission, up to today or yesterday
+    current_streak: int = 0
+    longest_streak: int = 0
+    last_active_date: Optional[date] = None
+
+class ChallengeProgress(BaseModel):
+    challenge_id: str
+    attempts: int
+    solved_at: Optional[datetime] = None
+    last_attempt_at: Optional[datetime] = None
+
 class CodeExecutionRequest(BaseModel):
     code: str = Field(..., min_length=1)
     test_script: Optional[str] = None
+    # When set, the challenge's stored test script is used instead of test_script
+    challenge_id: Optional[str] = None
+
+class TestCaseResult(BaseModel):
+    name: str
+    passed: bool
+    duration_ms: float
+    message: Optional[str] = None
+
+class CodeDiagnostic(BaseModel):
+    line: int
+    column: int
+    message: str
+    code: Optional[str] = None
 
 class CodeExecutionResponse(BaseModel):
     success: bool
     output: str
     errors: Optional[str] = None
     execution_time: float
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    cached: bool = False
+    # Per-test results when the code ran against a test script
+    test_results: Optional[List[TestCaseResult]] = None
+    # Compile errors when static analysis rejected the code before running it
+    diagnostics: Optional[List[CodeDiagnostic]] = None
+    # Seconds spent in each phase of the execution, only with ?debug=true
+    phases: Optional[Dict[str, float]] = None
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class ExecutionJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class ExecutionJobResponse(BaseModel):
+    id: str
+    status: ExecutionJobStatus
+    result: Optional[CodeExecutionResponse] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
\ No newline at end of file
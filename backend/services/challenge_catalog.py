@@ -0,0 +1,209 @@
+import asyncio
+import bisect
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from postgrest import AsyncPostgrestClient
+from config import settings
+from services.database import execute
+from services.search_index import SearchIndex
+from utils.pagination import NEXT
+from utils.metrics import db_operation
+from models.challenge import Challenge, ChallengeFilters
+
+logger = logging.getLogger(__name__)
+
+class ChallengeCatalog:
+    """Process-local copy of every challenge, indexed for listing
+
+    Challenges are loaded once and kept in memory with indexes by
+    difficulty, category, premium flag and ``sort_order`` plus a full-text
+    SearchIndex, so listings, searches and lookups never touch the
+    database. Every ``check_interval`` seconds a background task compares
+    the ``catalog_version`` row (bumped by a trigger on any change to
+    challenges) and reloads when another worker has written; a full reload
+    also happens every ``ttl`` seconds. If the database is unreachable the
+    last loaded catalog keeps being served.
+    """
+
+    def __init__(
+        self,
+        db: AsyncPostgrestClient,
+        check_interval: float = settings.CATALOG_CHECK_INTERVAL,
+        ttl: float = settings.CATALOG_TTL,
+    ):
+        self.db = db
+        self.check_interval = check_interval
+        self.ttl = ttl
+        # catalog_version the loaded copy matches; None after a local write
+        self.version: Optional[int] = None
+        self.updated_at: Optional[datetime] = None
+        self._challenges: Dict[str, Challenge] = {}
+        self._by_difficulty: Dict[str, Set[str]] = {}
+        self._by_category: Dict[str, Set[str]] = {}
+        self._by_premium: Dict[bool, Set[str]] = {}
+        # (sort_order, id) of every challenge, kept sorted
+        self._ordered: List[Tuple[int, str]] = []
+        self._search = SearchIndex()
+        self._loaded_at: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def list(
+        self,
+        filters: ChallengeFilters,
+        user_is_pro: bool = False,
+        cursor: Optional[Tuple[Tuple[int, str], str]] = None
+    ) -> Tuple[List[Challenge], int, bool, bool]:
+        """Return one page of matching challenges, the number of matches and
+        whether there are matches before and after the page
+
+        ``cursor`` is a (sort_order, id) key and direction to page from
+        instead of ``filters.page``; search results are ranked, so they are
+        paged by ``filters.page`` only.
+        """
+        await self._ensure_fresh()
+
+        premium = filters.is_premium
+        if premium is None and not user_is_pro:
+            # If user is not pro, only show free challenges
+            premium = False
+
+        candidates: Optional[Set[str]] = None
+        for index, value in (
+            (self._by_difficulty, filters.difficulty),
+            (self._by_category, filters.category),
+            (self._by_premium, premium),
+        ):
+            if value is None:
+                continue
+            ids = index.get(value, set())
+            candidates = ids if candidates is None else candidates & ids
+
+        if filters.search:
+            # Ranked by relevance, ties in catalog order
+            scores = self._search.search(filters.search)
+            matches = sorted(
+                (self._challenges[challenge_id].sort_order, challenge_id)
+                for challenge_id in scores
+                if candidates is None or challenge_id in candidates
+            )
+            matches.sort(key=lambda key: -scores[key[1]])
+        else:
+            matches = [key for key in self._ordered if candidates is None or key[1] in candidates]
+
+        if cursor is None:
+            start = (filters.page - 1) * filters.per_page
+            end = start + filters.per_page
+        elif cursor[1] == NEXT:
+            start = bisect.bisect_right(matches, cursor[0])
+            end = start + filters.per_page
+        else:
+            end = bisect.bisect_left(matches, cursor[0])
+            start = max(end - filters.per_page, 0)
+
+        page = [self._challenges[challenge_id] for _, challenge_id in matches[start:end]]
+        return page, len(matches), start > 0, end < len(matches)
+
+    async def current_version(self) -> Optional[Tuple[int, Optional[datetime]]]:
+        """Return the catalog version being served and when it changed
+
+        None while the copy holds writes made through put or remove that
+        the next refresh has not picked up yet.
+        """
+        await self._ensure_fresh()
+        if self.version is None:
+            return None
+        return self.version, self.updated_at
+
+    async def get(self, challenge_id: str) -> Optional[Challenge]:
+        await self._ensure_fresh()
+        return self._challenges.get(challenge_id)
+
+    def put(self, challenge: Challenge):
+        """Add or replace a challenge after it was written to the database"""
+        if self._loaded_at is None:
+            return
+        self.remove(challenge.id)
+        self._challenges[challenge.id] = challenge
+        self._by_difficulty.setdefault(challenge.difficulty, set()).add(challenge.id)
+        self._by_category.setdefault(challenge.category, set()).add(challenge.id)
+        self._by_premium.setdefault(challenge.is_premium, set()).add(challenge.id)
+        bisect.insort(self._ordered, (challenge.sort_order, challenge.id))
+        self._search.add(challenge.id, challenge.title, challenge.description)
+        self._mark_changed()
+
+    def remove(self, challenge_id: str):
+        """Drop a challenge after it was deleted from the database"""
+        challenge = self._challenges.pop(challenge_id, None)
+        if challenge is None:
+            return
+        self._by_difficulty[challenge.difficulty].discard(challenge_id)
+        self._by_category[challenge.category].discard(challenge_id)
+        self._by_premium[challenge.is_premium].discard(challenge_id)
+        key = (challenge.sort_order, challenge_id)
+        del self._ordered[bisect.bisect_left(self._ordered, key)]
+        self._search.remove(challenge_id)
+        self._mark_changed()
+
+    def _mark_changed(self):
+        # The copy no longer matches any catalog version; reload at the next check
+        self.version = None
+        self._checked_at = 0.0
+
+    async def close(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+
+    async def _ensure_fresh(self):
+        if self._loaded_at is None:
+            # Nothing to fall back on yet, so the first load is awaited
+            await self._refresh()
+            return
+
+        due = time.monotonic() - self._checked_at >= self.check_interval
+        if due and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_in_background())
+
+    async def _refresh_in_background(self):
+        try:
+            await self._refresh()
+        except Exception:
+            logger.warning("Challenge catalog refresh failed, serving cached copy", exc_info=True)
+            self._checked_at = time.monotonic()
+        finally:
+            self._refresh_task = None
+
+    @db_operation
+    async def _refresh(self):
+        """Reload the catalog if its version changed or the TTL expired"""
+        async with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return
+
+            # Read the version first: a change made during the load just causes another reload
+            response = await execute(self.db.table("catalog_version").select("version,updated_at"))
+            row = response.data[0] if response.data else {}
+            version = row.get("version")
+            updated_at = datetime.fromisoformat(row["updated_at"]) if row.get("updated_at") else None
+            expired = self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl
+            if expired or version != self.version:
+                columns = ",".join(Challenge.model_fields)
+                response = await execute(self.db.table("challenges").select(columns))
+                self._load([Challenge(**item) for item in response.data], version)
+            self.updated_at = updated_at
+            self._checked_at = time.monotonic()
+
+    def _load(self, challenges: List[Challenge], version: Optional[int]):
+        self._challenges = {}
+        self._by_difficulty = {}
+        self._by_category = {}
+        self._by_premium = {}
+        self._ordered = []
+        self._search = SearchIndex()
+        self._loaded_at = time.monotonic()
+        for challenge in challenges:
+            self.put(challenge)
+        self.version = version
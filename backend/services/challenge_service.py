@@ -1,31 +1,177 @@
-from typing import List, Optional, Dict, Any
-from supabase import create_client, Client
+import asyncio
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple
+from postgrest import AsyncPostgrestClient, APIError
+from postgrest.types import CountMethod
 from config import settings
-from models.challenge import Challenge, ChallengeCreate, ChallengeUpdate, ChallengeFilters, ChallengeList
+from services.database import execute
+from utils.metrics import db_operation
+from services.challenge_catalog import ChallengeCatalog
+from services.search_index import tokenize
+from utils.pagination import (
+    NEXT, PREV, InvalidCursor, decode_cursor, encode_cursor, keyset_filter, keyset_order
+)
+from models.challenge import (
+    Challenge, ChallengeCreate, ChallengeUpdate, ChallengeFilters, ChallengeList,
+    ChallengeSummary, SUMMARY_FIELDS
+)
 
 class ChallengeService:
-    def __init__(self):
-        self.supabase: Client = create_client(
-            settings.SUPABASE_URL,
-            settings.SUPABASE_SERVICE_ROLE_KEY
-        )
+    def __init__(self, db: AsyncPostgrestClient, catalog: Optional[ChallengeCatalog] = None):
+        self.db = db
+        self.catalog = catalog
 
+    @db_operation
     async def get_challenges(
         self, 
         filters: ChallengeFilters,
-        user_is_pro: bool = False
+        user_is_pro: bool = False,
+        fields: Optional[List[str]] = None
     ) -> ChallengeList:
-        """Get challenges with filtering and pagination"""
+        """Get challenges with filtering and pagination
+        
+        Each challenge only carries ``fields`` (SUMMARY_FIELDS by default);
+        the heavy text fields are for get_challenge_by_id. With
+        ``filters.cursor`` the page is found by seeking on (sort_order, id)
+        instead of an offset, and ``page`` is ignored.
+        """
+        fields = fields or SUMMARY_FIELDS
+        if "id" not in fields:
+            fields = ["id", *fields]
+        cursor = self._decode_cursor(filters.cursor) if filters.cursor else None
+        if cursor and filters.search:
+            raise InvalidCursor("Search results are paged by page number")
+        
+        if self.catalog:
+            challenges, total, has_prev, has_next = await self.catalog.list(filters, user_is_pro, cursor)
+            rows = [{field: getattr(challenge, field) for field in (*fields, "sort_order")} for challenge in challenges]
+            # Catalog entries were validated as Challenges when they were loaded
+            summaries = [ChallengeSummary.model_construct(**{field: row[field] for field in fields}) for row in rows]
+        else:
+            rows, total, has_prev, has_next = await self._list_from_db(filters, user_is_pro, fields, cursor)
+            summaries = [ChallengeSummary(**{field: row[field] for field in fields}) for row in rows]
+        
+        return ChallengeList.model_construct(
+            challenges=summaries,
+            total=total,
+            page=filters.page,
+            per_page=filters.per_page,
+            has_next=has_next,
+            has_prev=has_prev,
+            next_cursor=self._cursor(rows[-1], NEXT) if rows and has_next and not filters.search else None,
+            prev_cursor=self._cursor(rows[0], PREV) if rows and has_prev and not filters.search else None
+        )
+
+    async def _list_from_db(
+        self,
+        filters: ChallengeFilters,
+        user_is_pro: bool,
+        fields: List[str],
+        cursor: Optional[Tuple[Tuple[int, str], str]]
+    ) -> Tuple[List[Dict[str, Any]], Optional[int], bool, bool]:
+        """Fetch one page, its total and whether there are pages before and after it"""
+        # The sort key is always selected so cursors can be built from the rows
+        columns = ",".join(dict.fromkeys([*fields, "sort_order"]))
+        
+        if filters.search:
+            return await self._search_db(filters, user_is_pro, columns)
+        
+        if cursor:
+            # Seek past the cursor through the (sort_order, id) index; one extra
+            # row tells whether there is another page. Counting every match is
+            # what keyset pages avoid, so the total is left out.
+            key, direction = cursor
+            forward = direction == NEXT
+            query = self._filter(self.db.table("challenges").select(columns), filters, user_is_pro)
+            query = keyset_filter(query, ("sort_order", "id"), key, "gt" if forward else "lt")
+            query = keyset_order(query, ("sort_order", "id"), desc=not forward).limit(filters.per_page + 1)
+            rows = (await execute(query)).data
+            more = len(rows) > filters.per_page
+            rows = rows[:filters.per_page]
+            if forward:
+                return rows, None, True, more
+            rows.reverse()
+            return rows, None, more, True
+        
+        # The total comes back with the page in one round trip
+        query = self.db.table("challenges").select(columns, count=CountMethod.exact)
+        query = self._filter(query, filters, user_is_pro)
+        
+        # Apply pagination (range's end is exclusive in postgrest-py)
+        offset = (filters.page - 1) * filters.per_page
+        query = keyset_order(query, ("sort_order", "id")).range(offset, offset + filters.per_page)
+        
+        try:
+            response = await execute(query)
+            rows, total = response.data, response.count
+        except APIError as e:
+            # PostgREST rejects a range that starts past the last row
+            if e.code != "PGRST103":
+                raise
+            count_query = self.db.table("challenges").select("id", count=CountMethod.exact)
+            count_query = self._filter(count_query, filters, user_is_pro).limit(0)
+            rows, total = [], (await execute(count_query)).count
+        
+        return rows, total, filters.page > 1, offset + filters.per_page < total
+
+    async def _search_db(
+        self,
+        filters: ChallengeFilters,
+        user_is_pro: bool,
+        columns: str
+    ) -> Tuple[List[Dict[str, Any]], int, bool, bool]:
+        """Fetch one page of search results ranked by relevance, like the catalog does"""
+        tsquery = self._tsquery(filters.search)
+        if tsquery is None:
+            # No words to match (e.g. only punctuation), so nothing matches
+            return [], 0, filters.page > 1, False
         
-        # Build query
-        query = self.supabase.table("challenges").select("*")
+        offset = (filters.page - 1) * filters.per_page
+        premium = filters.is_premium
+        if premium is None and not user_is_pro:
+            premium = False
+        # search_challenges ranks with ts_rank, which a table query cannot order by
+        page_query = self.db.rpc("search_challenges", {
+            "search_query": tsquery,
+            "filter_difficulty": filters.difficulty.value if filters.difficulty else None,
+            "filter_category": filters.category.value if filters.category else None,
+            "filter_premium": premium,
+            "page_limit": filters.per_page,
+            "page_offset": offset,
+        })
+        page_query.params = page_query.params.add("select", columns)
+        count_query = self.db.table("challenges").select("id", count=CountMethod.exact)
+        count_query = self._filter(count_query, filters, user_is_pro).limit(0)
         
-        # Apply filters
+        page, count = await asyncio.gather(execute(page_query), execute(count_query))
+        return page.data, count.count, filters.page > 1, offset + filters.per_page < count.count
+
+    @staticmethod
+    def _tsquery(search: str) -> Optional[str]:
+        """Every word of search as a prefix, for to_tsquery"""
+        words = tokenize(search)
+        return " & ".join(f"{word}:*" for word in words) if words else None
+
+    @staticmethod
+    def _cursor(row: Dict[str, Any], direction: str) -> str:
+        return encode_cursor((row["sort_order"], row["id"]), direction)
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[Tuple[int, str], str]:
+        key, direction = decode_cursor(cursor)
+        try:
+            return (int(key[0]), str(key[1])), direction
+        except (TypeError, ValueError):
+            raise InvalidCursor("Invalid cursor")
+
+    def _filter(self, query, filters: ChallengeFilters, user_is_pro: bool):
+        """Apply the listing filters to a challenges query"""
+        # .value: str enums format as "DifficultyLevel.EASY" on Python 3.11
         if filters.difficulty:
-            query = query.eq("difficulty", filters.difficulty)
+            query = query.eq("difficulty", filters.difficulty.value)
         
         if filters.category:
-            query = query.eq("category", filters.category)
+            query = query.eq("category", filters.category.value)
         
         if filters.is_premium is not None:
             query = query.eq("is_premium", filters.is_premium)
@@ -34,45 +180,56 @@ class ChallengeService:
             query = query.eq("is_premium", False)
         
         if filters.search:
-            query = query.ilike("title", f"%{filters.search}%")
-        
-        # Get total count
-        total_response = query.execute()
-        total = len(total_response.data)
-        
-        # Apply pagination
-        offset = (filters.page - 1) * filters.per_page
-        query = query.order("sort_order").range(offset, offset + filters.per_page - 1)
-        
-        response = query.execute()
+            # Through the GIN index on search_vector; a search without words matches nothing
+            tsquery = self._tsquery(filters.search)
+            if tsquery is None:
+                query = query.is_("id", "null")
+            else:
+                query = query.filter("search_vector", "fts(english)", tsquery)
         
-        challenges = [Challenge(**item) for item in response.data]
+        return query
+
+    @db_operation
+    async def get_catalog_version(self) -> Tuple[Optional[int], Optional[datetime]]:
+        """Get the catalog version and when it last changed, bumped on any change to challenges"""
+        if self.catalog:
+            current = await self.catalog.current_version()
+            if current:
+                return current
         
-        return ChallengeList(
-            challenges=challenges,
-            total=total,
-            page=filters.page,
-            per_page=filters.per_page,
-            has_next=offset + filters.per_page < total,
-            has_prev=filters.page > 1
-        )
+        response = await execute(self.db.table("catalog_version").select("version,updated_at"))
+        if not response.data:
+            return None, None
+        row = response.data[0]
+        return row["version"], datetime.fromisoformat(row["updated_at"]) if row["updated_at"] else None
 
+    @db_operation
     async def get_challenge_by_id(self, challenge_id: str) -> Optional[Challenge]:
         """Get a single challenge by ID"""
-        response = self.supabase.table("challenges").select("*").eq("id", challenge_id).execute()
+        if self.catalog:
+            challenge = await self.catalog.get(challenge_id)
+            if challenge:
+                return challenge
+        
+        response = await execute(self.db.table("challenges").select("*").eq("id", challenge_id))
         
         if not response.data:
             return None
         
         return Challenge(**response.data[0])
 
+    @db_operation
     async def create_challenge(self, challenge: ChallengeCreate) -> Challenge:
         """Create a new challenge"""
         challenge_data = challenge.dict()
-        response = self.supabase.table("challenges").insert(challenge_data).execute()
+        response = await execute(self.db.table("challenges").insert(challenge_data))
         
-        return Challenge(**response.data[0])
+        created = Challenge(**response.data[0])
+        if self.catalog:
+            self.catalog.put(created)
+        return created
 
+    @db_operation
     async def update_challenge(self, challenge_id: str, challenge: ChallengeUpdate) -> Optional[Challenge]:
         """Update an existing challenge"""
         # Only include non-None fields
@@ -82,46 +239,27 @@ class ChallengeService:
             # Nothing to update
             return await self.get_challenge_by_id(challenge_id)
         
-        response = self.supabase.table("challenges").update(update_data).eq("id", challenge_id).execute()
+        response = await execute(self.db.table("challenges").update(update_data).eq("id", challenge_id))
         
         if not response.data:
             return None
         
-        return Challenge(**response.data[0])
+        updated = Challenge(**response.data[0])
+        if self.catalog:
+            self.catalog.put(updated)
+        return updated
 
+    @db_operation
     async def delete_challenge(self, challenge_id: str) -> bool:
         """Delete a challenge"""
-        response = self.supabase.table("challenges").delete().eq("id", challenge_id).execute()
+        response = await execute(self.db.table("challenges").delete().eq("id", challenge_id))
+        if response.data and self.catalog:
+            self.catalog.remove(challenge_id)
         return len(response.data) > 0
 
+    @db_operation
     async def get_challenge_statistics(self) -> Dict[str, Any]:
         """Get challenge statistics"""
-        # Total challenges
-        total_response = self.supabase.table("challenges").select("id").execute()
-        total_challenges = len(total_response.data)
-        
-        # By difficulty
-        difficulty_stats = {}
-        for difficulty in ["easy", "medium", "hard"]:
-            response = self.supabase.table("challenges").select("id").eq("difficulty", difficulty).execute()
-            difficulty_stats[difficulty] = len(response.data)
-        
-        # By category
-        category_response = self.supabase.table("challenges").select("category").execute()
-        category_stats = {}
-        for item in category_response.data:
-            category = item["category"]
-            category_stats[category] = category_stats.get(category, 0) + 1
-        
-        # Premium vs Free
-        premium_response = self.supabase.table("challenges").select("id").eq("is_premium", True).execute()
-        premium_count = len(premium_response.data)
-        free_count = total_challenges - premium_count
-        
-        return {
-            "total_challenges": total_challenges,
-            "difficulty_breakdown": difficulty_stats,
-            "category_breakdown": category_stats,
-            "premium_count": premium_count,
-            "free_count": free_count
-        }
\ No newline at end of file
+        # Aggregated in the database (see get_challenge_statistics in schema.sql)
+        response = await execute(self.db.rpc("get_challenge_statistics", {}))
+        return response.data
\ No newline at end of file
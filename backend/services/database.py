@@ -0,0 +1,61 @@
+import asyncio
+import importlib.util
+from typing import Dict, Union
+import httpx
+from postgrest import AsyncPostgrestClient, APIResponse
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from config import settings
+from utils.metrics import observe_db_query
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+class DatabaseTimeout(Exception):
+    """Raised when a query takes longer than its timeout"""
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """PostgREST client whose HTTP session keeps a tuned pool of connections"""
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=settings.DB_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.DB_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.DB_KEEPALIVE_EXPIRY,
+            ),
+            http2=HTTP2_AVAILABLE,
+        )
+
+def create_database_client() -> PooledPostgrestClient:
+    """Build the app-scoped client for Supabase's REST API
+
+    Created once at startup and shared by every service, so requests reuse
+    open TLS connections instead of paying a handshake each time. Queries
+    are awaited, so concurrent requests overlap their database round trips.
+    """
+    key = settings.SUPABASE_SERVICE_ROLE_KEY
+    return PooledPostgrestClient(
+        settings.SUPABASE_REST_URL,
+        headers={
+            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+            "apiKey": key,
+            "Authorization": f"Bearer {key}",
+        },
+        timeout=settings.DB_TIMEOUT,
+    )
+
+async def execute(query, timeout: float = settings.DB_QUERY_TIMEOUT) -> APIResponse:
+    """Run a PostgREST query, giving up after timeout seconds"""
+    try:
+        with observe_db_query():
+            return await asyncio.wait_for(query.execute(), timeout)
+    except asyncio.TimeoutError:
+        raise DatabaseTimeout(f"Database query timed out after {timeout}s")
@@ -0,0 +1,84 @@
+import bisect
+import math
+import re
+from typing import Dict, List, Set
+
+TOKEN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.casefold())
+
+class SearchIndex:
+    """In-memory inverted index over challenge titles and descriptions
+
+    Every query word matches indexed words it is a prefix of, so partial
+    input works for typeahead. Results must match all query words and are
+    ranked by a tf-idf score in which title words count more than
+    description words and whole-word matches more than prefix matches.
+    """
+
+    TITLE_WEIGHT = 3.0
+    DESCRIPTION_WEIGHT = 1.0
+    PREFIX_PENALTY = 0.5
+
+    def __init__(self):
+        # term -> {challenge id: weighted term frequency}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        # Every indexed term, sorted for prefix lookups
+        self._terms: List[str] = []
+        self._documents: Dict[str, Set[str]] = {}
+
+    def add(self, challenge_id: str, title: str, description: str):
+        self.remove(challenge_id)
+        weights: Dict[str, float] = {}
+        for term in tokenize(title):
+            weights[term] = weights.get(term, 0.0) + self.TITLE_WEIGHT
+        for term in tokenize(description):
+            weights[term] = weights.get(term, 0.0) + self.DESCRIPTION_WEIGHT
+
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                bisect.insort(self._terms, term)
+            postings[challenge_id] = weight
+        self._documents[challenge_id] = set(weights)
+
+    def remove(self, challenge_id: str):
+        for term in self._documents.pop(challenge_id, ()):
+            postings = self._postings[term]
+            del postings[challenge_id]
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+
+    def search(self, query: str) -> Dict[str, float]:
+        """Return the score of every challenge matching all words of query"""
+        scores: Dict[str, float] = {}
+        for position, word in enumerate(dict.fromkeys(tokenize(query))):
+            word_scores = self._score_word(word)
+            if position == 0:
+                scores = word_scores
+            else:
+                scores = {
+                    challenge_id: score + word_scores[challenge_id]
+                    for challenge_id, score in scores.items() if challenge_id in word_scores
+                }
+            if not scores:
+                break
+        return scores
+
+    def _score_word(self, word: str) -> Dict[str, float]:
+        scores: Dict[str, float] = {}
+        total = len(self._documents)
+        start = bisect.bisect_left(self._terms, word)
+        for term in self._terms[start:]:
+            if not term.startswith(word):
+                break
+            postings = self._postings[term]
+            idf = math.log(1 + total / len(postings))
+            factor = idf if term == word else idf * self.PREFIX_PENALTY
+            for challenge_id, weight in postings.items():
+                # A word counts once, through its best matching term
+                scores[challenge_id] = max(scores.get(challenge_id, 0.0), weight * factor)
+        return scores
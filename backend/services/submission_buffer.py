@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from postgrest import AsyncPostgrestClient, APIError
+from postgrest.types import ReturnMethod
+from config import settings
+from services.database import execute
+from utils.metrics import SUBMISSIONS_REJECTED, db_operation
+
+logger = logging.getLogger(__name__)
+
+class SubmissionBufferFull(Exception):
+    """Raised when the buffer stays full for longer than the enqueue timeout"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Submission buffer is full")
+        self.retry_after = retry_after
+
+class SubmissionBuffer:
+    """Write-behind buffer that inserts submissions in batches
+
+    ``add`` queues a row and returns at once; a background task inserts
+    queued rows ``max_batch`` at a time with a single multi-row INSERT, at
+    least every ``flush_interval`` seconds. When ``max_pending`` rows are
+    waiting, ``add`` blocks for up to ``enqueue_timeout`` seconds and then
+    raises SubmissionBufferFull. A batch the database rejects is retried row
+    by row so one bad row cannot sink the others (a row that is already
+    stored fails as a duplicate and is skipped); a batch that fails for any
+    other reason is retried until it goes through. ``close`` flushes
+    everything still queued.
+
+    The client was already told its submission was accepted, so a row the
+    database refuses is not just dropped: it is saved as is in
+    ``submission_dead_letters`` and counted in SUBMISSIONS_REJECTED.
+    """
+
+    RETRY_DELAY = 1.0
+    MAX_RETRY_DELAY = 30.0
+
+    def __init__(
+        self,
+        db: AsyncPostgrestClient,
+        max_batch: int = settings.SUBMISSION_BATCH_SIZE,
+        flush_interval: float = settings.SUBMISSION_FLUSH_INTERVAL,
+        max_pending: int = settings.SUBMISSION_BUFFER_MAX_PENDING,
+        enqueue_timeout: float = settings.SUBMISSION_ENQUEUE_TIMEOUT,
+    ):
+        self.db = db
+        self.max_batch = max(max_batch, 1)
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._flusher: Optional[asyncio.Task] = None
+        self._batch: List[Dict[str, Any]] = []
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self):
+        self._flusher = asyncio.create_task(self._run())
+
+    async def add(self, row: Dict[str, Any]):
+        """Queue a row for insertion, waiting for room if the buffer is full"""
+        if self._closed:
+            raise SubmissionBufferFull(int(self.flush_interval) + 1)
+        try:
+            await asyncio.wait_for(self._queue.put(row), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            raise SubmissionBufferFull(int(self.flush_interval) + 1)
+
+    async def close(self):
+        """Stop accepting rows and insert everything still queued"""
+        self._closed = True
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+
+        rows, self._batch = self._batch, []
+        while not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        for start in range(0, len(rows), self.max_batch):
+            batch = rows[start:start + self.max_batch]
+            try:
+                await self._insert(batch)
+            except Exception:
+                logger.exception("Dropped %d submissions that could not be saved on shutdown", len(batch))
+
+    async def _run(self):
+        while True:
+            await self._collect_batch()
+            delay = self.RETRY_DELAY
+            while True:
+                try:
+                    await self._insert(self._batch)
+                    break
+                except Exception:
+                    logger.warning(
+                        "Saving %d submissions failed, retrying in %ss", len(self._batch), delay, exc_info=True
+                    )
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.MAX_RETRY_DELAY)
+            self._batch = []
+
+    async def _collect_batch(self):
+        """Wait for a row, then collect more until the batch is full or the interval ends"""
+        # Rows are held on self so close() can still save them if we are cancelled
+        self._batch.append(await self._queue.get())
+        deadline = time.monotonic() + self.flush_interval
+        while len(self._batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                self._batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    @db_operation
+    async def _insert(self, batch: List[Dict[str, Any]]):
+        try:
+            await execute(self._insert_query(batch))
+            return
+        except APIError as e:
+            if not _is_rejected(e):
+                raise
+            if len(batch) == 1:
+                await self._reject(batch[0], e)
+                return
+
+        # Something in the batch was rejected; save the rows the database accepts
+        for row in batch:
+            try:
+                await execute(self._insert_query([row]))
+            except APIError as e:
+                if not _is_rejected(e):
+                    raise
+                await self._reject(row, e)
+
+    async def _reject(self, row: Dict[str, Any], error: APIError):
+        """Set aside a row the database refused, unless it is only already stored"""
+        if error.code == UNIQUE_VIOLATION:
+            # Saved by an earlier attempt at this batch
+            return
+        SUBMISSIONS_REJECTED.labels(error.code).inc()
+        logger.error("Submission %s rejected by the database: %s", row.get("id"), error.message)
+        # A failure here fails the batch, which is then retried
+        await execute(
+            self.db.table("submission_dead_letters").upsert(
+                {
+                    "submission_id": row.get("id"),
+                    "payload": row,
+                    "error_code": error.code,
+                    "error_message": error.message,
+                },
+                ignore_duplicates=True,
+                returning=ReturnMethod.minimal,
+            )
+        )
+
+    def _insert_query(self, rows: List[Dict[str, Any]]):
+        return self.db.table("submissions").insert(rows, returning=ReturnMethod.minimal)
+
+# SQLSTATE of a duplicate key, e.g. a row saved before its batch was retried
+UNIQUE_VIOLATION = "23505"
+
+def _is_rejected(error: APIError) -> bool:
+    """Whether Postgres refused the data itself, so retrying cannot help"""
+    # SQLSTATE class 22 is data exceptions, 23 integrity constraint violations
+    return (error.code or "").startswith(("22", "23"))
@@ -1,58 +1,189 @@
-from typing import List, Optional
-from supabase import create_client, Client
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from postgrest import AsyncPostgrestClient
 from config import settings
-from models.submission import Submission, SubmissionCreate
+from services.database import execute
+from utils.metrics import db_operation
+from services.submission_buffer import SubmissionBuffer
+from models.submission import (
+    ChallengeProgress, SolvedByDifficulty, Submission, SubmissionCreate, SubmissionPage, SubmissionStats
+)
+from utils.pagination import (
+    NEXT, PREV, InvalidCursor, decode_cursor, encode_cursor, keyset_filter, keyset_order
+)
+
+# Every submission column except the write-only code
+SUBMISSION_COLUMNS = "id,user_id,challenge_id,code_hash,result,is_successful,created_at"
+# The same plus the code, embedded from code_blobs through the code_hash foreign key
+SUBMISSION_COLUMNS_WITH_CODE = SUBMISSION_COLUMNS + ",blob:code_blobs(code)"
+
+def code_hash(code: str) -> str:
+    """Hash code the way store_submission_code in schema.sql does"""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
 
 class SubmissionService:
-    def __init__(self):
-        self.supabase: Client = create_client(
-            settings.SUPABASE_URL,
-            settings.SUPABASE_SERVICE_ROLE_KEY
-        )
+    def __init__(self, db: AsyncPostgrestClient, buffer: Optional[SubmissionBuffer] = None):
+        self.db = db
+        self.buffer = buffer
 
+    @db_operation
     async def create_submission(self, submission: SubmissionCreate, user_id: str) -> Submission:
-        """Create a new submission"""
+        """Create a new submission
+        
+        The database keeps the code in code_blobs, once per hash. A
+        submission without a result reuses the grading of the user's earlier
+        submission of the same code to the same challenge, if there is one;
+        the reuse_submission_grading trigger looks it up as the row is saved.
+        With a buffer the row is only queued and saved in the next batch, so
+        the id and timestamp are assigned here rather than by the database,
+        and the returned submission has no reused result.
+        """
         submission_data = submission.dict()
         submission_data["user_id"] = user_id
+        submission_data["code_hash"] = code_hash(submission.code)
         
-        response = self.supabase.table("submissions").insert(submission_data).execute()
-        return Submission(**response.data[0])
+        if self.buffer:
+            submission_data["id"] = str(uuid.uuid4())
+            submission_data["created_at"] = datetime.now(timezone.utc).isoformat()
+            await self.buffer.add(submission_data)
+            return Submission(**submission_data)
+        
+        response = await execute(self.db.table("submissions").insert(submission_data))
+        return Submission(**{**response.data[0], "code": submission.code})
 
-    async def get_user_submissions(self, user_id: str, challenge_id: Optional[str] = None) -> List[Submission]:
-        """Get submissions for a user, optionally filtered by challenge"""
-        query = self.supabase.table("submissions").select("*").eq("user_id", user_id)
+    @db_operation
+    async def get_user_submissions(
+        self,
+        user_id: str,
+        challenge_id: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        include_code: bool = False
+    ) -> SubmissionPage:
+        """Get a page of a user's submissions, newest first, optionally filtered by challenge
+        
+        Pages are found by seeking on (created_at, id) from ``cursor``, so
+        deep pages cost the same as the first one. The code is only fetched
+        from code_blobs with ``include_code``.
+        """
+        key, direction = self._decode_cursor(cursor) if cursor else (None, NEXT)
+        forward = direction == NEXT
+        
+        columns = SUBMISSION_COLUMNS_WITH_CODE if include_code else SUBMISSION_COLUMNS
+        query = self.db.table("submissions").select(columns).eq("user_id", user_id)
         
         if challenge_id:
             query = query.eq("challenge_id", challenge_id)
         
-        response = query.order("created_at", desc=True).execute()
-        return [Submission(**item) for item in response.data]
+        if key:
+            # Older rows for the next page, newer rows for the previous one
+            query = keyset_filter(query, ("created_at", "id"), key, "lt" if forward else "gt")
+        
+        # One extra row tells whether there is another page
+        query = keyset_order(query, ("created_at", "id"), desc=forward).limit(limit + 1)
+        rows = (await execute(query)).data
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if not forward:
+            rows.reverse()
+        
+        submissions = [self._submission(item) for item in rows]
+        has_next = more if forward else True
+        has_prev = key is not None if forward else more
+        return SubmissionPage(
+            submissions=submissions,
+            next_cursor=self._cursor(submissions[-1], NEXT) if submissions and has_next else None,
+            prev_cursor=self._cursor(submissions[0], PREV) if submissions and has_prev else None
+        )
+
+    @staticmethod
+    def _submission(row: Dict[str, Any]) -> Submission:
+        blob = row.pop("blob", None)
+        if blob:
+            row["code"] = blob["code"]
+        return Submission(**row)
 
+    @staticmethod
+    def _cursor(submission: Submission, direction: str) -> str:
+        return encode_cursor((submission.created_at.isoformat(), submission.id), direction)
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[Tuple[str, str], str]:
+        """Sort key (created_at with its offset, id) and direction of a cursor"""
+        key, direction = decode_cursor(cursor)
+        try:
+            created_at = datetime.fromisoformat(key[0])
+            submission_id = uuid.UUID(key[1])
+        except (TypeError, ValueError, AttributeError):
+            raise InvalidCursor("Invalid cursor")
+        if created_at.tzinfo is None:
+            raise InvalidCursor("Invalid cursor")
+        return (created_at.isoformat(), str(submission_id)), direction
+
+    @db_operation
     async def get_latest_submission(self, user_id: str, challenge_id: str) -> Optional[Submission]:
         """Get the latest submission for a user and challenge"""
-        response = (
-            self.supabase.table("submissions")
-            .select("*")
+        response = await execute(
+            self.db.table("submissions")
+            .select(SUBMISSION_COLUMNS_WITH_CODE)
             .eq("user_id", user_id)
             .eq("challenge_id", challenge_id)
             .order("created_at", desc=True)
             .limit(1)
-            .execute()
         )
         
         if not response.data:
             return None
         
-        return Submission(**response.data[0])
+        return self._submission(response.data[0])
 
-    async def get_successful_submissions_count(self, user_id: str) -> int:
-        """Get count of successful submissions for a user"""
-        response = (
-            self.supabase.table("submissions")
-            .select("id")
-            .eq("user_id", user_id)
-            .eq("is_successful", True)
-            .execute()
+    @db_operation
+    async def get_user_stats(self, user_id: str) -> SubmissionStats:
+        """Get a user's progress counters
+        
+        The counters are kept up to date by a trigger on submissions (see
+        record_submission_progress in schema.sql), so this reads one row
+        however many submissions the user has made.
+        """
+        response = await execute(
+            self.db.table("user_progress").select("*").eq("user_id", user_id).limit(1)
         )
         
-        return len(response.data)
\ No newline at end of file
+        if not response.data:
+            return SubmissionStats(user_id=user_id)
+        
+        row = response.data[0]
+        last_active = datetime.fromisoformat(row["last_active_date"]).date() if row["last_active_date"] else None
+        # The stored streak only changes on submission; a day without one ends it
+        yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+        current_streak = row["current_streak"] if last_active and last_active >= yesterday else 0
+        
+        return SubmissionStats(
+            user_id=user_id,
+            total_submissions=row["total_submissions"],
+            successful_submissions=row["successful_submissions"],
+            solved_challenges=row["solved_challenges"],
+            solved_by_difficulty=SolvedByDifficulty(
+                easy=row["solved_easy"], medium=row["solved_medium"], hard=row["solved_hard"]
+            ),
+            current_streak=current_streak,
+            longest_streak=row["longest_streak"],
+            last_active_date=last_active
+        )
+
+    @db_operation
+    async def get_challenge_progress(self, user_id: str) -> List[ChallengeProgress]:
+        """Get the user's attempts and solve time for every challenge they have tried"""
+        response = await execute(
+            self.db.table("user_challenge_progress")
+            .select("challenge_id,attempts,solved_at,last_attempt_at")
+            .eq("user_id", user_id)
+        )
+        return [ChallengeProgress(**item) for item in response.data]
+
+    @db_operation
+    async def get_successful_submissions_count(self, user_id: str) -> int:
+        """Get count of successful submissions for a user"""
+        return (await self.get_user_stats(user_id)).successful_submissions
@@ -0,0 +1,56 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Tuple
+from postgrest import AsyncPostgrestClient
+from config import settings
+from services.database import execute
+from utils.metrics import db_operation
+
+logger = logging.getLogger(__name__)
+
+class UserProfiles:
+    """Pro status of users, read from ``public.users``
+
+    Answers are kept in an LRU of at most ``max_entries`` users for ``ttl``
+    seconds, so an upgrade shows up within that time. A failed lookup
+    counts as not pro and is not remembered.
+    """
+
+    def __init__(
+        self,
+        db: AsyncPostgrestClient,
+        ttl: float = settings.PROFILE_CACHE_TTL,
+        max_entries: int = settings.PROFILE_CACHE_MAX_ENTRIES,
+    ):
+        self.db = db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # user id -> (is_pro, monotonic time it was read)
+        self._cache: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+
+    async def is_pro(self, user_id: str) -> bool:
+        now = time.monotonic()
+        cached = self._cache.get(user_id)
+        if cached is not None and now - cached[1] < self.ttl:
+            self._cache.move_to_end(user_id)
+            return cached[0]
+
+        try:
+            is_pro = await self._load_is_pro(user_id)
+        except Exception:
+            logger.warning("Could not read pro status of user %s", user_id, exc_info=True)
+            return False
+
+        self._cache[user_id] = (is_pro, now)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return is_pro
+
+    @db_operation
+    async def _load_is_pro(self, user_id: str) -> bool:
+        response = await execute(
+            self.db.table("users").select("is_pro").eq("id", user_id).limit(1)
+        )
+        return bool(response.data and response.data[0].get("is_pro"))
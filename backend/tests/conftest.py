@@ -0,0 +1,102 @@
+import time
+from types import SimpleNamespace
+import docker
+import pytest
+
+class FakeClock:
+    """Stands in for time.monotonic; tests move it forward by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze time.monotonic at a FakeClock
+
+    The event loop reads the same clock, so tests using this must not
+    wait on timeouts or sleeps.
+    """
+    clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+class FakeContainer:
+    def __init__(self, container_id: str):
+        self.id = container_id
+        self.processes = [["nobody", "sleep infinity"]]
+        self.removed = False
+
+    def top(self):
+        return {"Processes": self.processes}
+
+    def remove(self, force=False, v=False):
+        self.removed = True
+
+class FakeContainers:
+    def __init__(self, daemon: "FakeDocker"):
+        self.daemon = daemon
+        self.started = []
+
+    def run(self, image, **kwargs):
+        self.daemon.ping()
+        container = FakeContainer(f"{self.daemon.name}-c{len(self.started)}")
+        self.started.append((container, kwargs))
+        return container
+
+class FakeApi:
+    """Records the commands exec'd in containers and answers with exit_code"""
+
+    def __init__(self):
+        self.execs = []
+        self.exit_code = 0
+
+    def exec_create(self, container_id, cmd, user=None):
+        self.execs.append((container_id, cmd, user))
+        return {"Id": str(len(self.execs))}
+
+    def exec_start(self, exec_id):
+        return b""
+
+    def exec_inspect(self, exec_id):
+        return {"ExitCode": self.exit_code}
+
+class FakeImages:
+    """Images present on a fake daemon, by name"""
+
+    def __init__(self):
+        self.ids = {"fluence-dart-sandbox": "sha256:sandbox"}
+
+    def get(self, name):
+        if name not in self.ids:
+            raise docker.errors.ImageNotFound(name)
+        return SimpleNamespace(id=self.ids[name])
+
+class FakeDocker:
+    """A Docker daemon that runs nothing; stop it with ``reachable = False``"""
+
+    def __init__(self, name: str = "fake"):
+        self.name = name
+        self.reachable = True
+        self.containers = FakeContainers(self)
+        self.api = FakeApi()
+        self.images = FakeImages()
+
+    def ping(self):
+        if not self.reachable:
+            raise ConnectionError(f"{self.name} is down")
+        return True
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def docker_client():
+    return FakeDocker()
+
+@pytest.fixture
+def docker_daemons():
+    """Makes more fake Docker daemons, by name"""
+    return FakeDocker
@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+import pytest
+from postgrest import AsyncPostgrestClient
+from models.challenge import Challenge, ChallengeFilters
+from services import challenge_catalog
+from services.challenge_catalog import ChallengeCatalog
+
+def challenge(challenge_id: str, title: str, sort_order: int = 0, **fields) -> dict:
+    return {
+        "id": challenge_id,
+        "title": title,
+        "description": f"Write {title.lower()}.",
+        "starter_code": "void main() {}",
+        "test_script": None,
+        "is_premium": False,
+        "difficulty": "easy",
+        "category": "basics",
+        "sort_order": sort_order,
+        "created_at": "2024-01-01T00:00:00+00:00",
+        "updated_at": "2024-01-01T00:00:00+00:00",
+        **fields,
+    }
+
+class FakeDatabase:
+    """The challenges and catalog_version tables, as PostgREST would return them"""
+
+    def __init__(self):
+        self.challenges = [challenge("hello", "Hello world", 1), challenge("fizz", "FizzBuzz", 2)]
+        self.version = 1
+        self.loads = 0
+        self.down = False
+
+    async def execute(self, query):
+        if self.down:
+            raise ConnectionError("database unreachable")
+        if query.path == "/catalog_version":
+            return SimpleNamespace(data=[{"version": self.version, "updated_at": "2024-02-01T00:00:00+00:00"}])
+        self.loads += 1
+        return SimpleNamespace(data=list(self.challenges))
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(challenge_catalog, "execute", database.execute)
+    return database
+
+@pytest.fixture
+async def catalog(database, clock):
+    catalog = ChallengeCatalog(AsyncPostgrestClient("http://db.invalid"), check_interval=5, ttl=300)
+    yield catalog
+    await catalog.close()
+
+async def listed(catalog: ChallengeCatalog, search=None):
+    page, _, _, _ = await catalog.list(ChallengeFilters(search=search, per_page=100))
+    return [item.id for item in page]
+
+async def refreshed(catalog: ChallengeCatalog):
+    """Let the check started by the next read finish"""
+    await catalog.get("hello")
+    if catalog._refresh_task is not None:
+        await catalog._refresh_task
+
+async def test_first_read_loads_the_catalog(catalog, database):
+    assert await listed(catalog) == ["hello", "fizz"]
+    assert await listed(catalog, "fizz") == ["fizz"]
+    assert await catalog.current_version() == (1, catalog.updated_at)
+    assert database.loads == 1
+
+async def test_writes_are_served_before_the_next_reload(catalog, database):
+    await listed(catalog)
+    catalog.put(Challenge(**challenge("loops", "Loops", 0)))
+    catalog.put(Challenge(**challenge("fizz", "Fizz counter", 3)))
+    catalog.remove("hello")
+
+    assert await listed(catalog) == ["loops", "fizz"]
+    assert await listed(catalog, "fizzbuzz") == []
+    assert await listed(catalog, "counter") == ["fizz"]
+    assert await catalog.get("hello") is None
+    assert database.loads == 1
+
+async def test_write_invalidates_the_version_until_reloaded(catalog, database):
+    await listed(catalog)
+    database.challenges.append(challenge("loops", "Loops", 0))
+    database.version = 2
+    catalog.put(Challenge(**database.challenges[-1]))
+    # The local copy matches no version, so nothing may be validated against it
+    assert await catalog.current_version() is None
+
+    # A write makes the next read check right away, without waiting for the interval
+    await refreshed(catalog)
+    assert (await catalog.current_version())[0] == 2
+    assert database.loads == 2
+
+async def test_new_version_rebuilds_the_search_index(catalog, database, clock):
+    await listed(catalog)
+    database.challenges = [challenge("hello", "Greeting", 1)]
+    database.version = 2
+
+    clock.now += 4
+    await refreshed(catalog)
+    assert database.loads == 1
+    assert await listed(catalog, "hello") == ["hello"]
+
+    clock.now += 1
+    await refreshed(catalog)
+    assert database.loads == 2
+    assert await listed(catalog, "hello") == []
+    assert await listed(catalog, "greeting") == ["hello"]
+    assert await listed(catalog, "fizz") == []
+
+async def test_unchanged_version_is_not_reloaded_until_the_ttl(catalog, database, clock):
+    await listed(catalog)
+    clock.now += 5
+    await refreshed(catalog)
+    assert database.loads == 1
+
+    clock.now += 300
+    await refreshed(catalog)
+    assert database.loads == 2
+
+async def test_cached_copy_is_served_while_the_database_is_down(catalog, database, clock):
+    await listed(catalog)
+    database.down = True
+    clock.now += 5
+    await refreshed(catalog)
+    assert await listed(catalog) == ["hello", "fizz"]
+    assert catalog._refresh_task is None
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import tempfile
+import pytest
+from utils.container_pool import SHM_TMPFS_OPTIONS, ContainerPool, ContainerPoolExhausted
+
+@pytest.fixture
+async def pools(docker_client, monkeypatch, tmp_path):
+    """Makes pools on the fake Docker host, with their sources under tmp_path"""
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    created = []
+
+    def make(**kwargs) -> ContainerPool:
+        kwargs = {"min_size": 1, "max_size": 2, "max_runs": 2, "acquire_timeout": 0.05, **kwargs}
+        created.append(ContainerPool(docker_client, "sandbox", **kwargs))
+        return created[-1]
+
+    yield make
+    for containers in created:
+        await asyncio.gather(*containers._tasks)
+        await containers.close()
+
+async def test_containers_get_a_small_shm(docker_client, pools):
+    await pools().start()
+    [(_, options)] = docker_client.containers.started
+    assert options["tmpfs"] == {"/dev/shm": SHM_TMPFS_OPTIONS}
+    assert options["read_only"] and options["network_disabled"]
+    assert options["user"] == "nobody"
+
+async def test_release_wipes_sources_and_scratch_paths(docker_client, pools):
+    containers = pools()
+    slot = await containers.acquire()
+    with open(os.path.join(slot.workdir, "main.dart"), "w") as f:
+        f.write("void main() {}")
+    slot.runs += 1
+    await containers.release(slot)
+
+    assert os.listdir(slot.workdir) == []
+    [(container_id, cmd, user)] = docker_client.api.execs
+    assert container_id == slot.container.id
+    assert cmd == ["find", "/dev/shm", "/dev/mqueue", "-mindepth", "1", "-delete"]
+    assert user == "root"
+    assert containers.idle_count == 1
+
+async def test_uploaded_sources_are_wiped_in_the_container(docker_client, pools):
+    containers = pools(upload_sources=True)
+    slot = await containers.acquire()
+    slot.runs += 1
+    await containers.release(slot)
+    [(_, cmd, _)] = docker_client.api.execs
+    assert cmd[:4] == ["find", "/dev/shm", "/dev/mqueue", "/app"]
+
+async def test_container_is_recycled_when_the_wipe_fails(docker_client, pools):
+    containers = pools()
+    slot = await containers.acquire()
+    docker_client.api.exit_code = 1
+    await containers.release(slot)
+    assert slot.container.removed
+    assert slot not in containers._idle
+
+async def test_container_is_recycled_with_leftover_processes(docker_client, pools):
+    containers = pools()
+    slot = await containers.acquire()
+    slot.container.processes.append(["nobody", "dart fork-bomb.dart"])
+    await containers.release(slot)
+    assert slot.container.removed
+
+async def test_container_is_recycled_after_max_runs(docker_client, pools):
+    containers = pools()
+    slot = await containers.acquire()
+    slot.runs = 2
+    await containers.release(slot)
+    assert slot.container.removed
+    assert docker_client.api.execs == []
+
+async def test_acquire_waits_for_a_free_container(docker_client, pools):
+    containers = pools()
+    await containers.acquire()
+    await containers.acquire()
+    with pytest.raises(ContainerPoolExhausted):
+        await containers.acquire()
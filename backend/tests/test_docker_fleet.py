@@ -0,0 +1,108 @@
+import tempfile
+import pytest
+from utils.container_pool import DEFAULT_IMAGE, SANDBOX_IMAGE, ContainerPool
+from utils.docker_fleet import CONSISTENT_HASH, DockerFleet, DockerHost, NoSandboxHost
+
+@pytest.fixture
+async def fleets(docker_daemons, monkeypatch, tmp_path):
+    """Makes fleets of fake Docker hosts named a and b, with one warm container each"""
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    created = []
+
+    def make(max_size: int = 1, **kwargs) -> DockerFleet:
+        hosts = []
+        for name in ("a", "b"):
+            client = docker_daemons(name)
+            pool = ContainerPool(client, DEFAULT_IMAGE, min_size=1, max_size=max_size, acquire_timeout=0.05)
+            hosts.append(DockerHost(name, client, pool))
+        created.append(DockerFleet(hosts, check_interval=60, **kwargs))
+        return created[-1]
+
+    yield make
+    for fleet in created:
+        await fleet.close()
+
+def key_for(fleet: DockerFleet, name: str) -> str:
+    """A placement key whose home on the hash ring is the named host"""
+    return next(key for key in map(str, range(100)) if fleet._ring_order(key)[0].name == name)
+
+async def test_health_check_finds_the_sandbox_image(fleets):
+    fleet = fleets()
+    a, b = fleet.hosts
+    b.client.images.ids = {}
+    assert a.image_id is None
+
+    await fleet.start()
+    assert (a.pool.image_name, a.image_id) == (SANDBOX_IMAGE, "sha256:sandbox")
+    # Not pulled yet, so there is nothing to identify its contents by
+    assert (b.pool.image_name, b.image_id) == (DEFAULT_IMAGE, None)
+
+async def test_unreachable_host_is_suspended_until_it_answers(fleets):
+    fleet = fleets()
+    a, _ = fleet.hosts
+    await fleet.start()
+    assert a.pool.idle_count == 1
+
+    a.client.reachable = False
+    await fleet._check(a)
+    assert not a.healthy and "a is down" in a.last_error
+    assert a.pool.idle_count == 0 and a.pool.size == 0
+
+    a.client.reachable = True
+    await fleet._check(a)
+    assert a.healthy and a.last_error is None
+    assert a.pool.idle_count == 1
+
+async def test_runs_fail_over_from_an_unreachable_host(fleets):
+    fleet = fleets()
+    a, b = fleet.hosts
+    a.client.reachable = False
+    await fleet.start()
+
+    slot = await fleet.acquire()
+    assert slot.client is b.client
+    await fleet.release(slot)
+
+async def test_host_that_cannot_start_a_container_is_skipped(fleets):
+    fleet = fleets(max_size=2, placement=CONSISTENT_HASH)
+    a, b = fleet.hosts
+    await fleet.start()
+    # Its warm container is in use, and the daemon dies before it can start another
+    taken = await a.pool.acquire()
+    a.client.reachable = False
+
+    slot = await fleet.acquire(key_for(fleet, "a"))
+    assert slot.client is b.client
+    assert not a.healthy
+    await fleet.release(slot)
+    await a.pool.release(taken)
+
+async def test_consistent_hash_keeps_a_key_on_its_host(fleets):
+    fleet = fleets(placement=CONSISTENT_HASH)
+    await fleet.start()
+    for name in ("a", "b"):
+        for _ in range(3):
+            slot = await fleet.acquire(key_for(fleet, name))
+            assert slot.client is fleet._host(name).client
+            await fleet.release(slot)
+
+async def test_consistent_hash_moves_past_a_full_host(fleets):
+    fleet = fleets(placement=CONSISTENT_HASH)
+    await fleet.start()
+    key = key_for(fleet, "a")
+    held = await fleet.acquire(key)
+    assert held.client is fleet._host("a").client
+
+    slot = await fleet.acquire(key)
+    assert slot.client is fleet._host("b").client
+    assert await fleet.acquire(key, wait=False) is None
+    await fleet.release(slot)
+    await fleet.release(held)
+
+async def test_no_available_host(fleets):
+    fleet = fleets()
+    for host in fleet.hosts:
+        host.client.reachable = False
+    await fleet.start()
+    with pytest.raises(NoSandboxHost):
+        await fleet.acquire()
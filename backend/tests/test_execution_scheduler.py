@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api.routes import execute_code
+from models.submission import ExecutionJobStatus
+from utils import auth
+from utils.execution_scheduler import ExecutionQueueFull, ExecutionScheduler
+from utils.result_cache import ResultCache
+
+class FakeRunner:
+    """Runs nothing; each run takes ``run_seconds`` of sandbox time and waits for ``gate``"""
+
+    image_id = "sha256:sandbox"
+
+    def __init__(self, run_seconds: float = 2.5):
+        self.run_seconds = run_seconds
+        self.gate = asyncio.Event()
+        self.started = []
+
+    async def run_code(self, code, test_script=None, output=None, timer=None):
+        self.started.append(code)
+        await self.gate.wait()
+        timer.add("startup", 0.5)
+        timer.add("run", self.run_seconds)
+        return {"success": True, "exit_code": 0, "output": code, "errors": None,
+                "execution_time": self.run_seconds, "test_results": None, "phases": timer.phases}
+
+@pytest.fixture
+async def scheduler():
+    scheduler = ExecutionScheduler(FakeRunner(), concurrency=1, max_queue_depth=2, job_ttl=60)
+    await scheduler.start()
+    yield scheduler
+    scheduler.runner.gate.set()
+    await scheduler.close()
+
+async def started(scheduler, count: int):
+    while len(scheduler.runner.started) < count:
+        await asyncio.sleep(0)
+
+async def test_pro_jobs_jump_the_queue(scheduler):
+    await scheduler.submit("first")
+    await started(scheduler, 1)
+    free = await scheduler.submit("free")
+    pro = await scheduler.submit("pro", is_pro=True)
+
+    scheduler.runner.gate.set()
+    await asyncio.gather(pro.done.wait(), free.done.wait())
+    assert scheduler.runner.started == ["first", "pro", "free"]
+
+async def test_full_queue_is_rejected_with_a_retry_estimate(scheduler):
+    await scheduler.submit("running")
+    await started(scheduler, 1)
+    await scheduler.submit("queued 1")
+    await scheduler.submit("queued 2")
+    with pytest.raises(ExecutionQueueFull) as exc:
+        await scheduler.submit("one too many")
+    # Two waiting and one running on one worker, at the initial 1s estimate
+    assert exc.value.retry_after == 3
+
+async def test_sandbox_seconds_are_charged_after_the_run(scheduler):
+    charges = []
+
+    async def charge(seconds):
+        charges.append(seconds)
+
+    scheduler.runner.gate.set()
+    result = await scheduler.run("code", charge=charge)
+    assert result["success"]
+    assert charges == [3.0]
+
+async def test_cancelled_queued_job_is_charged_nothing(scheduler):
+    charges = []
+
+    async def charge(seconds):
+        charges.append(seconds)
+
+    await scheduler.submit("running")
+    await started(scheduler, 1)
+    job = await scheduler.submit("queued", charge=charge)
+    scheduler.cancel(job)
+    scheduler.runner.gate.set()
+    await job.done.wait()
+    assert job.status == ExecutionJobStatus.CANCELLED
+    assert charges == []
+
+async def test_jobs_are_only_visible_to_their_owner(scheduler):
+    job = await scheduler.submit("code", owner="user:a")
+    assert scheduler.get_job(job.id, "user:a") is job
+    assert scheduler.get_job(job.id, "user:b") is None
+    assert scheduler.get_job(job.id) is None
+
+async def test_results_are_cached_per_image():
+    scheduler = ExecutionScheduler(FakeRunner(), ResultCache(redis_url=""))
+    await scheduler.start()
+    scheduler.runner.gate.set()
+    await scheduler.run("code")
+    assert (await scheduler.run("code"))["cached"]
+
+    scheduler.runner.image_id = "sha256:rebuilt"
+    assert "cached" not in await scheduler.run("code")
+    assert scheduler.runner.started == ["code", "code"]
+    await scheduler.close()
+
+async def test_nothing_is_cached_while_the_image_is_unknown():
+    scheduler = ExecutionScheduler(FakeRunner(), ResultCache(redis_url=""))
+    scheduler.runner.image_id = None
+    await scheduler.start()
+    scheduler.runner.gate.set()
+    await scheduler.run("code")
+    assert "cached" not in await scheduler.run("code")
+    assert scheduler.cache._entries == {}
+    await scheduler.close()
+
+@pytest.fixture
+def client(monkeypatch):
+    """The execute routes, with callers named by an X-Test-User header"""
+    monkeypatch.setattr(auth, "authenticated_user_id", lambda request: request.headers.get("x-test-user"))
+    app = FastAPI()
+    app.include_router(execute_code.router, prefix="/api")
+    with TestClient(app) as client:
+        yield client
+
+def test_full_queue_answers_503_with_retry_after(client):
+    client.app.state.execution_scheduler = ExecutionScheduler(FakeRunner(), max_queue_depth=0)
+    response = client.post("/api/execute/jobs", json={"code": "void main() {}"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+def test_other_users_cannot_poll_a_job(client):
+    client.app.state.execution_scheduler = ExecutionScheduler(FakeRunner())
+    job = client.post("/api/execute/jobs", json={"code": "void main() {}"}, headers={"x-test-user": "a"}).json()
+
+    assert client.get(f"/api/execute/jobs/{job['id']}", headers={"x-test-user": "a"}).status_code == 200
+    assert client.get(f"/api/execute/jobs/{job['id']}", headers={"x-test-user": "b"}).status_code == 404
+    assert client.get(f"/api/execute/jobs/{job['id']}").status_code == 404
@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api.routes import challenges
+from models.challenge import Challenge, ChallengeList, ChallengeSummary
+
+UPDATED_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+class FakeChallengeService:
+    def __init__(self, version=1):
+        self.version = version
+        self.challenge = Challenge(
+            id="c1", title="Counter", description="Count", starter_code="void main() {}",
+            test_script="void main() {}", created_at=UPDATED_AT, updated_at=UPDATED_AT
+        )
+
+    async def get_catalog_version(self):
+        return (self.version, UPDATED_AT) if self.version is not None else (None, None)
+
+    async def get_challenge_by_id(self, challenge_id):
+        return self.challenge if challenge_id == self.challenge.id else None
+
+    async def get_challenges(self, filters, user_is_pro, fields):
+        fields = fields or ["id", "title"]
+        summary = ChallengeSummary(**{field: getattr(self.challenge, field) for field in fields})
+        return ChallengeList(challenges=[summary], total=1, page=1, per_page=10, has_next=False, has_prev=False)
+
+@pytest.fixture
+def service():
+    return FakeChallengeService()
+
+@pytest.fixture
+def client(service):
+    app = FastAPI()
+    app.include_router(challenges.router, prefix="/api")
+    app.dependency_overrides[challenges.get_challenge_service] = lambda: service
+    return TestClient(app)
+
+def test_listing_is_public_and_revalidates(client):
+    response = client.get("/api/challenges")
+    assert response.headers["cache-control"].startswith("public,")
+    again = client.get("/api/challenges", headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+
+def test_challenge_detail_is_private(client):
+    response = client.get("/api/challenges/c1")
+    assert response.json()["test_script"]
+    assert response.headers["cache-control"].startswith("private,")
+    again = client.get("/api/challenges/c1", headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+    assert again.headers["cache-control"].startswith("private,")
+
+def test_listing_with_detail_fields_is_private(client):
+    summary = client.get("/api/challenges", params={"fields": "id,title"})
+    assert summary.headers["cache-control"].startswith("public,")
+    detail = client.get("/api/challenges", params={"fields": "id,test_script"})
+    assert detail.headers["cache-control"].startswith("private,")
+
+def test_missing_challenge_is_not_found_even_when_conditional(client):
+    response = client.get("/api/challenges/missing", headers={"If-None-Match": "*"})
+    assert response.status_code == 404
+
+def test_no_validators_without_a_catalog_version(client, service):
+    service.version = None
+    response = client.get("/api/challenges")
+    assert "etag" not in response.headers
+    assert "last-modified" not in response.headers
+    assert response.headers["cache-control"].startswith("public,")
+    for headers in ({"If-None-Match": "*"}, {"If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT"}):
+        assert client.get("/api/challenges", headers=headers).status_code == 200
@@ -0,0 +1,113 @@
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from postgrest import AsyncPostgrestClient
+from services import submission_service
+from services.submission_service import SubmissionService
+from utils.pagination import (
+    NEXT, PREV, InvalidCursor, decode_cursor, encode_cursor, keyset_filter, keyset_order
+)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SEEK = re.compile(
+    r'\(created_at\.(lt|gt)\."([^"]*)",and\(created_at\.eq\."[^"]*",id\.(?:lt|gt)\."([^"]*)"\)\)'
+)
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+class FakeSubmissions:
+    """Answers submission queries from a list of rows, as PostgREST would"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, query):
+        params = query.params
+        rows = [row for row in self.rows if params["user_id"] == f"eq.{row['user_id']}"]
+        if "or" in params:
+            operator, created_at, row_id = SEEK.fullmatch(params["or"]).groups()
+            key = (datetime.fromisoformat(created_at), row_id)
+            rows = [
+                row for row in rows
+                if (self._key(row) < key if operator == "lt" else self._key(row) > key)
+            ]
+        rows.sort(key=self._key, reverse=params["order"] == "created_at.desc,id.desc")
+        return FakeResponse([dict(row) for row in rows[:int(params["limit"])]])
+
+    @staticmethod
+    def _key(row):
+        return datetime.fromisoformat(row["created_at"]), row["id"]
+
+def submission_row(index: int, created_at: datetime) -> dict:
+    return {
+        "id": str(uuid.UUID(int=index)),
+        "user_id": "user-1",
+        "challenge_id": "challenge-1",
+        "code_hash": "0" * 64,
+        "result": None,
+        "is_successful": False,
+        "created_at": created_at.isoformat(),
+    }
+
+@pytest.fixture
+def service(monkeypatch):
+    # Rows 2 and 3 share a timestamp, so pages must break the tie on id
+    times = [START, START + timedelta(minutes=1), START + timedelta(minutes=2),
+             START + timedelta(minutes=2), START + timedelta(minutes=3)]
+    rows = [submission_row(index, created_at) for index, created_at in enumerate(times)]
+    rows.append({**submission_row(9, START), "user_id": "user-2"})
+    monkeypatch.setattr(submission_service, "execute", FakeSubmissions(rows).execute)
+    return SubmissionService(AsyncPostgrestClient("http://db.invalid"))
+
+def ids(page):
+    return [uuid.UUID(s.id).int for s in page.submissions]
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(("2024-01-01T00:00:00+00:00", "abc"), PREV)
+    assert decode_cursor(cursor) == (["2024-01-01T00:00:00+00:00", "abc"], PREV)
+    assert "=" not in cursor
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "e30", encode_cursor((1,)), encode_cursor((1, 2), "up")])
+def test_malformed_cursors(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+@pytest.mark.parametrize("key", [
+    (1, 2),
+    ("2024-01-01T00:00:00", str(uuid.UUID(int=1))),
+    ("yesterday", str(uuid.UUID(int=1))),
+    ("2024-01-01T00:00:00+00:00", '"),or(id.gt.0'),
+    ("2024-01-01T00:00:00+00:00", None),
+])
+def test_submission_cursor_keys_are_type_checked(key):
+    with pytest.raises(InvalidCursor):
+        SubmissionService._decode_cursor(encode_cursor(key))
+
+def test_keyset_filter_quotes_values():
+    query = AsyncPostgrestClient("http://db.invalid").table("t").select("*")
+    query = keyset_order(keyset_filter(query, ("a", "b"), ("x,y", 'q"z'), "gt"), ("a", "b"), desc=True)
+    assert query.params["or"] == '(a.gt."x,y",and(a.eq."x,y",b.gt."q\\"z"))'
+    assert query.params["order"] == "a.desc,b.desc"
+
+async def test_paging_forward_and_back(service):
+    first = await service.get_user_submissions("user-1", limit=2)
+    assert ids(first) == [4, 3]
+    assert first.prev_cursor is None
+
+    second = await service.get_user_submissions("user-1", cursor=first.next_cursor, limit=2)
+    assert ids(second) == [2, 1]
+
+    last = await service.get_user_submissions("user-1", cursor=second.next_cursor, limit=2)
+    assert ids(last) == [0]
+    assert last.next_cursor is None
+
+    back = await service.get_user_submissions("user-1", cursor=last.prev_cursor, limit=2)
+    assert ids(back) == [2, 1]
+    assert back.next_cursor is not None
+
+    start = await service.get_user_submissions("user-1", cursor=back.prev_cursor, limit=2)
+    assert ids(start) == [4, 3]
+    assert start.prev_cursor is None
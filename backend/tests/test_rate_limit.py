@@ -0,0 +1,125 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+import pytest
+from config import settings
+from utils import rate_limit
+from utils.auth import verify_access_token
+from utils.rate_limit import Budget, RateLimiter, RateLimitExceeded, rate_limit_headers
+
+# 3 tokens, refilled at one every 10 seconds
+REQUESTS = Budget("requests", 3, 30)
+SECONDS = Budget("seconds", 10, 100, cost=0)
+SECRET = "test-secret"
+
+@pytest.fixture
+def limiter():
+    return RateLimiter(redis_url="")
+
+def access_token(claims, secret=SECRET, alg="HS256") -> str:
+    def encode(data) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    signing_input = f"{encode({'alg': alg, 'typ': 'JWT'})}.{encode(claims)}"
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{base64.urlsafe_b64encode(signature).decode().rstrip('=')}"
+
+async def test_bucket_empties_then_refills(clock, limiter):
+    for remaining in (2, 1, 0):
+        [state] = await limiter.hit("client", [REQUESTS])
+        assert state.remaining == remaining
+
+    with pytest.raises(RateLimitExceeded) as exc:
+        await limiter.hit("client", [REQUESTS])
+    assert exc.value.state.retry_after == 10
+
+    clock.now += 10
+    [state] = await limiter.hit("client", [REQUESTS])
+    assert state.allowed
+
+async def test_refill_stops_at_capacity(clock, limiter):
+    await limiter.hit("client", [REQUESTS])
+    clock.now += 3600
+    [state] = await limiter.hit("client", [REQUESTS])
+    assert state.tokens == 2
+    assert state.reset == 10
+
+async def test_clients_have_separate_buckets(clock, limiter):
+    for _ in range(3):
+        await limiter.hit("a", [REQUESTS])
+    [state] = await limiter.hit("b", [REQUESTS])
+    assert state.remaining == 2
+
+async def test_pro_buckets_are_larger(clock, limiter):
+    [state] = await limiter.hit("client", [REQUESTS], is_pro=True)
+    assert state.limit == 3 * settings.RATE_LIMIT_PRO_MULTIPLIER
+    assert state.rate == pytest.approx(REQUESTS.rate(False) * settings.RATE_LIMIT_PRO_MULTIPLIER)
+
+async def test_charge_goes_into_debt(clock, limiter):
+    await limiter.hit("client", [SECONDS])
+    await limiter.charge("client", SECONDS, 25)
+
+    with pytest.raises(RateLimitExceeded) as exc:
+        await limiter.hit("client", [SECONDS])
+    # 15 seconds of debt plus the one a request needs, refilled at 0.1/s
+    assert exc.value.state.tokens == -15
+    assert exc.value.state.retry_after == 160
+
+    clock.now += 159
+    with pytest.raises(RateLimitExceeded):
+        await limiter.hit("client", [SECONDS])
+    clock.now += 1
+    [state] = await limiter.hit("client", [SECONDS])
+    assert state.allowed
+
+async def test_nothing_is_taken_after_a_spent_budget(clock, limiter):
+    await limiter.charge("client", SECONDS, 20)
+    with pytest.raises(RateLimitExceeded) as exc:
+        await limiter.hit("client", [SECONDS, REQUESTS])
+    assert [state.budget for state in exc.value.states] == [SECONDS]
+
+    clock.now += 200
+    states = await limiter.hit("client", [SECONDS, REQUESTS])
+    assert states[1].remaining == 2
+
+async def test_least_recent_clients_are_forgotten(clock):
+    limiter = RateLimiter(max_keys=2, redis_url="")
+    for _ in range(3):
+        await limiter.hit("a", [REQUESTS])
+    await limiter.hit("b", [REQUESTS])
+    await limiter.hit("c", [REQUESTS])
+    [state] = await limiter.hit("a", [REQUESTS])
+    assert state.remaining == 2
+
+def test_headers_describe_the_closest_budget(clock, limiter):
+    states = [
+        rate_limit.BucketState(REQUESTS, False, 2.5, True),
+        rate_limit.BucketState(SECONDS, False, 1, True),
+    ]
+    headers = rate_limit_headers(states)
+    assert headers["RateLimit-Limit"] == "10"
+    assert headers["RateLimit-Remaining"] == "1"
+    assert headers["RateLimit-Reset"] == "90"
+    assert headers["RateLimit-Policy"] == '3;w=30;comment="requests", 10;w=100;comment="seconds"'
+
+def test_valid_access_token():
+    token = access_token({"sub": "user-1", "exp": time.time() + 60})
+    assert verify_access_token(token, SECRET) == "user-1"
+
+@pytest.mark.parametrize("token", [
+    access_token({"sub": "user-1", "exp": time.time() + 60}, secret="other-secret"),
+    access_token({"sub": "user-1", "exp": time.time() + 60}, alg="none"),
+    access_token({"sub": "user-1", "exp": time.time() - 1}),
+    access_token({"sub": "user-1"}),
+    access_token({"sub": "", "exp": time.time() + 60}),
+    access_token(["user-1"]),
+    "not.a.token",
+    "",
+])
+def test_invalid_access_tokens(token):
+    assert verify_access_token(token, SECRET) is None
+
+def test_no_secret_verifies_nothing():
+    token = access_token({"sub": "user-1", "exp": time.time() + 60}, secret="")
+    assert verify_access_token(token, "") is None
@@ -0,0 +1,55 @@
+from utils.result_cache import DART_COMPILE_ERROR_EXIT_CODE, ResultCache, is_deterministic
+
+CODE = "void main() => print(1 + 1);"
+
+def test_deterministic_code():
+    assert is_deterministic(CODE)
+    assert is_deterministic(CODE, "void main() { expect(add(1, 1), 2); }")
+
+def test_nondeterministic_apis_in_code_or_tests():
+    assert not is_deterministic("void main() => print(DateTime.now());")
+    assert not is_deterministic("void main() => print(DateTime . timestamp());")
+    assert not is_deterministic("import 'dart:math'; void main() => print(Random().nextInt(6));")
+    assert not is_deterministic(CODE, "final watch = Stopwatch()..start();")
+    assert not is_deterministic("void main() => print(Object().hashCode);")
+
+def test_whole_words_only():
+    assert is_deterministic("final randomness = 4; final nowhere = DateTime(2024);")
+
+def test_successful_deterministic_run_is_cacheable():
+    assert ResultCache.is_cacheable({"success": True, "exit_code": 0}, CODE)
+
+def test_failed_run_is_not_cacheable():
+    assert not ResultCache.is_cacheable({"success": False, "exit_code": 1}, CODE)
+
+def test_nondeterministic_run_is_not_cacheable():
+    result = {"success": True, "exit_code": 0}
+    assert not ResultCache.is_cacheable(result, "void main() => print(DateTime.now());")
+    assert not ResultCache.is_cacheable(result, CODE, "final r = Random();")
+
+def test_compile_error_is_always_cacheable():
+    result = {"success": False, "exit_code": DART_COMPILE_ERROR_EXIT_CODE}
+    assert ResultCache.is_cacheable(result, "void main() => print(DateTime.now())")
+
+async def test_entries_expire_after_ttl(clock):
+    cache = ResultCache(ttl=60, redis_url="")
+
+    await cache.set("key", {"output": "2"})
+    clock.now += 59
+    assert await cache.get("key") == {"output": "2"}
+
+    clock.now += 2
+    assert await cache.get("key") is None
+    assert cache._bytes == 0
+
+async def test_lru_eviction_by_count_and_size():
+    cache = ResultCache(max_entries=2, max_bytes=1000, redis_url="")
+    await cache.set("a", {"output": "a"})
+    await cache.set("b", {"output": "b"})
+    await cache.get("a")
+    await cache.set("c", {"output": "c"})
+    assert await cache.get("b") is None
+    assert await cache.get("a") is not None
+
+    await cache.set("big", {"output": "x" * 2000})
+    assert await cache.get("big") is None
@@ -0,0 +1,83 @@
+import hashlib
+import tempfile
+import threading
+import time
+import pytest
+from utils.container_pool import ContainerPool
+from utils.docker_fleet import DockerFleet, DockerHost
+from utils.sandbox_runner import DartCodeRunner
+
+TESTS = "import 'fluence_test.dart';\nvoid main() {}\n"
+
+class FakeShards:
+    """Stands in for _execute_in_container, recording the shards it ran"""
+
+    def __init__(self, fail_shard=None):
+        self.fail_shard = fail_shard
+        self.calls = []
+        self._lock = threading.Lock()
+        self._others_done = threading.Event()
+
+    def __call__(self, slot, code, harness, output, timer, shard=0, shards=1):
+        with self._lock:
+            self.calls.append((shard, shards))
+        if shard == self.fail_shard:
+            # Fail last, so the other shards have results to keep
+            self._others_done.wait(5)
+            time.sleep(0.05)
+            raise RuntimeError("Docker went away")
+        self._others_done.set()
+        return {
+            "exit_code": 0,
+            "stdout": f"shard {shard}\n",
+            "stderr": "",
+            "test_results": [{"index": shard, "name": f"test {shard}", "passed": True}],
+            "registered": 4,
+        }
+
+@pytest.fixture
+async def runner(docker_client, monkeypatch, tmp_path):
+    """A runner with one fake Docker host of at most two containers"""
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    runner = DartCodeRunner(docker_client)
+    pool = ContainerPool(docker_client, "sandbox", runner.executor, min_size=0, max_size=2, acquire_timeout=0.05)
+    runner.fleet = DockerFleet([DockerHost("local", docker_client, pool)])
+    # As if an earlier run had reported the script's four tests
+    runner._remember_test_count(hashlib.sha256(TESTS.encode()).hexdigest(), 4)
+    yield runner
+    await runner.close()
+
+async def test_first_run_of_a_script_is_not_sharded(runner, monkeypatch):
+    shards = FakeShards()
+    monkeypatch.setattr(runner, "_execute_in_container", shards)
+    other = "import 'fluence_test.dart';\nvoid main() { test('a', () {}); }\n"
+    await runner.run_code("void main() {}", other)
+    assert shards.calls == [(0, 1)]
+
+async def test_shards_only_use_free_containers(runner, monkeypatch):
+    shards = FakeShards()
+    monkeypatch.setattr(runner, "_execute_in_container", shards)
+    result = await runner.run_code("void main() {}", TESTS)
+    assert sorted(shards.calls) == [(0, 2), (1, 2)]
+    assert result["success"]
+    assert [case["index"] for case in result["test_results"]] == [0, 1]
+    assert runner.fleet.hosts[0].active == 0
+
+async def test_busy_fleet_runs_fewer_shards_instead_of_waiting(runner, monkeypatch):
+    shards = FakeShards()
+    monkeypatch.setattr(runner, "_execute_in_container", shards)
+    held = await runner.fleet.acquire()
+    result = await runner.run_code("void main() {}", TESTS)
+    assert shards.calls == [(0, 1)]
+    assert result["success"]
+    await runner.fleet.release(held)
+
+async def test_failed_shard_keeps_the_other_results(runner, monkeypatch):
+    shards = FakeShards(fail_shard=1)
+    monkeypatch.setattr(runner, "_execute_in_container", shards)
+    result = await runner.run_code("void main() {}", TESTS)
+    assert not result["success"]
+    assert "Execution error: Docker went away" in result["errors"]
+    assert result["output"] == "shard 0\n"
+    assert [case["index"] for case in result["test_results"]] == [0]
+    assert runner.fleet.hosts[0].active == 0
@@ -0,0 +1,53 @@
+from services.search_index import SearchIndex, tokenize
+
+def index() -> SearchIndex:
+    search = SearchIndex()
+    search.add("counter", "Counter widget", "Build a stateful counter with a button.")
+    search.add("list", "Todo list", "Render a list of todos, each with a counter badge.")
+    search.add("async", "Async streams", "Consume a stream of events.")
+    return search
+
+def ranked(scores):
+    return sorted(scores, key=scores.get, reverse=True)
+
+def test_tokenize_folds_case_and_drops_punctuation():
+    assert tokenize("Flutter's StreamBuilder, 2 ways!") == ["flutter", "s", "streambuilder", "2", "ways"]
+
+def test_title_matches_rank_above_description_matches():
+    assert ranked(index().search("counter")) == ["counter", "list"]
+
+def test_whole_words_rank_above_prefixes():
+    search = SearchIndex()
+    search.add("prefix", "Streams", "")
+    search.add("whole", "Stream", "")
+    assert ranked(search.search("stream")) == ["whole", "prefix"]
+
+def test_rare_words_weigh_more():
+    search = SearchIndex()
+    search.add("common", "Widget layout", "")
+    search.add("rare", "Widget animation", "")
+    search.add("other", "Layout grid", "")
+    scores = search.search("widget")
+    assert scores["common"] == scores["rare"]
+    assert search.search("animation")["rare"] > search.search("layout")["common"]
+
+def test_every_query_word_must_match():
+    search = index()
+    assert set(search.search("counter list")) == {"list"}
+    assert search.search("counter stream") == {}
+
+def test_prefixes_match_for_typeahead():
+    assert set(index().search("coun")) == {"counter", "list"}
+    assert set(index().search("str")) == {"async"}
+
+def test_queries_without_words_match_nothing():
+    assert index().search("") == {}
+    assert index().search("!?") == {}
+
+def test_updated_and_removed_challenges():
+    search = index()
+    search.add("counter", "Timer widget", "Tick every second.")
+    assert set(search.search("counter")) == {"list"}
+    search.remove("list")
+    assert search.search("counter") == {}
+    assert "counter" not in search._terms
@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+from postgrest import APIError, AsyncPostgrestClient
+from services import submission_buffer
+from services.submission_buffer import SubmissionBuffer, SubmissionBufferFull
+from utils.metrics import SUBMISSIONS_REJECTED
+
+class FakePostgrest:
+    """Answers the buffer's inserts the way PostgREST and Postgres would
+
+    A row with a ``reject`` SQLSTATE fails any INSERT it is in, as does a
+    row whose id is already stored; a failing INSERT stores nothing.
+    """
+
+    def __init__(self):
+        self.stored = {}
+        self.inserts = []
+        self.dead_letters = []
+        # Calls that fail as if the database were unreachable
+        self.outages = 0
+        self.dead_letter_outages = 0
+
+    async def execute(self, query):
+        if query.path == "/submission_dead_letters":
+            if self.dead_letter_outages:
+                self.dead_letter_outages -= 1
+                raise ConnectionError("database unreachable")
+            self.dead_letters.append(query.json)
+            return
+        if self.outages:
+            self.outages -= 1
+            raise ConnectionError("database unreachable")
+
+        rows = query.json
+        self.inserts.append([row["id"] for row in rows])
+        for row in rows:
+            if row["id"] in self.stored:
+                raise APIError({"code": "23505", "message": "duplicate key value"})
+            if "reject" in row:
+                raise APIError({"code": row["reject"], "message": "invalid input"})
+        self.stored.update((row["id"], row) for row in rows)
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakePostgrest()
+    monkeypatch.setattr(submission_buffer, "execute", database.execute)
+    return database
+
+def make_buffer(**kwargs) -> SubmissionBuffer:
+    kwargs = {"max_batch": 3, "flush_interval": 0.05, "max_pending": 10, "enqueue_timeout": 0.05, **kwargs}
+    buffer = SubmissionBuffer(AsyncPostgrestClient("http://db.invalid"), **kwargs)
+    buffer.RETRY_DELAY = 0.01
+    return buffer
+
+async def eventually(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+def rejected_count(code: str) -> float:
+    return SUBMISSIONS_REJECTED.labels(code)._value.get()
+
+async def test_full_batch_is_inserted_at_once(database):
+    buffer = make_buffer(flush_interval=10)
+    await buffer.start()
+    for index in range(3):
+        await buffer.add({"id": f"s{index}"})
+    await eventually(lambda: len(database.stored) == 3)
+    assert database.inserts == [["s0", "s1", "s2"]]
+    await buffer.close()
+
+async def test_partial_batch_is_inserted_after_the_interval(database):
+    buffer = make_buffer()
+    await buffer.start()
+    await buffer.add({"id": "s0"})
+    await eventually(lambda: "s0" in database.stored)
+    await buffer.close()
+
+async def test_close_saves_queued_rows(database):
+    buffer = make_buffer()
+    for index in range(4):
+        await buffer.add({"id": f"s{index}"})
+    await buffer.close()
+    assert database.inserts == [["s0", "s1", "s2"], ["s3"]]
+    with pytest.raises(SubmissionBufferFull):
+        await buffer.add({"id": "late"})
+
+async def test_full_buffer_rejects_after_the_timeout(database):
+    buffer = make_buffer(max_pending=1)
+    await buffer.add({"id": "s0"})
+    with pytest.raises(SubmissionBufferFull):
+        await buffer.add({"id": "s1"})
+
+async def test_rejected_row_is_dead_lettered_and_the_rest_saved(database):
+    before = rejected_count("22P02")
+    buffer = make_buffer()
+    for row in ({"id": "s0"}, {"id": "s1", "reject": "22P02"}, {"id": "s2"}):
+        await buffer.add(row)
+    await buffer.close()
+
+    assert database.inserts == [["s0", "s1", "s2"], ["s0"], ["s1"], ["s2"]]
+    assert set(database.stored) == {"s0", "s2"}
+    [letter] = database.dead_letters
+    assert letter["submission_id"] == "s1"
+    assert letter["error_code"] == "22P02"
+    assert letter["payload"]["reject"] == "22P02"
+    assert rejected_count("22P02") == before + 1
+
+async def test_already_stored_rows_are_skipped(database):
+    database.stored["s0"] = {"id": "s0"}
+    buffer = make_buffer()
+    await buffer.add({"id": "s0"})
+    await buffer.add({"id": "s1"})
+    await buffer.close()
+    assert set(database.stored) == {"s0", "s1"}
+    assert database.dead_letters == []
+
+async def test_outage_is_retried_until_the_batch_is_saved(database):
+    database.outages = 2
+    buffer = make_buffer()
+    await buffer.start()
+    await buffer.add({"id": "s0"})
+    await eventually(lambda: "s0" in database.stored)
+    await buffer.close()
+
+async def test_failed_dead_letter_write_retries_the_batch(database):
+    database.dead_letter_outages = 1
+    buffer = make_buffer()
+    await buffer.start()
+    await buffer.add({"id": "s0"})
+    await buffer.add({"id": "s1", "reject": "23514"})
+    await eventually(lambda: database.dead_letters)
+    await buffer.close()
+
+    # The retry finds s0 already stored and skips it, then sets s1 aside once
+    assert set(database.stored) == {"s0"}
+    assert [letter["submission_id"] for letter in database.dead_letters] == ["s1"]
@@ -0,0 +1,80 @@
+import json
+from utils.sandbox_runner import DartCodeRunner
+from utils import test_harness
+
+NONCE = "3f9a1c"
+
+def report(data, nonce=NONCE) -> str:
+    return f"##fluence-test:{nonce} {json.dumps(data)}\n"
+
+def test_reports_are_split_from_output():
+    parser = test_harness.TestReportParser(NONCE)
+    output = parser.feed(
+        "hello\n"
+        + report({"index": 0, "name": "adds", "passed": True})
+        + report({"index": 1, "name": "subtracts", "passed": False, "error": "expected 1"})
+        + report({"done": True})
+    )
+    assert output == "hello\n"
+    assert [r["name"] for r in parser.results] == ["adds", "subtracts"]
+    assert parser.completed
+
+def test_report_split_across_chunks():
+    parser = test_harness.TestReportParser(NONCE)
+    line = report({"index": 0, "name": "adds", "passed": True})
+    assert parser.feed("out\n" + line[:10]) == "out\n"
+    assert parser.feed(line[10:]) == ""
+    assert [r["name"] for r in parser.results] == ["adds"]
+
+def test_trailing_output_without_newline():
+    parser = test_harness.TestReportParser(NONCE)
+    assert parser.feed("no newline") == ""
+    assert parser.flush() == "no newline"
+
+def test_forged_reports_are_program_output():
+    parser = test_harness.TestReportParser(NONCE)
+    forged = report({"index": 0, "name": "adds", "passed": True}, nonce="guess")
+    forged_done = report({"done": True}, nonce="")
+    assert parser.feed(forged + forged_done) == forged + forged_done
+    assert parser.results == []
+    assert not parser.completed
+
+def test_malformed_reports_are_dropped():
+    parser = test_harness.TestReportParser(NONCE)
+    prefix = f"##fluence-test:{NONCE} "
+    output = parser.feed(
+        prefix + "{not json\n"
+        + prefix + "[1, 2]\n"
+        + report({"name": 3, "passed": True})
+        + report({"name": "adds", "passed": "yes"})
+        + report({"done": "true"})
+        + report({"registered": "4"})
+    )
+    assert output == ""
+    assert parser.results == []
+    assert not parser.completed
+    assert parser.registered is None
+
+def test_registered_count_is_reported_once():
+    parser = test_harness.TestReportParser(NONCE)
+    parser.feed(report({"registered": 4}) + report({"registered": 9}))
+    assert parser.registered == 4
+
+def test_quiet_setup_drops_output_until_registration():
+    parser = test_harness.TestReportParser(NONCE, quiet_setup=True)
+    output = parser.feed("from main\n" + report({"registered": 2}) + "from a test\n")
+    assert output == "from a test\n"
+
+def test_merge_shards_keeps_shard_order_and_dedupes_cases():
+    main_failure = {"index": 0, "name": "main", "passed": False}
+    merged = DartCodeRunner._merge_shards([
+        {"exit_code": 0, "stdout": "a", "stderr": "", "registered": 3,
+         "test_results": [main_failure, {"index": 2, "name": "c", "passed": True}]},
+        {"exit_code": 1, "stdout": "b\n", "stderr": "boom", "registered": 3,
+         "test_results": [dict(main_failure), {"index": 1, "name": "b", "passed": False}]},
+    ])
+    assert merged["exit_code"] == 1
+    assert merged["stdout"] == "a\nb\n"
+    assert merged["stderr"] == "boom"
+    assert [case["index"] for case in merged["test_results"]] == [0, 1, 2]
+    assert merged["registered"] == 3
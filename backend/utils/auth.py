@@ -0,0 +1,75 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Optional
+from fastapi import Request
+from config import settings
+
+def verify_access_token(token: str, secret: str) -> Optional[str]:
+    """Return the user id (``sub``) of a valid, unexpired Supabase access token
+
+    Supabase signs access tokens with the project's JWT secret (HS256).
+    Anything else, including a token signed with another algorithm, gives None.
+    """
+    if not secret:
+        return None
+    try:
+        header_segment, payload_segment, signature_segment = token.split(".")
+        header = json.loads(_b64decode(header_segment))
+        if not isinstance(header, dict) or header.get("alg") != "HS256":
+            return None
+        expected = hmac.new(
+            secret.encode("utf-8"),
+            f"{header_segment}.{payload_segment}".encode("ascii"),
+            hashlib.sha256
+        ).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature_segment)):
+            return None
+        claims = json.loads(_b64decode(payload_segment))
+    except ValueError:
+        return None
+
+    if not isinstance(claims, dict):
+        return None
+    expires_at = claims.get("exp")
+    if not isinstance(expires_at, (int, float)) or expires_at <= time.time():
+        return None
+    user_id = claims.get("sub")
+    return user_id if isinstance(user_id, str) and user_id else None
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+class Caller:
+    """Who sent a request, as far as the server can verify it
+
+    ``user_id`` is only set from a valid access token, and ``is_pro`` is
+    read from the user's profile, never taken from the request itself.
+    """
+
+    def __init__(self, user_id: Optional[str] = None, is_pro: bool = False):
+        self.user_id = user_id
+        self.is_pro = is_pro
+
+def authenticated_user_id(request: Request) -> Optional[str]:
+    """User id from the request's ``Authorization: Bearer`` access token, if valid"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return verify_access_token(token.strip(), settings.SUPABASE_JWT_SECRET)
+
+async def get_caller(request: Request) -> Caller:
+    """Resolve the request's verified user and their pro status, once per request"""
+    caller = getattr(request.state, "caller", None)
+    if caller is not None:
+        return caller
+
+    user_id = authenticated_user_id(request)
+    is_pro = False
+    profiles = getattr(request.app.state, "user_profiles", None)
+    if user_id and profiles is not None:
+        is_pro = await profiles.is_pro(user_id)
+    request.state.caller = Caller(user_id, is_pro)
+    return request.state.caller
@@ -0,0 +1,309 @@
+import asyncio
+import io
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import docker
+from concurrent.futures import ThreadPoolExecutor
+from docker.types import Mount
+from typing import List, Optional, Set, Tuple
+from config import settings
+from utils.metrics import SANDBOX_PHASE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE = "dart:stable"
+SANDBOX_IMAGE = "fluence-dart-sandbox"
+
+# The only places code can write to in a sandbox (the root filesystem is
+# read-only). They outlive a run, so they are wiped before the next one.
+SCRATCH_PATHS = ["/dev/shm", "/dev/mqueue"]
+# Replaces Docker's 64 MB /dev/shm; nothing run from it
+SHM_TMPFS_OPTIONS = "rw,noexec,nosuid,nodev,size=1m,mode=1777"
+
+def sandbox_image(client: docker.DockerClient) -> Tuple[str, Optional[str]]:
+    """Name and id of the image to run code in on this Docker host
+
+    The custom sandbox image when it has been built (make build-sandbox),
+    otherwise the stock Dart image, which is pulled on first use; its id
+    is None until then.
+    """
+    try:
+        return SANDBOX_IMAGE, client.images.get(SANDBOX_IMAGE).id
+    except docker.errors.ImageNotFound:
+        try:
+            return DEFAULT_IMAGE, client.images.get(DEFAULT_IMAGE).id
+        except docker.errors.ImageNotFound:
+            return DEFAULT_IMAGE, None
+
+class ContainerPoolExhausted(Exception):
+    """Raised when no sandbox container becomes free within the acquire timeout"""
+
+class PooledContainer:
+    """A warm sandbox container and the host directory with its /app sources
+
+    The directory is bind-mounted as /app, except on remote Docker hosts,
+    which cannot see it; there ``sync`` copies it into the container.
+    """
+
+    def __init__(self, container, workdir: str, client: docker.DockerClient, upload_sources: bool = False):
+        self.container = container
+        self.workdir = workdir
+        # The client of the Docker host the container runs on
+        self.client = client
+        self.upload_sources = upload_sources
+        self.runs = 0
+        self.dirty = False
+
+    def sync(self):
+        """Make the files written to workdir visible in the container"""
+        if not self.upload_sources:
+            return
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode="w") as tar:
+            for name in os.listdir(self.workdir):
+                tar.add(os.path.join(self.workdir, name), arcname=name)
+        self.container.put_archive("/app", archive.getvalue())
+
+class ContainerPool:
+    """Pre-warmed pool of idle Dart sandbox containers
+
+    Containers are started once with the same security restrictions as a
+    one-off run and kept alive with a no-op process. Code is executed inside
+    them with ``docker exec``; a container is recycled after ``max_runs``
+    executions or as soon as a run leaves it dirty (killed, timed out or
+    stray processes left behind). Blocking Docker calls run on ``executor``
+    so the event loop is never stalled. With ``upload_sources`` (a remote
+    Docker host) sources are copied into a volume instead of bind-mounted.
+    A suspended pool (drained or unreachable host) keeps no idle containers.
+    """
+
+    def __init__(
+        self,
+        client: docker.DockerClient,
+        image_name: str,
+        executor: Optional[ThreadPoolExecutor] = None,
+        min_size: int = settings.SANDBOX_POOL_MIN_SIZE,
+        max_size: int = settings.SANDBOX_POOL_MAX_SIZE,
+        max_runs: int = settings.SANDBOX_POOL_MAX_RUNS,
+        acquire_timeout: float = settings.SANDBOX_POOL_ACQUIRE_TIMEOUT,
+        upload_sources: bool = False,
+    ):
+        self.client = client
+        self.image_name = image_name
+        self.executor = executor
+        self.upload_sources = upload_sources
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.max_runs = max_runs
+        self.acquire_timeout = acquire_timeout
+        self._idle: List[PooledContainer] = []
+        self._size = 0
+        self._started = False
+        self._closed = False
+        self._suspended = False
+        self._condition = asyncio.Condition()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    async def start(self):
+        """Warm up the pool to its minimum size"""
+        self._started = True
+        await self._replenish()
+
+    async def acquire(self, wait: bool = True) -> Optional[PooledContainer]:
+        """Take an idle container, starting a new one if the pool has room
+
+        Without ``wait`` a full pool gives None rather than waiting for a release.
+        """
+        if not self._started:
+            await self.start()
+
+        async with self._condition:
+            while not self._idle and self._size >= self.max_size:
+                if not wait:
+                    return None
+                try:
+                    await asyncio.wait_for(self._condition.wait(), self.acquire_timeout)
+                except asyncio.TimeoutError:
+                    raise ContainerPoolExhausted("No sandbox container available")
+
+            if self._idle:
+                return self._idle.pop()
+
+            # Reserve the slot before creating so concurrent acquires respect max_size
+            self._size += 1
+
+        try:
+            return await self._run_blocking(self._create)
+        except BaseException:
+            async with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    async def release(self, slot: PooledContainer):
+        """Return a container to the pool, recycling it if it is spent or dirty"""
+        recycle = self._closed or self._suspended or slot.dirty or slot.runs >= self.max_runs
+        if not recycle:
+            try:
+                await self._run_blocking(self._reset, slot)
+            except Exception:
+                recycle = True
+
+        if recycle:
+            await self._run_blocking(self._destroy, slot)
+
+        async with self._condition:
+            if recycle:
+                self._size -= 1
+            else:
+                self._idle.append(slot)
+            self._condition.notify()
+
+        if recycle and not self._closed and not self._suspended:
+            task = asyncio.create_task(self._replenish())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def suspend(self):
+        """Remove idle containers and recycle busy ones as they are released"""
+        self._suspended = True
+        await self._remove_idle()
+
+    async def resume(self):
+        """Warm the pool up again after suspend"""
+        self._suspended = False
+        await self.start()
+
+    async def close(self):
+        """Stop and remove every idle container"""
+        self._closed = True
+        await self._remove_idle()
+
+    async def _remove_idle(self):
+        async with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+
+        for task in list(self._tasks):
+            task.cancel()
+
+        for slot in idle:
+            await self._run_blocking(self._destroy, slot)
+
+    async def _replenish(self):
+        """Start containers until the pool is back at its minimum size"""
+        while not self._closed and not self._suspended:
+            async with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+
+            try:
+                slot = await self._run_blocking(self._create)
+            except BaseException:
+                async with self._condition:
+                    self._size -= 1
+                return
+
+            async with self._condition:
+                self._idle.append(slot)
+                self._condition.notify()
+
+    async def _run_blocking(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    def _create(self) -> PooledContainer:
+        """Start a sandbox container that idles until code is exec'd in it"""
+        started = time.perf_counter()
+        workdir = tempfile.mkdtemp(prefix="fluence-sandbox-")
+        # The container runs as nobody and must be able to read the sources
+        os.chmod(workdir, 0o755)
+
+        if self.upload_sources:
+            # An anonymous volume, removed with the container; unlike the
+            # read-only root filesystem it accepts put_archive
+            mounts = {"mounts": [Mount("/app", None, type="volume")]}
+        else:
+            mounts = {"volumes": {workdir: {'bind': '/app', 'mode': 'ro'}}}
+
+        try:
+            container = self.client.containers.run(
+                self.image_name,
+                command=["sleep", "infinity"],
+                **mounts,
+                working_dir='/app',
+                detach=True,
+                auto_remove=True,
+                mem_limit=f"{settings.MAX_MEMORY_MB}m",
+                cpu_quota=50000,  # 50% of CPU
+                network_disabled=True,  # No network access
+                read_only=True,  # Read-only filesystem
+                tmpfs={"/dev/shm": SHM_TMPFS_OPTIONS},
+                user="nobody",  # Run as non-root user
+                cap_drop=["ALL"],  # Drop all capabilities
+                labels={"fluence.sandbox": "pool"},
+            )
+        except Exception:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+
+        SANDBOX_PHASE.labels("container_create").observe(time.perf_counter() - started)
+        return PooledContainer(container, workdir, self.client, self.upload_sources)
+
+    def _reset(self, slot: PooledContainer):
+        """Clear the sources and scratch files of the previous run and check for leftovers
+
+        Anything that cannot be cleared raises, so the container is recycled.
+        """
+        for name in os.listdir(slot.workdir):
+            path = os.path.join(slot.workdir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+        # Uploaded sources are root's, so only root can delete them; root also
+        # owns the sticky scratch directories and may delete anything in them
+        paths = SCRATCH_PATHS + (["/app"] if self.upload_sources else [])
+        exec_id = self.client.api.exec_create(
+            slot.container.id, ["find", *paths, "-mindepth", "1", "-delete"], user="root"
+        )["Id"]
+        self.client.api.exec_start(exec_id)
+        if self.client.api.exec_inspect(exec_id)["ExitCode"] != 0:
+            raise RuntimeError("Could not clear sandbox files")
+
+        # Anything besides the idle process means the last run left something behind
+        processes = slot.container.top().get("Processes") or []
+        if len(processes) > 1:
+            raise RuntimeError("Sandbox container has leftover processes")
+
+    def _destroy(self, slot: PooledContainer):
+        """Remove a container and its host directory"""
+        started = time.perf_counter()
+        try:
+            slot.container.remove(force=True, v=True)
+        except docker.errors.NotFound:
+            pass
+        except docker.errors.APIError:
+            # Removal already in progress through auto_remove
+            pass
+        except Exception as e:
+            # The Docker host is unreachable; its containers go with it
+            logger.warning("Could not remove sandbox container %s: %s", slot.container.id, e)
+        finally:
+            shutil.rmtree(slot.workdir, ignore_errors=True)
+            SANDBOX_PHASE.labels("container_destroy").observe(time.perf_counter() - started)
@@ -0,0 +1,294 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+import docker
+from concurrent.futures import ThreadPoolExecutor
+from docker.utils.socket import STDOUT, frames_iter
+from typing import Dict, List, Optional
+from config import settings
+from utils.result_cache import DART_COMPILE_ERROR_EXIT_CODE
+
+logger = logging.getLogger(__name__)
+
+# LSP DiagnosticSeverity.Error; warnings and hints do not stop a program running
+ERROR_SEVERITY = 1
+
+# Analyzed sources only exist in the server's memory under this directory
+DOCUMENT_ROOT = "/tmp/fluence"
+
+def _encode(message: Dict) -> bytes:
+    body = json.dumps(message).encode("utf-8")
+    return f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+
+def analysis_failure_result(diagnostics: List[Dict], execution_time: float) -> Dict:
+    """Shape compile errors found by analysis like a failed run"""
+    errors = "\n".join(
+        f"main.dart:{d['line']}:{d['column']}: Error: {d['message']}" for d in diagnostics
+    )
+    return {
+        "success": False,
+        "exit_code": DART_COMPILE_ERROR_EXIT_CODE,
+        "output": "",
+        "errors": errors,
+        "execution_time": execution_time,
+        "test_results": None,
+        "diagnostics": diagnostics,
+    }
+
+class DartAnalysisService:
+    """Warm Dart analysis server used to reject code that does not compile
+
+    A single ``dart language-server`` runs for the life of the process in a
+    sandbox container with the same restrictions as the execution pool; code
+    is sent to it as unsaved documents over LSP and never touches disk or
+    runs. ``analyze`` fails open: if the server is down, still starting or
+    slower than ``timeout``, the code simply goes on to the sandbox.
+    """
+
+    RESTART_INTERVAL = 30
+
+    def __init__(
+        self,
+        client: docker.DockerClient,
+        image_name: str,
+        executor: Optional[ThreadPoolExecutor] = None,
+        timeout: float = settings.ANALYSIS_TIMEOUT,
+        startup_timeout: float = settings.ANALYSIS_STARTUP_TIMEOUT,
+    ):
+        self.client = client
+        self.image_name = image_name
+        self.executor = executor
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._container = None
+        self._socket = None
+        self._ready = False
+        self._closed = False
+        self._starting: Optional[asyncio.Task] = None
+        self._last_start = 0.0
+        self._ids = itertools.count(1)
+        self._requests: Dict[int, asyncio.Future] = {}
+        self._documents: Dict[str, asyncio.Future] = {}
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    async def start(self):
+        """Start the analysis server in the background"""
+        self._ensure_started()
+
+    async def close(self):
+        self._closed = True
+        self._ready = False
+        if self._starting is not None:
+            self._starting.cancel()
+        await self._run_blocking(self._teardown)
+
+    async def analyze(self, code: str) -> Optional[List[Dict]]:
+        """Return the compile errors in code, or None when analysis is unavailable"""
+        if not self._ready:
+            self._ensure_started()
+            return None
+
+        # One folder for every document keeps a single warm analysis context
+        uri = f"file://{DOCUMENT_ROOT}/{uuid.uuid4().hex}.dart"
+        diagnostics = self._loop.create_future()
+        self._documents[uri] = diagnostics
+        try:
+            await self._notify("textDocument/didOpen", {
+                "textDocument": {"uri": uri, "languageId": "dart", "version": 1, "text": code}
+            })
+            published = await asyncio.wait_for(diagnostics, self.timeout)
+        except (asyncio.TimeoutError, OSError):
+            logger.warning("Dart analysis unavailable or too slow, running code unchecked")
+            return None
+        finally:
+            self._documents.pop(uri, None)
+            if self._ready:
+                try:
+                    await self._notify("textDocument/didClose", {"textDocument": {"uri": uri}})
+                except OSError:
+                    pass
+
+        return [
+            {
+                "line": d["range"]["start"]["line"] + 1,
+                "column": d["range"]["start"]["character"] + 1,
+                "message": d["message"],
+                "code": d.get("code"),
+            }
+            for d in published if d.get("severity") == ERROR_SEVERITY
+        ]
+
+    def _ensure_started(self):
+        """Kick off a (re)start unless one is running or was tried recently"""
+        if self._closed or self._starting is not None:
+            return
+        if time.monotonic() - self._last_start < self.RESTART_INTERVAL:
+            return
+
+        self._last_start = time.monotonic()
+        self._starting = asyncio.create_task(self._start())
+
+    async def _start(self):
+        self._loop = asyncio.get_running_loop()
+        try:
+            await self._run_blocking(self._launch)
+            await asyncio.wait_for(self._request("initialize", {
+                "processId": None,
+                "rootUri": f"file://{DOCUMENT_ROOT}",
+                "capabilities": {},
+                "initializationOptions": {"onlyAnalyzeProjectsWithOpenFiles": True},
+            }), self.startup_timeout)
+            await self._notify("initialized", {})
+            self._ready = True
+            logger.info("Dart analysis server ready")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Dart analysis server unavailable, code will run unchecked", exc_info=True)
+            await self._run_blocking(self._teardown)
+        finally:
+            self._starting = None
+
+    def _launch(self):
+        """Start the container and attach to a language server inside it"""
+        self._container = self.client.containers.run(
+            self.image_name,
+            command=["sh", "-c", f"mkdir -p {DOCUMENT_ROOT} && exec sleep infinity"],
+            detach=True,
+            auto_remove=True,
+            mem_limit=f"{settings.ANALYSIS_MEMORY_MB}m",
+            cpu_quota=50000,  # 50% of CPU
+            network_disabled=True,  # No network access
+            read_only=True,  # Read-only filesystem
+            tmpfs={"/tmp": "size=64m"},  # Analysis server's cache
+            user="nobody",  # Run as non-root user
+            cap_drop=["ALL"],  # Drop all capabilities
+            labels={"fluence.sandbox": "analysis"},
+        )
+        exec_id = self.client.api.exec_create(
+            self._container.id,
+            ["dart", "language-server", "--client-id=fluence", "--protocol=lsp"],
+            stdin=True,
+            stdout=True,
+            stderr=False,
+            user="nobody",
+            environment={"HOME": "/tmp"},
+        )
+        self._socket = self.client.api.exec_start(exec_id, socket=True)
+        threading.Thread(
+            target=self._read_messages, args=(self._socket,), name="dart-analyzer", daemon=True
+        ).start()
+
+    def _teardown(self):
+        socket, self._socket = self._socket, None
+        container, self._container = self._container, None
+        if socket is not None:
+            try:
+                socket.close()
+            except OSError:
+                pass
+        if container is not None:
+            try:
+                container.remove(force=True)
+            except docker.errors.APIError:
+                # Already gone or removal in progress through auto_remove
+                pass
+
+    def _read_messages(self, socket):
+        """Parse LSP messages off the exec socket until the server exits"""
+        buffer = b""
+        try:
+            for stream, data in frames_iter(socket, tty=False):
+                if stream != STDOUT:
+                    continue
+                buffer += data
+                while True:
+                    header_end = buffer.find(b"\r\n\r\n")
+                    if header_end < 0:
+                        break
+                    headers = dict(
+                        line.split(": ", 1)
+                        for line in buffer[:header_end].decode("ascii").split("\r\n")
+                    )
+                    start = header_end + 4
+                    end = start + int(headers["Content-Length"])
+                    if len(buffer) < end:
+                        break
+                    message = json.loads(buffer[start:end])
+                    buffer = buffer[end:]
+                    self._loop.call_soon_threadsafe(self._dispatch, message)
+        except Exception:
+            logger.warning("Lost connection to the Dart analysis server", exc_info=True)
+        finally:
+            if not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._on_exit, socket)
+
+    def _dispatch(self, message: Dict):
+        method = message.get("method")
+        if method is None:
+            future = self._requests.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                if "error" in message:
+                    future.set_exception(RuntimeError(message["error"].get("message")))
+                else:
+                    future.set_result(message.get("result"))
+        elif "id" in message:
+            # Requests from the server (configuration, registrations) need an answer
+            asyncio.ensure_future(self._send({"jsonrpc": "2.0", "id": message["id"], "result": None}))
+        elif method == "textDocument/publishDiagnostics":
+            future = self._documents.get(message["params"]["uri"])
+            if future is not None and not future.done():
+                future.set_result(message["params"]["diagnostics"])
+        elif method == "$/analyzerStatus" and not message["params"].get("isAnalyzing"):
+            # Files that analyzed cleanly may not get a diagnostics notification
+            for future in self._documents.values():
+                if not future.done():
+                    future.set_result([])
+
+    def _on_exit(self, socket):
+        if socket is not self._socket:
+            return
+
+        self._ready = False
+        for future in [*self._requests.values(), *self._documents.values()]:
+            if not future.done():
+                future.set_exception(OSError("Dart analysis server exited"))
+        self._requests.clear()
+        if not self._closed:
+            asyncio.ensure_future(self._run_blocking(self._teardown))
+
+    async def _request(self, method: str, params: Dict):
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        self._requests[request_id] = future
+        try:
+            await self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+            return await future
+        finally:
+            self._requests.pop(request_id, None)
+
+    async def _notify(self, method: str, params: Dict):
+        await self._send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    async def _send(self, message: Dict):
+        data = _encode(message)
+        async with self._write_lock:
+            socket = self._socket
+            if socket is None:
+                raise OSError("Dart analysis server is not running")
+            # exec_start hands back a SocketIO wrapper around the raw socket
+            raw = getattr(socket, "_sock", socket)
+            await self._run_blocking(raw.sendall, data)
+
+    async def _run_blocking(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
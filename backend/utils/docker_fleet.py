@@ -0,0 +1,348 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+import docker
+from concurrent.futures import Future, ThreadPoolExecutor
+from docker.constants import DEFAULT_DOCKER_API_VERSION
+from docker.tls import TLSConfig
+from typing import Dict, List, Optional, Tuple
+from config import settings
+from utils.container_pool import (
+    DEFAULT_IMAGE, ContainerPool, ContainerPoolExhausted, PooledContainer, sandbox_image
+)
+
+logger = logging.getLogger(__name__)
+
+LEAST_LOADED = "least_loaded"
+CONSISTENT_HASH = "consistent_hash"
+
+# Points per host on the hash ring, so keys spread evenly over a few hosts
+RING_REPLICAS = 100
+
+class NoSandboxHost(ContainerPoolExhausted):
+    """Raised when every Docker host is unreachable or drained"""
+
+def parse_docker_hosts(value: str) -> List[Tuple[str, str]]:
+    """Split DOCKER_HOSTS into (name, url) pairs; a bare url is also its name"""
+    hosts = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, separator, url = entry.partition("=")
+        hosts.append((name.strip(), url.strip()) if separator else (entry, entry))
+    return hosts
+
+def is_remote(url: str) -> bool:
+    """Whether a daemon cannot bind-mount this server's directories"""
+    return url != "local" and not url.startswith(("unix://", "npipe://"))
+
+def connect(url: str) -> docker.DockerClient:
+    """Client for one DOCKER_HOSTS entry, without contacting the daemon yet
+
+    The API version is fixed because negotiating it would need the daemon
+    to be up when the server starts.
+    """
+    options = {"version": DEFAULT_DOCKER_API_VERSION, "max_pool_size": settings.DOCKER_MAX_POOL_SIZE}
+    if url == "local":
+        return docker.from_env(**options)
+    if url.startswith("tcp://") and settings.DOCKER_TLS_CERT_PATH:
+        path = settings.DOCKER_TLS_CERT_PATH
+        options["tls"] = TLSConfig(
+            client_cert=(os.path.join(path, "cert.pem"), os.path.join(path, "key.pem")),
+            ca_cert=os.path.join(path, "ca.pem"),
+            verify=True,
+        )
+    return docker.DockerClient(base_url=url, **options)
+
+class DockerHost:
+    """A Docker daemon and its pool of warm sandbox containers"""
+
+    def __init__(self, name: str, client: docker.DockerClient, pool: ContainerPool):
+        self.name = name
+        self.client = client
+        self.pool = pool
+        # Identifies the sandbox image contents on this host; None until a
+        # health check has found the image
+        self.image_id: Optional[str] = None
+        self.healthy = True
+        self.draining = False
+        # Containers handed out and not released yet
+        self.active = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def available(self) -> bool:
+        """Whether new runs may be placed here"""
+        return self.healthy and not self.draining
+
+    @property
+    def has_room(self) -> bool:
+        """Whether a container can be had without waiting for a release"""
+        return self.pool.idle_count > 0 or self.pool.size < self.pool.max_size
+
+    @property
+    def load(self) -> float:
+        return self.active / self.pool.max_size
+
+    def status(self) -> Dict:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "draining": self.draining,
+            "active": self.active,
+            "containers": self.pool.size,
+            "idle": self.pool.idle_count,
+            "max_containers": self.pool.max_size,
+            "image": self.pool.image_name,
+            "last_error": self.last_error,
+        }
+
+def create_docker_hosts(
+    executor: Optional[ThreadPoolExecutor] = None,
+    client: Optional[docker.DockerClient] = None
+) -> List[DockerHost]:
+    """A DockerHost per DOCKER_HOSTS entry, or for the local daemon (or client) alone"""
+    if client is not None:
+        endpoints = [("local", client, False)]
+    elif not settings.DOCKER_HOSTS.strip():
+        # Raises right away, as it always has, when there is no local Docker
+        endpoints = [("local", docker.from_env(max_pool_size=settings.DOCKER_MAX_POOL_SIZE), False)]
+    else:
+        endpoints = []
+        for name, url in parse_docker_hosts(settings.DOCKER_HOSTS):
+            if url.startswith("tcp://") and not settings.DOCKER_TLS_CERT_PATH:
+                logger.warning(
+                    "Sandbox host %s (%s) is reached over TCP without TLS; set DOCKER_TLS_CERT_PATH",
+                    name, url
+                )
+            endpoints.append((name, connect(url), is_remote(url)))
+
+    # Images are looked up by the first health check
+    return [
+        DockerHost(name, host_client, ContainerPool(host_client, DEFAULT_IMAGE, executor, upload_sources=remote))
+        for name, host_client, remote in endpoints
+    ]
+
+class DockerFleet:
+    """Warm sandbox containers on several Docker hosts, used like one ContainerPool
+
+    Each run goes to the least loaded available host or, with
+    consistent_hash, to the host owning its key on a hash ring, moving
+    along the ring past hosts that are full so no host is overloaded.
+    Hosts are pinged every ``check_interval``; one that does not answer,
+    or fails to start a container, takes no runs until a check succeeds
+    again. Drained hosts finish their runs but take no new ones. Either
+    way the host's pool is suspended, so it holds no idle containers.
+    Checks run on threads of their own, one per host, so they are not held
+    up behind runs on the shared executor; a host whose last check is still
+    hanging fails the next one without starting another.
+    """
+
+    def __init__(
+        self,
+        hosts: List[DockerHost],
+        placement: str = settings.DOCKER_PLACEMENT,
+        check_interval: float = settings.DOCKER_HEALTH_CHECK_INTERVAL,
+        check_timeout: float = settings.DOCKER_HEALTH_CHECK_TIMEOUT,
+        drained: str = settings.DOCKER_DRAINED_HOSTS,
+    ):
+        if not hosts:
+            raise ValueError("At least one Docker host is needed")
+        if placement not in (LEAST_LOADED, CONSISTENT_HASH):
+            raise ValueError(f"Unknown DOCKER_PLACEMENT: {placement}")
+        self.hosts = hosts
+        self.placement = placement
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._by_name = {host.name: host for host in hosts}
+        for name in drained.split(","):
+            if name.strip():
+                self._host(name.strip()).draining = True
+        self._ring = sorted(
+            ((self._hash(f"{host.name}#{replica}"), host) for host in hosts for replica in range(RING_REPLICAS)),
+            key=lambda point: point[0]
+        )
+        self._ring_keys = [point for point, _ in self._ring]
+        self._placed: Dict[PooledContainer, DockerHost] = {}
+        self._health_task: Optional[asyncio.Task] = None
+        self._probe_executor = ThreadPoolExecutor(max_workers=len(hosts), thread_name_prefix="sandbox-probe")
+        self._probes: Dict[DockerHost, Future] = {}
+
+    @property
+    def size(self) -> int:
+        return sum(host.pool.size for host in self.hosts)
+
+    @property
+    def idle_count(self) -> int:
+        return sum(host.pool.idle_count for host in self.hosts)
+
+    @property
+    def max_size(self) -> int:
+        """Largest pool of any one host, which caps the test shards of a run
+
+        Shards past the first only get containers that are free right away,
+        so the shards of one run may land on different hosts (with
+        consistent_hash they share a host as long as it has room).
+        """
+        return max(host.pool.max_size for host in self.hosts)
+
+    def status(self) -> List[Dict]:
+        return [host.status() for host in self.hosts]
+
+    async def start(self):
+        """Check every host, warm up the available ones and keep checking"""
+        await asyncio.gather(*(self._check(host) for host in self.hosts))
+        for host in self.hosts:
+            if host.available:
+                await host.pool.start()
+            else:
+                await host.pool.suspend()
+        if not any(host.available for host in self.hosts):
+            logger.warning("No sandbox host is available")
+        self._health_task = asyncio.create_task(self._check_forever())
+
+    async def acquire(self, key: Optional[str] = None, wait: bool = True) -> Optional[PooledContainer]:
+        """Take a container on the host chosen for key, failing over to the next ones
+
+        Without ``wait`` only hosts with room are tried, and None is returned
+        when none of them has a container to spare right away.
+        """
+        exhausted = None
+        for host in self._candidates(key):
+            if not wait and not host.has_room:
+                continue
+            try:
+                slot = await host.pool.acquire(wait)
+            except ContainerPoolExhausted as e:
+                exhausted = e
+                continue
+            except Exception as e:
+                # Could not start a container there
+                await self._set_health(host, False, e)
+                continue
+            if slot is None:
+                continue
+            host.active += 1
+            self._placed[slot] = host
+            return slot
+        if not wait:
+            return None
+        raise exhausted or NoSandboxHost("No sandbox host available")
+
+    async def release(self, slot: PooledContainer):
+        host = self._placed.pop(slot)
+        host.active -= 1
+        await host.pool.release(slot)
+
+    async def check(self, slot: PooledContainer):
+        """Check the host of a container right away, e.g. after a Docker error"""
+        host = self._placed.get(slot)
+        if host is not None:
+            await self._check(host)
+
+    async def drain(self, name: str):
+        """Stop placing runs on a host; the runs in progress finish there"""
+        host = self._host(name)
+        was_available = host.available
+        host.draining = True
+        await self._update_pool(host, was_available)
+
+    async def undrain(self, name: str):
+        host = self._host(name)
+        was_available = host.available
+        host.draining = False
+        await self._update_pool(host, was_available)
+
+    async def close(self):
+        """Stop health checks, remove idle containers and close every client"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+        for host in self.hosts:
+            await host.pool.close()
+            host.client.close()
+        self._probe_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _host(self, name: str) -> DockerHost:
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise ValueError(f"Unknown sandbox host: {name}")
+
+    def _candidates(self, key: Optional[str]) -> List[DockerHost]:
+        """Available hosts in placement order, those with room first
+
+        Of the full hosts only the first is kept; acquiring from it waits
+        for one of its containers to be released.
+        """
+        if self.placement == CONSISTENT_HASH and key is not None:
+            ordered = [host for host in self._ring_order(key) if host.available]
+        else:
+            ordered = sorted(
+                (host for host in self.hosts if host.available),
+                key=lambda host: (host.load, -host.pool.idle_count)
+            )
+        with_room = [host for host in ordered if host.has_room]
+        full = [host for host in ordered if not host.has_room]
+        return with_room + full[:1]
+
+    def _ring_order(self, key: str) -> List[DockerHost]:
+        """Every host, in the order met walking the ring from key"""
+        start = bisect.bisect(self._ring_keys, self._hash(key))
+        ordered: List[DockerHost] = []
+        for offset in range(len(self._ring)):
+            host = self._ring[(start + offset) % len(self._ring)][1]
+            if host not in ordered:
+                ordered.append(host)
+                if len(ordered) == len(self.hosts):
+                    break
+        return ordered
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.sha1(value.encode("utf-8")).digest()[:8], "big")
+
+    async def _check_forever(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await asyncio.gather(*(self._check(host) for host in self.hosts), return_exceptions=True)
+
+    async def _check(self, host: DockerHost):
+        """Ping a host, picking up a rebuilt sandbox image along the way"""
+        try:
+            probe = self._probes.get(host)
+            if probe is not None and not probe.done():
+                raise TimeoutError("Previous health check has not returned")
+            probe = self._probes[host] = self._probe_executor.submit(self._probe, host)
+            # shield: a timeout must not cancel the shared future, which tells
+            # the next check whether this probe is still hanging
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(probe)), self.check_timeout)
+        except Exception as e:
+            await self._set_health(host, False, e)
+        else:
+            await self._set_health(host, True)
+
+    @staticmethod
+    def _probe(host: DockerHost):
+        host.client.ping()
+        host.pool.image_name, host.image_id = sandbox_image(host.client)
+
+    async def _set_health(self, host: DockerHost, healthy: bool, error: Optional[Exception] = None):
+        was_available = host.available
+        if healthy and not host.healthy:
+            logger.info("Sandbox host %s is reachable again", host.name)
+        elif not healthy and host.healthy:
+            logger.warning("Sandbox host %s is unavailable: %r", host.name, error)
+        host.healthy = healthy
+        host.last_error = None if healthy else repr(error)
+        await self._update_pool(host, was_available)
+
+    @staticmethod
+    async def _update_pool(host: DockerHost, was_available: bool):
+        if host.available and not was_available:
+            await host.pool.resume()
+        elif was_available and not host.available:
+            await host.pool.suspend()
@@ -0,0 +1,277 @@
+import asyncio
+import itertools
+import math
+import time
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+from config import settings
+from models.submission import ExecutionJobStatus
+from utils.sandbox_runner import DartCodeRunner
+from utils.result_cache import ResultCache, execution_cache_key
+from utils.output_stream import OutputStream
+from utils.dart_analyzer import DartAnalysisService, analysis_failure_result
+from utils.metrics import PhaseTimer
+
+class ExecutionQueueFull(Exception):
+    """Raised when the execution queue cannot take another job"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Execution queue is full")
+        self.retry_after = retry_after
+
+class ExecutionJob:
+    """A queued request to run code in the sandbox"""
+
+    def __init__(
+        self,
+        code: str,
+        test_script: Optional[str],
+        priority: int,
+        cache_key: Optional[str],
+        output: Optional[OutputStream] = None,
+        charge: Optional[Callable[[float], Awaitable[None]]] = None,
+        owner: Optional[str] = None
+    ):
+        self.id = str(uuid.uuid4())
+        # Who submitted the job; only they may poll for it
+        self.owner = owner
+        self.code = code
+        self.test_script = test_script
+        self.output = output
+        # Called with the sandbox seconds the job used, once it stops running
+        self.charge = charge
+        self.priority = priority
+        # None when the result must not be cached
+        self.cache_key = cache_key
+        self.status = ExecutionJobStatus.QUEUED
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+        self.done = asyncio.Event()
+        self.timer = PhaseTimer()
+        self.queued_at = time.monotonic()
+
+class ExecutionScheduler:
+    """Bounded, prioritised front door for DartCodeRunner
+
+    At most ``concurrency`` jobs run at once and at most ``max_queue_depth``
+    wait behind them; beyond that submissions are rejected so a burst cannot
+    start an unbounded number of containers. Pro users jump the queue.
+    Finished jobs stay available for polling for ``job_ttl`` seconds.
+    Results found in ``cache`` are returned without being queued at all, as
+    are compile errors found by ``analyzer`` before a container is used.
+    """
+
+    PRO_PRIORITY = 0
+    DEFAULT_PRIORITY = 1
+
+    def __init__(
+        self,
+        runner: DartCodeRunner,
+        cache: Optional[ResultCache] = None,
+        analyzer: Optional[DartAnalysisService] = None,
+        concurrency: int = settings.EXECUTION_CONCURRENCY,
+        max_queue_depth: int = settings.EXECUTION_QUEUE_MAX_DEPTH,
+        job_ttl: int = settings.EXECUTION_JOB_TTL,
+    ):
+        self.runner = runner
+        self.cache = cache
+        self.analyzer = analyzer
+        self.concurrency = max(concurrency, 1)
+        self.max_queue_depth = max_queue_depth
+        self.job_ttl = job_ttl
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, ExecutionJob] = {}
+        self._workers: List[asyncio.Task] = []
+        self._running = 0
+        self._closed = False
+        # Moving average of run time, used to estimate Retry-After
+        self._average_run_time = 1.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    async def start(self):
+        """Start the worker tasks"""
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+
+    async def close(self):
+        """Stop the workers and cancel running jobs"""
+        self._closed = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(
+        self,
+        code: str,
+        test_script: Optional[str] = None,
+        is_pro: bool = False,
+        output: Optional[OutputStream] = None,
+        charge: Optional[Callable[[float], Awaitable[None]]] = None,
+        use_cache: bool = True,
+        owner: Optional[str] = None
+    ) -> ExecutionJob:
+        """Queue a job, raising ExecutionQueueFull when the queue is at capacity
+
+        Without ``use_cache`` the code runs even if a cached result exists.
+        Nothing is cached while the sandbox image id is unknown, since a
+        later pull could change what the same code does.
+        ``owner`` identifies the client, which get_job then requires.
+        """
+        self._purge_expired()
+
+        priority = self.PRO_PRIORITY if is_pro else self.DEFAULT_PRIORITY
+        image_id = self.runner.image_id
+        job = ExecutionJob(
+            code, test_script, priority,
+            execution_cache_key(code, test_script, image_id) if image_id is not None else None,
+            output,
+            charge,
+            owner
+        )
+
+        with job.timer.phase("cache_lookup"):
+            cached = await self.cache.get(job.cache_key) if self.cache and use_cache and job.cache_key else None
+        if cached is not None:
+            job.result = {**cached, "cached": True, "phases": job.timer.phases}
+            self._jobs[job.id] = job
+            self._finish(job, ExecutionJobStatus.COMPLETED)
+            return job
+
+        started = time.monotonic()
+        with job.timer.phase("analysis"):
+            diagnostics = await self.analyzer.analyze(code) if self.analyzer else None
+        if diagnostics:
+            job.result = analysis_failure_result(diagnostics, time.monotonic() - started)
+            job.result["phases"] = job.timer.phases
+            self._jobs[job.id] = job
+            self._finish(job, ExecutionJobStatus.COMPLETED)
+            return job
+
+        if self._closed or self._queue.qsize() >= self.max_queue_depth:
+            raise ExecutionQueueFull(self.retry_after())
+
+        self._jobs[job.id] = job
+        job.queued_at = time.monotonic()
+        self._queue.put_nowait((priority, next(self._sequence), job))
+        return job
+
+    async def run(
+        self,
+        code: str,
+        test_script: Optional[str] = None,
+        is_pro: bool = False,
+        charge: Optional[Callable[[float], Awaitable[None]]] = None,
+        use_cache: bool = True
+    ) -> Dict:
+        """Queue a job and wait for its result"""
+        job = await self.submit(code, test_script, is_pro, charge=charge, use_cache=use_cache)
+        return await self.wait(job)
+
+    async def wait(self, job: ExecutionJob) -> Dict:
+        """Wait for a job submitted by the caller, cancelling it if the caller is"""
+        try:
+            await job.done.wait()
+        except asyncio.CancelledError:
+            self.cancel(job)
+            raise
+        finally:
+            # Nobody polls for synchronous jobs
+            self._jobs.pop(job.id, None)
+
+        if job.status != ExecutionJobStatus.COMPLETED:
+            raise RuntimeError(job.error or f"Execution {job.status}")
+        return job.result
+
+    def get_job(self, job_id: str, owner: Optional[str] = None) -> Optional[ExecutionJob]:
+        """A job by id, or None unless it was submitted by ``owner``"""
+        job = self._jobs.get(job_id)
+        return job if job is not None and job.owner == owner else None
+
+    def cancel(self, job: ExecutionJob):
+        """Cancel a queued or running job"""
+        if job.status == ExecutionJobStatus.QUEUED:
+            # The worker skips it when it reaches the front of the queue
+            self._finish(job, ExecutionJobStatus.CANCELLED)
+        elif job.status == ExecutionJobStatus.RUNNING and job.task is not None:
+            job.task.cancel()
+
+    def retry_after(self) -> int:
+        """Estimate seconds until the queue has room again"""
+        waiting = self._queue.qsize() + self._running
+        return max(1, math.ceil(waiting / self.concurrency * self._average_run_time))
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            if job.status != ExecutionJobStatus.QUEUED:
+                continue
+
+            job.status = ExecutionJobStatus.RUNNING
+            job.started_at = datetime.utcnow()
+            job.timer.add("queue_wait", time.monotonic() - job.queued_at)
+            job.task = asyncio.create_task(
+                self.runner.run_code(job.code, job.test_script, job.output, job.timer)
+            )
+            self._running += 1
+            started = time.monotonic()
+            try:
+                job.result = await job.task
+                if self.cache and job.cache_key and ResultCache.is_cacheable(job.result, job.code, job.test_script):
+                    # Timings describe this run, not the ones the cache will answer
+                    await self.cache.set(
+                        job.cache_key, {key: value for key, value in job.result.items() if key != "phases"}
+                    )
+                self._finish(job, ExecutionJobStatus.COMPLETED)
+            except asyncio.CancelledError:
+                self._finish(job, ExecutionJobStatus.CANCELLED)
+                if self._closed:
+                    raise
+            except Exception as e:
+                job.error = str(e)
+                self._finish(job, ExecutionJobStatus.FAILED)
+            finally:
+                self._running -= 1
+                elapsed = time.monotonic() - started
+                self._average_run_time = 0.8 * self._average_run_time + 0.2 * elapsed
+                if job.charge is not None and not self._closed:
+                    await job.charge(self._sandbox_seconds(job, elapsed))
+
+    @staticmethod
+    def _sandbox_seconds(job: ExecutionJob, elapsed: float) -> float:
+        """Container time a run used, summed over its test shards
+
+        Falls back to the wall-clock time of runs cancelled before their
+        timings were recorded.
+        """
+        phases = job.timer.phases
+        return phases.get("startup", 0.0) + phases.get("run", 0.0) or elapsed
+
+    def _finish(self, job: ExecutionJob, status: ExecutionJobStatus):
+        job.status = status
+        job.finished_at = datetime.utcnow()
+        job.done.set()
+
+    def _purge_expired(self):
+        """Forget finished jobs whose results are older than the TTL"""
+        cutoff = datetime.utcnow().timestamp() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at.timestamp() < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
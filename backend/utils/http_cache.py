@@ -0,0 +1,61 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+from fastapi import Request, Response
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag from everything that determines a response"""
+    material = json.dumps(parts, default=str, sort_keys=True)
+    return '"{}"'.format(hashlib.sha256(material.encode("utf-8")).hexdigest()[:32])
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Whether the client's conditional headers match the current validators
+
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # GET compares weakly, so a W/ prefix added by a proxy still matches
+        return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have whole-second precision
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: Optional[str],
+    last_modified: Optional[datetime],
+    max_age: int,
+    private: bool = False
+) -> Optional[Response]:
+    """Set caching headers on response, returning a 304 if the client's copy is current
+
+    ``private`` responses may only be stored by the client, not by shared
+    proxies or CDNs. Without an ETag nothing is validated and no 304 is sent.
+    """
+    headers = {"Cache-Control": f"{'private' if private else 'public'}, max-age={max_age}"}
+    if etag is None:
+        response.headers.update(headers)
+        return None
+
+    headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,139 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict
+from fastapi import Request
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.routing import Match
+
+# Buckets from a few milliseconds up to the longest sandbox runs
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REQUEST_LATENCY = Histogram(
+    "fluence_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+SANDBOX_PHASE = Histogram(
+    "fluence_sandbox_phase_seconds",
+    "Time spent in each phase of a code execution",
+    ["phase"],
+    buckets=LATENCY_BUCKETS,
+)
+SANDBOX_KILLS = Counter(
+    "fluence_sandbox_kills_total",
+    "Sandbox runs stopped before finishing, by reason",
+    ["reason"],
+)
+SUBMISSIONS_REJECTED = Counter(
+    "fluence_submissions_rejected_total",
+    "Buffered submissions the database refused after they were accepted, by SQLSTATE",
+    ["code"],
+)
+RATE_LIMITED = Counter(
+    "fluence_rate_limited_total",
+    "Requests rejected with 429 because a client spent a budget",
+    ["budget"],
+)
+DB_QUERY_LATENCY = Histogram(
+    "fluence_db_query_duration_seconds",
+    "Supabase query latency by the service method that issued it",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+POOL_CONTAINERS = Gauge("fluence_sandbox_pool_containers", "Sandbox containers in the pool, idle or in use")
+POOL_IDLE = Gauge("fluence_sandbox_pool_idle", "Idle sandbox containers in the pool")
+SANDBOX_HOST_UP = Gauge("fluence_sandbox_host_up", "Whether a sandbox Docker host takes runs (healthy, not drained)", ["host"])
+SANDBOX_HOST_RUNS = Gauge("fluence_sandbox_host_runs", "Runs in progress on each sandbox Docker host", ["host"])
+QUEUE_DEPTH = Gauge("fluence_execution_queue_depth", "Execution jobs waiting for a worker")
+RUNNING_JOBS = Gauge("fluence_execution_running", "Execution jobs currently running")
+SUBMISSIONS_PENDING = Gauge("fluence_submission_buffer_pending", "Submissions queued for the next batch insert")
+
+# Name of the service method whose database queries are being timed
+db_operation_name: ContextVar[str] = ContextVar("db_operation_name", default="other")
+
+def db_operation(fn):
+    """Label the database queries made by an async method with its name"""
+    name = fn.__qualname__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = db_operation_name.set(name)
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            db_operation_name.reset(token)
+
+    return wrapper
+
+@contextmanager
+def observe_db_query():
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        DB_QUERY_LATENCY.labels(db_operation_name.get()).observe(time.perf_counter() - start)
+
+class PhaseTimer:
+    """Per-phase timings of one execution, also recorded in SANDBOX_PHASE
+
+    Test shards run in parallel threads, so their phases add up.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        SANDBOX_PHASE.labels(name).observe(seconds)
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+def route_template(request: Request) -> str:
+    """The path pattern the request matched, so ids do not explode label cardinality"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+async def track_request_latency(request: Request, call_next):
+    """HTTP middleware recording REQUEST_LATENCY, up to the start of the response body"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUEST_LATENCY.labels(request.method, route_template(request), str(status)).observe(
+            time.perf_counter() - start
+        )
+
+def track_app_state(app):
+    """Point the pool, queue and buffer gauges at the objects created at startup"""
+    runner = getattr(app.state, "code_runner", None)
+    if runner is not None:
+        POOL_CONTAINERS.set_function(lambda: runner.fleet.size)
+        POOL_IDLE.set_function(lambda: runner.fleet.idle_count)
+        for host in runner.fleet.hosts:
+            SANDBOX_HOST_UP.labels(host.name).set_function(lambda host=host: host.available)
+            SANDBOX_HOST_RUNS.labels(host.name).set_function(lambda host=host: host.active)
+    scheduler = getattr(app.state, "execution_scheduler", None)
+    if scheduler is not None:
+        QUEUE_DEPTH.set_function(lambda: scheduler.queue_depth)
+        RUNNING_JOBS.set_function(lambda: scheduler.running)
+    buffer = getattr(app.state, "submission_buffer", None)
+    if buffer is not None:
+        SUBMISSIONS_PENDING.set_function(lambda: buffer.pending)
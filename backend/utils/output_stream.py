@@ -0,0 +1,59 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import AsyncIterator, Tuple
+from config import settings
+
+class OutputStreamClosed(Exception):
+    """Raised in the producer once the consumer has gone away"""
+
+class OutputStream:
+    """Hands output chunks from an executor thread to an async consumer
+
+    ``write`` blocks while ``max_pending`` chunks are waiting to be consumed,
+    which pushes back on the container's output pipe instead of buffering
+    without bound. Closing the stream unblocks and aborts the producer.
+    """
+
+    def __init__(self, max_pending: int = settings.STREAM_MAX_PENDING_CHUNKS):
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._closed = threading.Event()
+
+    def write(self, stream: str, text: str):
+        """Queue a chunk from the producer thread, waiting for room"""
+        if self._closed.is_set():
+            raise OutputStreamClosed()
+
+        future = asyncio.run_coroutine_threadsafe(self._queue.put((stream, text)), self._loop)
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return
+            except concurrent.futures.TimeoutError:
+                if self._closed.is_set():
+                    future.cancel()
+                    raise OutputStreamClosed()
+
+    def close(self):
+        self._closed.set()
+
+    async def iter_until(self, task: asyncio.Future) -> AsyncIterator[Tuple[str, str]]:
+        """Yield (stream, text) chunks until task finishes"""
+        while True:
+            getter = asyncio.ensure_future(self._queue.get())
+            try:
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            except BaseException:
+                getter.cancel()
+                raise
+
+            if getter.done():
+                yield getter.result()
+                continue
+
+            getter.cancel()
+            # Chunks written before the task finished are already queued
+            while not self._queue.empty():
+                yield self._queue.get_nowait()
+            return
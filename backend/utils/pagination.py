@@ -0,0 +1,53 @@
+import base64
+import binascii
+import json
+from typing import Any, List, Sequence, Tuple
+
+# Cursor directions: NEXT continues after the cursor's row, PREV goes back before it
+NEXT = "next"
+PREV = "prev"
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not produced by encode_cursor"""
+
+def encode_cursor(key: Sequence[Any], direction: str = NEXT) -> str:
+    """Build an opaque cursor from a row's sort key"""
+    raw = json.dumps({"k": list(key), "d": direction}, default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[List[Any], str]:
+    """Return the sort key and direction stored in a cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        key, direction = data["k"], data["d"]
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise InvalidCursor("Invalid cursor")
+
+    if not isinstance(key, list) or len(key) != 2 or direction not in (NEXT, PREV):
+        raise InvalidCursor("Invalid cursor")
+    return key, direction
+
+def _quote(value: Any) -> str:
+    # Values inside PostgREST logic trees are quoted so ':' and ',' survive
+    return '"{}"'.format(str(value).replace('"', '\\"'))
+
+def keyset_filter(query, columns: Tuple[str, str], key: Sequence[Any], operator: str):
+    """Keep rows whose (first, second) column pair compares with operator to key
+
+    For example operator "gt" keeps rows sorting after key, which lets the
+    database seek straight to them through an index on the two columns.
+    """
+    first, second = columns
+    value, tiebreak = _quote(key[0]), _quote(key[1])
+    query.params = query.params.add(
+        "or", f"({first}.{operator}.{value},and({first}.eq.{value},{second}.{operator}.{tiebreak}))"
+    )
+    return query
+
+def keyset_order(query, columns: Tuple[str, str], desc: bool = False):
+    """Order by every column in the same direction"""
+    query.params = query.params.add(
+        "order", ",".join(f"{column}.desc" if desc else column for column in columns)
+    )
+    return query
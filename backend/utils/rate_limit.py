@@ -0,0 +1,234 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Request
+from config import settings
+from utils.metrics import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+# Refills a bucket and takes from it atomically, so every worker shares one budget.
+# Returns whether the request was allowed and the tokens left, as a string to keep
+# the fraction (Lua numbers come back from Redis as integers).
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local need = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+if tokens >= need then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+class Budget:
+    """A token bucket policy: up to ``limit`` tokens, refilled evenly over ``window`` seconds
+
+    A request needs at least one token and takes ``cost`` of them. Budgets
+    with a cost of 0 are paid for afterwards with RateLimiter.charge, once
+    the amount is known, and may go into debt.
+    """
+
+    def __init__(self, name: str, limit: float, window: float, cost: float = 1):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.cost = cost
+
+    def capacity(self, is_pro: bool) -> float:
+        return self.limit * (settings.RATE_LIMIT_PRO_MULTIPLIER if is_pro else 1)
+
+    def rate(self, is_pro: bool) -> float:
+        """Tokens refilled per second"""
+        return self.capacity(is_pro) / self.window
+
+# Calls to the execute endpoints
+EXECUTE_REQUESTS = Budget("execute", settings.RATE_LIMIT_EXECUTE_REQUESTS, settings.RATE_LIMIT_WINDOW)
+# Seconds of sandbox container time, summed over test shards
+EXECUTION_SECONDS = Budget("execution_seconds", settings.RATE_LIMIT_EXECUTION_SECONDS, settings.RATE_LIMIT_WINDOW, cost=0)
+# Calls to POST /submissions
+SUBMISSIONS = Budget("submissions", settings.RATE_LIMIT_SUBMISSIONS, settings.RATE_LIMIT_WINDOW)
+
+class BucketState:
+    """A client's bucket for one budget after a request"""
+
+    def __init__(self, budget: Budget, is_pro: bool, tokens: float, allowed: bool):
+        self.budget = budget
+        self.limit = budget.capacity(is_pro)
+        self.rate = budget.rate(is_pro)
+        self.tokens = tokens
+        self.allowed = allowed
+
+    @property
+    def remaining(self) -> int:
+        return max(0, math.floor(self.tokens))
+
+    @property
+    def reset(self) -> int:
+        """Seconds until the bucket is full again"""
+        return math.ceil(max(0.0, self.limit - self.tokens) / self.rate)
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds until the bucket has the one token a request needs"""
+        return max(1, math.ceil((1 - self.tokens) / self.rate))
+
+class RateLimitExceeded(Exception):
+    """Raised when a client has spent one of its budgets"""
+
+    def __init__(self, state: BucketState, states: List[BucketState]):
+        super().__init__(f"Rate limit exceeded: {state.budget.name}")
+        self.state = state
+        self.states = states
+
+class RateLimiter:
+    """Per-client token buckets, kept in memory or shared through Redis
+
+    The in-process buckets are an LRU of at most ``max_keys`` clients; a
+    client that drops out of it simply starts again with full buckets.
+    When ``redis_url`` is set every worker takes from the same buckets.
+    Redis is best effort: while it is unavailable each worker falls back
+    to its own buckets rather than letting requests through unchecked.
+    """
+
+    KEY_PREFIX = "fluence:ratelimit:"
+
+    def __init__(
+        self,
+        max_keys: int = settings.RATE_LIMIT_MAX_KEYS,
+        redis_url: str = settings.REDIS_URL,
+    ):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._redis = None
+        self._script = None
+        if redis_url:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(redis_url)
+            self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def hit(self, key: str, budgets: Sequence[Budget], is_pro: bool = False) -> List[BucketState]:
+        """Take one request's cost from each budget, raising RateLimitExceeded when one is spent
+
+        Budgets are taken from in order and nothing is taken after the first
+        spent one, so list the free-to-check (cost 0) budgets first.
+        """
+        states = []
+        for budget in budgets:
+            state = await self._take(key, budget, is_pro, need=1, cost=budget.cost)
+            states.append(state)
+            if not state.allowed:
+                raise RateLimitExceeded(state, states)
+        return states
+
+    async def charge(self, key: str, budget: Budget, amount: float, is_pro: bool = False):
+        """Take an amount known only after the request, e.g. sandbox seconds"""
+        await self._take(key, budget, is_pro, need=0, cost=amount)
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+
+    async def _take(self, key: str, budget: Budget, is_pro: bool, need: float, cost: float) -> BucketState:
+        bucket_key = f"{budget.name}:{key}"
+        capacity, rate = budget.capacity(is_pro), budget.rate(is_pro)
+        if self._redis is not None:
+            try:
+                allowed, tokens = await self._script(
+                    keys=[self.KEY_PREFIX + bucket_key], args=[capacity, rate, need, cost]
+                )
+                return BucketState(budget, is_pro, float(tokens), bool(allowed))
+            except Exception:
+                logger.warning("Shared rate limit state unavailable", exc_info=True)
+
+        allowed, tokens = self._take_local(bucket_key, capacity, rate, need, cost)
+        return BucketState(budget, is_pro, tokens, allowed)
+
+    def _take_local(self, bucket_key: str, capacity: float, rate: float, need: float, cost: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(bucket_key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        allowed = tokens >= need
+        if allowed:
+            tokens -= cost
+        self._buckets[bucket_key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+def client_key(request: Request, user_id: Optional[str] = None) -> str:
+    """Limit per user when authenticated, otherwise per client IP
+
+    Only pass a user id verified by utils.auth: one the client merely
+    claims would let it spread its requests over made-up users.
+    """
+    if user_id:
+        return f"user:{user_id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def rate_limit_headers(states: List[BucketState]) -> Dict[str, str]:
+    """RateLimit headers (IETF httpapi draft) for the budget closest to running out"""
+    if not states:
+        return {}
+    closest = min(states, key=lambda state: state.tokens / state.limit)
+    policies = ", ".join(
+        f'{state.limit:g};w={state.budget.window:g};comment="{state.budget.name}"' for state in states
+    )
+    return {
+        "RateLimit-Limit": f"{closest.limit:g}",
+        "RateLimit-Remaining": str(closest.remaining),
+        "RateLimit-Reset": str(closest.reset),
+        "RateLimit-Policy": policies,
+    }
+
+async def limit_requests(
+    request: Request,
+    budgets: Sequence[Budget],
+    user_id: Optional[str] = None,
+    is_pro: bool = False
+) -> Dict[str, str]:
+    """Take a request from the client's budgets, raising a 429 when one is spent
+
+    Returns the RateLimit headers for the response, or none when rate
+    limiting is off.
+    """
+    limiter: Optional[RateLimiter] = getattr(request.app.state, "rate_limiter", None)
+    if limiter is None:
+        return {}
+    try:
+        states = await limiter.hit(client_key(request, user_id), budgets, is_pro)
+    except RateLimitExceeded as e:
+        RATE_LIMITED.labels(e.state.budget.name).inc()
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded ({e.state.budget.name}), try again later",
+            headers={**rate_limit_headers(e.states), "Retry-After": str(e.state.retry_after)}
+        )
+    return rate_limit_headers(states)
+
+def execution_charge(
+    request: Request,
+    user_id: Optional[str] = None,
+    is_pro: bool = False
+) -> Optional[Callable[[float], Awaitable[None]]]:
+    """Callback that charges sandbox seconds to the client's EXECUTION_SECONDS budget"""
+    limiter: Optional[RateLimiter] = getattr(request.app.state, "rate_limiter", None)
+    if limiter is None:
+        return None
+    key = client_key(request, user_id)
+
+    async def charge(seconds: float):
+        await limiter.charge(key, EXECUTION_SECONDS, seconds, is_pro)
+    return charge
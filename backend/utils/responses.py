@@ -0,0 +1,55 @@
+"""JSON responses that skip FastAPI's response_model round trip
+
+A model returned from a route is validated against response_model again,
+dumped to Python objects and only then encoded. The services already
+build validated models, so the hot read routes hand them to these
+helpers, which serialize them once with pydantic-core; response_model
+stays on the route for the OpenAPI schema.
+"""
+from typing import AsyncIterator, Optional, Sequence
+from fastapi import Response
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# For routes that return plain dicts and lists
+DEFAULT_RESPONSE_CLASS = ORJSONResponse if orjson is not None else JSONResponse
+
+# Models serialized per chunk of a streamed array
+STREAM_CHUNK_SIZE = 200
+
+def _with_route_response(json_response: Response, response: Optional[Response]) -> Response:
+    """Carry over the status and headers a route set on its injected Response"""
+    if response is not None:
+        if response.status_code:
+            json_response.status_code = response.status_code
+        json_response.raw_headers.extend(response.headers.raw)
+    return json_response
+
+def model_response(
+    content: Optional[BaseModel],
+    response: Optional[Response] = None,
+    exclude_unset: bool = False
+) -> Response:
+    """Serialize an already validated model (or None) straight to a JSON response"""
+    body = content.model_dump_json(exclude_unset=exclude_unset) if content is not None else "null"
+    return _with_route_response(Response(body, media_type="application/json"), response)
+
+def stream_models(items: Sequence[BaseModel], response: Optional[Response] = None) -> Response:
+    """Stream a list of models as a JSON array, STREAM_CHUNK_SIZE models at a time
+
+    The first bytes go out before the whole list is encoded, and no more
+    than one chunk of it is held as JSON at once.
+    """
+    async def chunks() -> AsyncIterator[bytes]:
+        yield b"["
+        for start in range(0, len(items), STREAM_CHUNK_SIZE):
+            encoded = ",".join(item.model_dump_json() for item in items[start:start + STREAM_CHUNK_SIZE])
+            yield (b"," if start else b"") + encoded.encode()
+        yield b"]"
+
+    return _with_route_response(StreamingResponse(chunks(), media_type="application/json"), response)
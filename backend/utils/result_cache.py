@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Exit status of the Dart VM when the program fails to compile
+DART_COMPILE_ERROR_EXIT_CODE = 254
+
+# Bump when the way code is run changes, so stale shared results are ignored
+CACHE_FORMAT_VERSION = 4
+
+# APIs whose results differ from one run of the same code to the next
+NONDETERMINISTIC_APIS = re.compile(
+    r"\b(?:DateTime\s*\.\s*(?:now|timestamp)|Random|Stopwatch|identityHashCode|hashCode)\b"
+)
+
+def is_deterministic(code: str, test_script: Optional[str] = None) -> bool:
+    """Whether neither the code nor its tests mention the clock, random numbers or identity hashes"""
+    return not any(NONDETERMINISTIC_APIS.search(source) for source in (code, test_script) if source)
+
+def execution_cache_key(code: str, test_script: Optional[str], image_id: str) -> str:
+    """Hash everything that determines the outcome of a run"""
+    material = json.dumps([
+        CACHE_FORMAT_VERSION,
+        code,
+        test_script,
+        image_id,
+        settings.EXECUTION_TIMEOUT,
+        settings.MAX_MEMORY_MB,
+        settings.MAX_OUTPUT_BYTES,
+    ])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """Content-addressed cache of execution results
+
+    Results live in an in-process LRU bounded by entry count and total size,
+    each with a TTL. When ``redis_url`` is set a shared Redis tier lets every
+    worker reuse results computed by the others; it is best effort, so Redis
+    errors only cost a cache miss.
+    """
+
+    KEY_PREFIX = "fluence:exec:"
+
+    def __init__(
+        self,
+        max_entries: int = settings.RESULT_CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.RESULT_CACHE_MAX_BYTES,
+        ttl: int = settings.RESULT_CACHE_TTL,
+        redis_url: str = settings.REDIS_URL,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict]]" = OrderedDict()
+        self._bytes = 0
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(redis_url)
+
+    @staticmethod
+    def is_cacheable(result: Dict, code: str, test_script: Optional[str] = None) -> bool:
+        """Only outcomes that will repeat exactly are worth caching
+
+        A compile error always does; a successful run only when the code
+        and tests are deterministic (see is_deterministic).
+        """
+        if result.get("exit_code") == DART_COMPILE_ERROR_EXIT_CODE:
+            return True
+        return bool(result.get("success")) and is_deterministic(code, test_script)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        result = self._get_local(key)
+        if result is not None or self._redis is None:
+            return result
+
+        try:
+            raw = await self._redis.get(self.KEY_PREFIX + key)
+        except Exception:
+            logger.warning("Shared result cache unavailable", exc_info=True)
+            return None
+
+        if raw is None:
+            return None
+        result = json.loads(raw)
+        self._set_local(key, result)
+        return result
+
+    async def set(self, key: str, result: Dict):
+        self._set_local(key, result)
+        if self._redis is None:
+            return
+
+        try:
+            await self._redis.set(self.KEY_PREFIX + key, json.dumps(result), ex=self.ttl)
+        except Exception:
+            logger.warning("Shared result cache unavailable", exc_info=True)
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+
+    def _get_local(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, _, result = entry
+        if expires_at < time.monotonic():
+            self._evict(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return result
+
+    def _set_local(self, key: str, result: Dict):
+        size = len(json.dumps(result))
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, result)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
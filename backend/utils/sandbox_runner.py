@@ -1,50 +1,122 @@
 import asyncio
-import tempfile
+import codecs
+import hashlib
 import os
+import secrets
+import socket
+import ssl
 import time
 import docker
-from typing import Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from docker.utils.socket import STDOUT, frames_iter
+from typing import Dict, Iterator, List, Optional, Tuple
 from config import settings
+from utils.container_pool import PooledContainer
+from utils.docker_fleet import DockerFleet, create_docker_hosts
+from utils.output_stream import OutputStream, OutputStreamClosed
+from utils.test_harness import TestHarness, TestReportParser
+from utils.metrics import SANDBOX_KILLS, PhaseTimer
+
+# Exit status of a process terminated with SIGKILL (timeout or OOM killer)
+KILLED_EXIT_CODE = 137
+
+# Test scripts whose registered test count is remembered for sharding
+TEST_COUNTS_MAX_ENTRIES = 1024
 
 class DartCodeRunner:
     """Secure Dart code execution in Docker container"""
     
-    def __init__(self):
-        self.client = docker.from_env()
-        self.image_name = "dart:stable"
-        # Build our custom sandbox image if it doesn't exist
-        self._ensure_sandbox_image()
+    def __init__(self, client: Optional[docker.DockerClient] = None):
+        # docker-py is blocking, so the Docker calls of runs go through a bounded
+        # thread pool (host health checks have threads of their own)
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.SANDBOX_EXECUTOR_WORKERS,
+            thread_name_prefix="sandbox"
+        )
+        # A pool of warm containers on each Docker host in DOCKER_HOSTS (or
+        # just the local daemon); one client per host keeps its connections
+        self.fleet = DockerFleet(create_docker_hosts(self.executor, client))
+        # Tests registered by each test script (by hash), as reported by its last run
+        self._test_counts: "OrderedDict[str, int]" = OrderedDict()
+    
+    @property
+    def client(self) -> docker.DockerClient:
+        """Client of the first Docker host, which also runs the analysis server"""
+        return self.fleet.hosts[0].client
+    
+    @property
+    def image_name(self) -> str:
+        return self.fleet.hosts[0].pool.image_name
+    
+    @property
+    def image_id(self) -> Optional[str]:
+        """Identifies the exact image contents, e.g. for caching results
+        
+        Taken from the first host; every host should run the same image.
+        None while the image is not known, e.g. before it has been pulled.
+        """
+        return self.fleet.hosts[0].image_id
+    
+    async def start(self):
+        """Check the Docker hosts and warm up their container pools"""
+        await self.fleet.start()
+    
+    async def close(self):
+        """Remove pooled containers and close the Docker clients"""
+        await self.fleet.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
     
-    async def run_code(self, code: str, test_script: Optional[str] = None) -> Dict:
-        """Execute Dart code safely in Docker container"""
+    async def run_code(
+        self,
+        code: str,
+        test_script: Optional[str] = None,
+        output: Optional[OutputStream] = None,
+        timer: Optional[PhaseTimer] = None
+    ) -> Dict:
+        """Execute Dart code safely in a warm Docker container
+        
+        With a test script, the tests and the program run in a single Dart
+        VM through a generated harness, so the VM boots and compiles once.
+        Registered test cases are reported one by one in ``test_results``.
+        Once a run has reported how many tests a script registers, later
+        runs spread them over up to TEST_MAX_SHARDS pooled containers in
+        parallel; the first run of a script uses one container. Every
+        shard's container is taken before any shard starts, and only as
+        many shards run as there are containers free at that moment.
+        Output chunks are forwarded to ``output`` as they are produced.
+        Cancelling the calling task (e.g. on client disconnect) marks the
+        container dirty, and recycling it kills the run still in progress.
+        Time spent in each phase is added to ``timer`` and returned in
+        ``phases``.
+        """
         start_time = time.time()
+        timer = timer or PhaseTimer()
+        harness = TestHarness(test_script) if test_script else None
+        script_key = hashlib.sha256(test_script.encode()).hexdigest() if test_script else None
+        shards = self._shard_count(script_key) if script_key else 1
         
         try:
-            # Create temporary directory for code files
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Write main code file
-                main_file = os.path.join(temp_dir, "main.dart")
-                with open(main_file, "w") as f:
-                    f.write(code)
-                
-                # Write test file if provided
-                test_file = None
-                if test_script:
-                    test_file = os.path.join(temp_dir, "test.dart")
-                    with open(test_file, "w") as f:
-                        f.write(test_script)
-                
-                # Run in Docker container
-                result = await self._execute_in_container(temp_dir, test_file is not None)
-                
-                execution_time = time.time() - start_time
-                
-                return {
-                    "success": result["exit_code"] == 0,
-                    "output": result["stdout"],
-                    "errors": result["stderr"] if result["stderr"] else None,
-                    "execution_time": execution_time
-                }
+            slots = await self._acquire_shards(code, shards, timer) if shards > 1 else [None]
+            if len(slots) > 1:
+                result = self._merge_shards(await self._run_shards(code, harness, output, slots, timer))
+            else:
+                result = await self._run_in_pool(code, harness, output, timer, slot=slots[0])
+            registered = result.pop("registered", None)
+            if script_key and registered is not None:
+                self._remember_test_count(script_key, registered)
+            
+            execution_time = time.time() - start_time
+            
+            return {
+                "success": result["exit_code"] == 0,
+                "exit_code": result["exit_code"],
+                "output": result["stdout"],
+                "errors": result["stderr"] if result["stderr"] else None,
+                "execution_time": execution_time,
+                "test_results": result["test_results"],
+                "phases": timer.phases
+            }
         
         except Exception as e:
             execution_time = time.time() - start_time
@@ -52,78 +124,378 @@ class DartCodeRunner:
                 "success": False,
                 "output": "",
                 "errors": f"Execution error: {str(e)}",
-                "execution_time": execution_time
+                "execution_time": execution_time,
+                "phases": timer.phases
             }
     
-    async def _execute_in_container(self, code_dir: str, has_test: bool) -> Dict:
-        """Execute code in Docker container with security restrictions"""
+    def _shard_count(self, script_key: str) -> int:
+        """How many containers a test script's registered tests are spread over"""
+        count = self._test_counts.get(script_key)
+        if count is None:
+            return 1
+        self._test_counts.move_to_end(script_key)
+        return max(1, min(count, settings.TEST_MAX_SHARDS, self.fleet.max_size))
+    
+    def _remember_test_count(self, script_key: str, count: int):
+        self._test_counts[script_key] = count
+        self._test_counts.move_to_end(script_key)
+        while len(self._test_counts) > TEST_COUNTS_MAX_ENTRIES:
+            self._test_counts.popitem(last=False)
+    
+    async def _run_in_pool(
+        self,
+        code: str,
+        harness: Optional[TestHarness],
+        output: Optional[OutputStream],
+        timer: PhaseTimer,
+        shard: int = 0,
+        shards: int = 1,
+        slot: Optional[PooledContainer] = None
+    ) -> Dict:
+        """Run once in a pooled container, once more elsewhere if Docker failed before any output
+        
+        ``slot`` is a container already acquired for the first attempt.
+        """
+        for _ in range(2):
+            if slot is None:
+                with timer.phase("pool_acquire"):
+                    # With consistent_hash placement the same code goes to the same host
+                    slot = await self.fleet.acquire(code)
+            host_error = False
+            try:
+                result = await self._run_blocking(
+                    self._execute_in_container, slot, code, harness, output, timer, shard, shards
+                )
+                host_error = result.pop("host_error", False)
+                if host_error:
+                    # A host that is gone gets no more runs, including the retry
+                    await self.fleet.check(slot)
+            except asyncio.CancelledError:
+                slot.dirty = True
+                raise
+            finally:
+                with timer.phase("release"):
+                    await self.fleet.release(slot)
+                slot = None
+            if not host_error:
+                break
+        return result
+    
+    async def _acquire_shards(self, code: str, shards: int, timer: PhaseTimer) -> List[PooledContainer]:
+        """Containers for up to ``shards`` test shards, all taken before any shard runs
+        
+        The first is waited for like a single run's; the others are only
+        taken if free right away, so a run never holds containers while
+        waiting for more, and runs fewer shards while the fleet is busy.
+        """
+        with timer.phase("pool_acquire"):
+            slots = [await self.fleet.acquire(code)]
+            try:
+                while len(slots) < shards:
+                    slot = await self.fleet.acquire(code, wait=False)
+                    if slot is None:
+                        break
+                    slots.append(slot)
+            except BaseException:
+                for slot in slots:
+                    await self.fleet.release(slot)
+                raise
+        return slots
+    
+    async def _run_shards(
+        self,
+        code: str,
+        harness: TestHarness,
+        output: Optional[OutputStream],
+        slots: List[PooledContainer],
+        timer: PhaseTimer
+    ) -> List[Dict]:
+        """Run a test shard in each container in parallel, stopping at the first failure
+        
+        A shard that raises counts as a failed shard, so the results of the
+        others are kept.
+        """
+        # A task cancelled before its first step never runs, so the
+        # containers of shards that did not start are released here
+        unstarted = set(range(len(slots)))
+        
+        async def run_shard(shard: int) -> Dict:
+            unstarted.discard(shard)
+            return await self._run_in_pool(code, harness, output, timer, shard, len(slots), slots[shard])
+        
+        tasks = [asyncio.create_task(run_shard(shard)) for shard in range(len(slots))]
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if any(self._shard_result(task)["exit_code"] != 0 for task in done):
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for shard in unstarted:
+                await self.fleet.release(slots[shard])
+        
+        return [self._shard_result(task) for task in tasks if not task.cancelled()]
+    
+    @staticmethod
+    def _shard_result(task: asyncio.Task) -> Dict:
+        """A finished shard's result, or a failed one if it raised"""
+        error = task.exception()
+        if error is None:
+            return task.result()
+        return {
+            "exit_code": 1,
+            "stdout": "",
+            "stderr": f"Execution error: {error}",
+            "test_results": [],
+            "registered": None
+        }
+    
+    @staticmethod
+    def _merge_shards(results: List[Dict]) -> Dict:
+        """Combine shard results in shard order
+        
+        Each shard's output starts on a new line. A case reported by more
+        than one shard (the test script's main failing in each) is kept once.
+        """
+        test_results = {}
+        for result in results:
+            for case in result["test_results"] or []:
+                test_results.setdefault(case.get("index", 0), case)
+        registered = [r["registered"] for r in results if r.get("registered") is not None]
+        return {
+            "exit_code": next((r["exit_code"] for r in results if r["exit_code"] != 0), 0),
+            "stdout": DartCodeRunner._join_output(r["stdout"] for r in results),
+            "stderr": DartCodeRunner._join_output(r["stderr"] for r in results),
+            "test_results": [test_results[index] for index in sorted(test_results)],
+            "registered": registered[0] if registered else None
+        }
+    
+    @staticmethod
+    def _join_output(parts) -> str:
+        joined = ""
+        for part in parts:
+            if not part:
+                continue
+            if joined and not joined.endswith("\n"):
+                joined += "\n"
+            joined += part
+        return joined
+    
+    async def _run_blocking(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+    
+    def _execute_in_container(
+        self,
+        slot: PooledContainer,
+        code: str,
+        harness: Optional[TestHarness],
+        output: Optional[OutputStream],
+        timer: PhaseTimer,
+        shard: int = 0,
+        shards: int = 1
+    ) -> Dict:
+        """Execute code in a pooled container with security restrictions"""
+        
+        # Write code files into the directory mounted as /app
+        with timer.phase("write_sources"):
+            with open(os.path.join(slot.workdir, "main.dart"), "w") as f:
+                f.write(code)
+            
+            if harness:
+                harness.write(slot.workdir)
+            
+            try:
+                slot.sync()
+            except Exception as e:
+                return self._docker_error(slot, e, retry=True)
         
         # Command to run
-        if has_test:
-            command = ["sh", "-c", "dart test.dart && dart main.dart"]
+        reports = None
+        stdin = None
+        if harness:
+            nonce = secrets.token_hex(16)
+            # The test script's output is shown once, by shard 0
+            reports = TestReportParser(nonce, quiet_setup=shard > 0)
+            command = harness.command(shard, shards)
+            stdin = f"{nonce}\n".encode("ascii")
         else:
             command = ["dart", "main.dart"]
         
+        # The container outlives the run, so the timeout is enforced inside it
+        command = ["timeout", "-s", "KILL", str(settings.EXECUTION_TIMEOUT)] + command
+        
+        result = self._stream_exec(slot, command, reports, output, timer, stdin)
+        result["test_results"] = reports.results if reports else None
+        result["registered"] = reports.registered if reports else None
+        
+        if reports and result["exit_code"] == 0 and not reports.completed:
+            # e.g. the code under test called exit(0) halfway through the tests
+            result["exit_code"] = 1
+            result["stderr"] += "Test run did not complete"
+        
+        return result
+    
+    def _stream_exec(
+        self,
+        slot: PooledContainer,
+        command: List[str],
+        reports: Optional[TestReportParser],
+        output: Optional[OutputStream],
+        timer: PhaseTimer,
+        stdin: Optional[bytes] = None
+    ) -> Dict:
+        """Run command in the container, collecting output from one attached stream
+        
+        The time until the first output is reported as the ``startup`` phase
+        (Dart VM boot and compilation), the rest of the run as ``run``.
+        """
+        start_time = time.time()
+        stdout, stderr = [], []
+        decoders = {
+            "stdout": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+            "stderr": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+        }
+        output_bytes = 0
+        limit_error = None
+        
+        def emit(name: str, text: str, buffer: List[str]):
+            if name == "stdout" and reports is not None:
+                # Test reports are not program output
+                text = reports.feed(text) if text else reports.flush()
+            buffer.append(text)
+            if output is not None and text:
+                output.write(name, text)
+        
         try:
-            # Run container with security restrictions
-            container = self.client.containers.run(
-                self.image_name,
-                command=command,
-                volumes={code_dir: {'bind': '/app', 'mode': 'ro'}},
-                working_dir='/app',
-                detach=True,
-                remove=True,
-                mem_limit=f"{settings.MAX_MEMORY_MB}m",
-                cpu_quota=50000,  # 50% of CPU
-                network_disabled=True,  # No network access
-                read_only=True,  # Read-only filesystem
-                user="nobody",  # Run as non-root user
-                cap_drop=["ALL"],  # Drop all capabilities
-            )
+            with timer.phase("exec_create"):
+                exec_id = slot.client.api.exec_create(
+                    slot.container.id,
+                    command,
+                    workdir='/app',
+                    user="nobody",
+                    stdin=stdin is not None,
+                )["Id"]
             
-            # Wait for completion with timeout
-            try:
-                result = container.wait(timeout=settings.EXECUTION_TIMEOUT)
-                exit_code = result['StatusCode']
-                
-                # Get output
-                stdout = container.logs(stdout=True, stderr=False).decode('utf-8')
-                stderr = container.logs(stdout=False, stderr=True).decode('utf-8')
+            # A single attached stream carries both stdout and stderr
+            run_started = time.perf_counter()
+            first_output = None
+            for stdout_chunk, stderr_chunk in self._exec_output(slot, exec_id, stdin):
+                if first_output is None:
+                    first_output = time.perf_counter()
+                for name, chunk, buffer in (
+                    ("stdout", stdout_chunk, stdout),
+                    ("stderr", stderr_chunk, stderr),
+                ):
+                    if not chunk:
+                        continue
+                    
+                    output_bytes += len(chunk)
+                    if output_bytes > settings.MAX_OUTPUT_BYTES:
+                        limit_error = f"Output limit of {settings.MAX_OUTPUT_BYTES} bytes exceeded"
+                        break
+                    
+                    emit(name, decoders[name].decode(chunk), buffer)
                 
-                return {
-                    "exit_code": exit_code,
-                    "stdout": stdout,
-                    "stderr": stderr
-                }
+                if limit_error:
+                    break
             
-            except Exception:
-                # Kill container if timeout
-                container.kill()
+            if not limit_error:
+                emit("stdout", "", stdout)
+            run_ended = time.perf_counter()
+            if first_output is not None:
+                timer.add("startup", first_output - run_started)
+                timer.add("run", run_ended - first_output)
+            else:
+                timer.add("run", run_ended - run_started)
+            with timer.phase("inspect"):
+                exit_code = slot.client.api.exec_inspect(exec_id)["ExitCode"]
+        
+        except OutputStreamClosed:
+            limit_error = "Output stream closed"
+        
+        except Exception as e:
+            # Safe to run again elsewhere as long as nothing was streamed yet
+            return self._docker_error(slot, e, retry=output_bytes == 0)
+        
+        slot.runs += 1
+        
+        if limit_error:
+            # Stop the run; the container is replaced once released
+            SANDBOX_KILLS.labels("output_limit").inc()
+            slot.dirty = True
+            try:
+                slot.container.kill()
+            except docker.errors.APIError:
+                pass
+            return {
+                "exit_code": 1,
+                "stdout": "".join(stdout),
+                "stderr": limit_error
+            }
+        
+        if exit_code == KILLED_EXIT_CODE:
+            # Killed runs may leave memory pressure or stray processes behind
+            slot.dirty = True
+            if time.time() - start_time >= settings.EXECUTION_TIMEOUT:
+                SANDBOX_KILLS.labels("timeout").inc()
                 return {
                     "exit_code": 1,
                     "stdout": "",
                     "stderr": "Code execution timed out"
                 }
-        
-        except docker.errors.ContainerError as e:
+            SANDBOX_KILLS.labels("memory").inc()
             return {
-                "exit_code": e.exit_status,
-                "stdout": "",
-                "stderr": f"Container error: {e.stderr.decode('utf-8') if e.stderr else str(e)}"
+                "exit_code": exit_code,
+                "stdout": "".join(stdout),
+                "stderr": "Code execution was killed (memory limit exceeded)"
             }
         
-        except Exception as e:
-            return {
-                "exit_code": 1,
-                "stdout": "",
-                "stderr": f"Docker execution error: {str(e)}"
-            }
+        return {
+            "exit_code": exit_code,
+            "stdout": "".join(stdout),
+            "stderr": "".join(stderr)
+        }
     
-    def _ensure_sandbox_image(self):
-        """Build sandbox image if it doesn't exist"""
+    @staticmethod
+    def _exec_output(
+        slot: PooledContainer,
+        exec_id: str,
+        stdin: Optional[bytes]
+    ) -> Iterator[Tuple[Optional[bytes], Optional[bytes]]]:
+        """Start an exec and yield its (stdout, stderr) chunks, first writing stdin to it
+        
+        Input goes over the attached socket, which is then half-closed so the
+        program reads end of input after it; TLS sockets cannot be half-closed,
+        so there a program that reads past the input waits for the timeout.
+        """
+        if stdin is None:
+            yield from slot.client.api.exec_start(exec_id, stream=True, demux=True)
+            return
+        
+        attached = slot.client.api.exec_start(exec_id, socket=True)
+        # exec_start hands back a SocketIO wrapper around the raw socket
+        raw = getattr(attached, "_sock", attached)
         try:
-            self.client.images.get("fluence-dart-sandbox")
-            self.image_name = "fluence-dart-sandbox"
-        except docker.errors.ImageNotFound:
-            # Use the default dart image for now
-            pass
\ No newline at end of file
+            raw.sendall(stdin)
+            if not isinstance(raw, ssl.SSLSocket):
+                raw.shutdown(socket.SHUT_WR)
+            for stream, data in frames_iter(attached, tty=False):
+                yield (data, None) if stream == STDOUT else (None, data)
+        finally:
+            attached.close()
+    
+    @staticmethod
+    def _docker_error(slot: PooledContainer, error: Exception, retry: bool) -> Dict:
+        """Result of a run that Docker failed, flagged for a retry on another container"""
+        slot.dirty = True
+        return {
+            "exit_code": 1,
+            "stdout": "",
+            "stderr": f"Docker execution error: {str(error)}",
+            "test_results": None,
+            "host_error": retry
+        }
@@ -0,0 +1,221 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+# Test registration API that challenge test scripts can import as
+# 'fluence_test.dart' to get per-test results. Scripts that only use
+# assert in main keep working and are reported as a single test.
+TEST_LIBRARY_SOURCE = """class RegisteredTest {
+  final String name;
+  final dynamic Function() body;
+
+  RegisteredTest(this.name, this.body);
+}
+
+class TestFailure implements Exception {
+  final String message;
+
+  TestFailure(this.message);
+
+  @override
+  String toString() => message;
+}
+
+final List<RegisteredTest> _registeredTests = [];
+final List<String> _groups = [];
+
+// A copy, so code under test cannot clear or reorder the tests still to run
+List<RegisteredTest> get registeredTests => List.unmodifiable(_registeredTests);
+
+void test(String name, dynamic Function() body) {
+  _registeredTests.add(RegisteredTest([..._groups, name].join(' '), body));
+}
+
+void group(String name, void Function() body) {
+  _groups.add(name);
+  try {
+    body();
+  } finally {
+    _groups.removeLast();
+  }
+}
+
+void expect(dynamic actual, dynamic expected, [String? reason]) {
+  if (actual != expected) {
+    throw TestFailure(reason ?? 'Expected: $expected, Actual: $actual');
+  }
+}
+"""
+
+# Runs the challenge tests and then the program in one Dart VM. Either entry
+# point may be sync or async and may or may not take command line arguments.
+# Arguments are <shard> <shard count>: the shard runs every shard-count'th
+# registered test, stopping at the first failure, and only shard 0 runs the
+# program itself. Every shard runs the test script's main to register the
+# tests and then reports how many there are; other shards print none of its
+# output. The report nonce is the first line of stdin, read before any user
+# code runs (Dart libraries run no code on import), so unlike an argument it
+# cannot be read back from /proc/self/cmdline. Reports go through the stdout
+# taken at that point, which IOOverrides set up later by user code cannot wrap.
+ENTRYPOINT_SOURCE = """import 'dart:convert';
+import 'dart:io';
+import 'fluence_test.dart' as registry;
+import 'main.dart' as program;
+import 'test.dart' as tests;
+
+late final String _prefix;
+late final Stdout _out;
+
+Future<void> _invoke(Function entry) async {
+  final dynamic result = entry is Function(List<String>)
+      ? Function.apply(entry, [<String>[]])
+      : Function.apply(entry, []);
+  if (result is Future) await result;
+}
+
+void _report(Map<String, dynamic> report) {
+  _out.writeln('$_prefix ${jsonEncode(report)}');
+}
+
+Future<bool> _run(int index, String name, Function body,
+    {bool reportPass = true, bool quiet = false}) async {
+  final watch = Stopwatch()..start();
+  try {
+    await _invoke(body);
+  } catch (error, stackTrace) {
+    if (!quiet) stderr.writeln('$name: $error\\n$stackTrace');
+    _report({
+      'index': index,
+      'name': name,
+      'passed': false,
+      'duration_ms': watch.elapsedMicroseconds / 1000,
+      'message': '$error',
+    });
+    return false;
+  }
+  if (!reportPass) return true;
+  _report({
+    'index': index,
+    'name': name,
+    'passed': true,
+    'duration_ms': watch.elapsedMicroseconds / 1000,
+  });
+  return true;
+}
+
+Future<void> main(List<String> args) async {
+  _out = stdout;
+  final nonce = stdin.readLineSync();
+  if (nonce == null || nonce.isEmpty) {
+    stderr.writeln('Missing test report nonce');
+    exitCode = 2;
+    return;
+  }
+  _prefix = '##fluence-test:$nonce';
+  final shard = int.parse(args[0]);
+  final shards = int.parse(args[1]);
+
+  // The script's main registers tests, or is the whole test for plain scripts
+  final watch = Stopwatch()..start();
+  if (!await _run(0, 'test.dart', tests.main, reportPass: false, quiet: shard > 0)) {
+    exitCode = 1;
+    return;
+  }
+  final cases = registry.registeredTests;
+  _report({'registered': cases.length});
+  if (cases.isEmpty) {
+    _report({
+      'index': 0,
+      'name': 'test.dart',
+      'passed': true,
+      'duration_ms': watch.elapsedMicroseconds / 1000,
+    });
+  }
+
+  for (var i = shard; i < cases.length; i += shards) {
+    if (!await _run(i + 1, cases[i].name, cases[i].body)) {
+      exitCode = 1;
+      return;
+    }
+  }
+
+  _report({'done': true});
+  if (shard == 0) await _invoke(program.main);
+}
+"""
+
+class TestHarness:
+    """A challenge test script prepared to run alongside user code"""
+
+    ENTRYPOINT = "harness.dart"
+
+    def __init__(self, test_script: str):
+        self.test_script = test_script
+
+    def command(self, shard: int = 0, shards: int = 1) -> List[str]:
+        """Command that runs one shard; the report nonce goes to its stdin"""
+        # Test scripts check results with assert, which is off by default.
+        # dart:mirrors would let user code read the nonce out of the harness.
+        return [
+            "dart", "--enable-asserts", "--enable-mirrors=false",
+            self.ENTRYPOINT, str(shard), str(shards)
+        ]
+
+    def write(self, directory: str):
+        """Write the test script and entry point next to main.dart"""
+        for name, source in (
+            ("test.dart", self.test_script),
+            ("fluence_test.dart", TEST_LIBRARY_SOURCE),
+            (self.ENTRYPOINT, ENTRYPOINT_SOURCE),
+        ):
+            with open(os.path.join(directory, name), "w") as f:
+                f.write(source)
+
+class TestReportParser:
+    """Splits the harness's test reports out of the program's stdout
+
+    Reports carry a per-run nonce that only reaches the harness, over
+    stdin, so printing a fake report does not count as a passing test.
+    Lines that carry the nonce but are not a report are dropped.
+    ``registered`` is the number of tests the script registered, once the
+    harness has reported it. With ``quiet_setup`` the output printed
+    before that (by the test script's main) is dropped too, so that only
+    one of a run's shards shows it.
+    """
+
+    def __init__(self, nonce: str, quiet_setup: bool = False):
+        self.prefix = f"##fluence-test:{nonce} "
+        self.results: List[Dict] = []
+        self.completed = False
+        self.registered: Optional[int] = None
+        self._quiet = quiet_setup
+        self._partial = ""
+
+    def feed(self, text: str) -> str:
+        """Consume a stdout chunk and return the ordinary program output in it"""
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        return "".join(line + "\n" for line in lines if not self._parse(line))
+
+    def flush(self) -> str:
+        """Return output left after the last newline"""
+        text, self._partial = self._partial, ""
+        return "" if self._parse(text) else text
+
+    def _parse(self, line: str) -> bool:
+        if not line.startswith(self.prefix):
+            return self._quiet and self.registered is None
+
+        try:
+            report = json.loads(line[len(self.prefix):])
+        except ValueError:
+            return True
+        if not isinstance(report, dict):
+            return True
+        if report.get("done") is True:
+            self.completed = True
+        elif isinstance(report.get("registered"), int) and self.registered is None:
+            self.registered = report["registered"]
+        elif isinstance(report.get("name"), str) and isinstance(report.get("passed"), bool):
+            self.results.append(report)
+        return True
@@ -0,0 +1,59 @@
+"""Compare two benchmark result files and flag regressions
+
+Works on the output of both load.py and micro.py. A benchmark regresses
+when its p95 latency grows, or its throughput drops, by more than
+``--threshold`` (a fraction). Exits with status 1 if anything regressed.
+
+    python benchmarks/compare.py baseline.json current.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Tuple
+
+def flatten(results: Dict) -> Dict[str, Tuple[float, float]]:
+    """Map every benchmark to its (p95 latency, throughput)"""
+    flat = {}
+    for scenario, data in results.get("scenarios", {}).items():
+        flat[scenario] = (data["latency_ms"]["p95"], data["throughput_rps"])
+        for operation, op_data in data.get("operations", {}).items():
+            flat[f"{scenario}/{operation}"] = (op_data["latency_ms"]["p95"], op_data["throughput_rps"])
+    for name, data in results.get("benchmarks", {}).items():
+        flat[name] = (data["latency_us"]["p95"], data["ops_per_sec"])
+    return flat
+
+def change(before: float, after: float) -> float:
+    return (after - before) / before if before else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    options = parser.parse_args()
+
+    with open(options.baseline) as f:
+        baseline = flatten(json.load(f))
+    with open(options.current) as f:
+        current = flatten(json.load(f))
+
+    regressions = []
+    print(f"{'benchmark':<48} {'p95 change':>11} {'throughput change':>18}")
+    for name in sorted(baseline.keys() & current.keys()):
+        (p95_before, rate_before), (p95_after, rate_after) = baseline[name], current[name]
+        latency_change, rate_change = change(p95_before, p95_after), change(rate_before, rate_after)
+        regressed = latency_change > options.threshold or rate_change < -options.threshold
+        if regressed:
+            regressions.append(name)
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<48} {latency_change:>+10.1%} {rate_change:>+17.1%}{flag}")
+
+    for name in sorted(baseline.keys() - current.keys()):
+        print(f"{name:<48} missing from {options.current}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {options.threshold:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
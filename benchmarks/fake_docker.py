@@ -0,0 +1,65 @@
+"""In-process stand-in for the parts of docker-py that DartCodeRunner uses
+
+Every exec sleeps for ``run_time`` seconds and prints one line, so
+benchmarks measure the API, scheduler and pool overhead around a run of
+known length instead of the Dart VM.
+"""
+import itertools
+import time
+import docker
+
+class FakeContainer:
+    _ids = itertools.count()
+
+    def __init__(self):
+        self.id = f"fake-{next(self._ids)}"
+
+    def top(self):
+        return {"Processes": [["1", "sleep infinity"]]}
+
+    def kill(self):
+        pass
+
+    def remove(self, force=False, v=False):
+        pass
+
+    def put_archive(self, path, data):
+        return True
+
+class FakeContainers:
+    def __init__(self, create_time: float):
+        self.create_time = create_time
+
+    def run(self, image, **kwargs):
+        time.sleep(self.create_time)
+        return FakeContainer()
+
+class FakeImages:
+    def get(self, name):
+        raise docker.errors.ImageNotFound(name)
+
+class FakeAPI:
+    def __init__(self, run_time: float):
+        self.run_time = run_time
+
+    def exec_create(self, container_id, command, **kwargs):
+        return {"Id": f"exec-{container_id}"}
+
+    def exec_start(self, exec_id, stream=False, demux=False, **kwargs):
+        time.sleep(self.run_time)
+        yield b"Hello from the fake sandbox\n", None
+
+    def exec_inspect(self, exec_id):
+        return {"ExitCode": 0}
+
+class FakeDockerClient:
+    def __init__(self, run_time: float = 0.2, create_time: float = 0.5):
+        self.api = FakeAPI(run_time)
+        self.containers = FakeContainers(create_time)
+        self.images = FakeImages()
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
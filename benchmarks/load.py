@@ -0,0 +1,299 @@
+"""HTTP load driver for the Fluence API
+
+Runs each scenario closed-loop: ``--concurrency`` workers send their next
+request as soon as the previous one finishes, for ``--warmup`` seconds
+that are not recorded and then ``--duration`` seconds that are. Reports
+throughput, error counts and p50/p95/p99 latency per scenario and per
+operation as JSON.
+
+    python benchmarks/load.py --scenario challenges --concurrency 32 --duration 30
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+from stats import metadata, summarize, write_results
+
+# Created by sql/03_bench_data.sql
+BENCH_USER_ID = "00000000-0000-4000-8000-000000000001"
+
+PROGRAMS = [
+    "void main() {\n  print('Hello, Flutter World!');\n}\n",
+    "int fib(int n) => n < 2 ? n : fib(n - 1) + fib(n - 2);\n\nvoid main() {\n  print(fib(20));\n}\n",
+    "void main() {\n  final words = ['dart', 'flutter', 'widget'];\n  print(words.map((w) => w.toUpperCase()).join(' '));\n}\n",
+    "class Counter {\n  int value = 0;\n  void increment() => value++;\n}\n\nvoid main() {\n"
+    "  final counter = Counter();\n  for (var i = 0; i < 1000; i++) counter.increment();\n  print(counter.value);\n}\n",
+]
+
+SEARCH_TERMS = ["list", "string", "widget", "hello", "class", "recur", "benchmark challenge"]
+
+Operation = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+class Scenario:
+    """Weighted operations against one area of the API"""
+
+    name = ""
+
+    def __init__(self, options: argparse.Namespace):
+        self.options = options
+        self.rng = random.Random(options.seed)
+        self.operations: List[Tuple[str, int, Operation]] = []
+
+    async def setup(self, client: httpx.AsyncClient):
+        """Collect ids and cursors the operations need"""
+
+    def pick(self) -> Tuple[str, Operation]:
+        names, weights, calls = zip(*self.operations)
+        index = self.rng.choices(range(len(names)), weights)[0]
+        return names[index], calls[index]
+
+class ChallengesScenario(Scenario):
+    name = "challenges"
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.ids: List[str] = []
+        self.cursors: List[str] = []
+        self.etag: Optional[str] = None
+        self.operations = [
+            ("list", 30, self.list),
+            ("list_filtered", 10, self.list_filtered),
+            ("list_cursor", 10, self.list_cursor),
+            ("search", 10, self.search),
+            ("get", 25, self.get),
+            ("revalidate", 10, self.revalidate),
+            ("stats", 5, self.stats),
+        ]
+
+    async def setup(self, client):
+        response = await client.get("/api/challenges", params={"per_page": 50})
+        response.raise_for_status()
+        self.etag = response.headers.get("etag")
+        cursor = None
+        for _ in range(20):
+            params = {"per_page": 25, **({"cursor": cursor} if cursor else {})}
+            page = (await client.get("/api/challenges", params=params)).json()
+            self.ids.extend(challenge["id"] for challenge in page["challenges"])
+            cursor = page.get("next_cursor")
+            if not cursor:
+                break
+            self.cursors.append(cursor)
+        if not self.ids:
+            raise SystemExit("No challenges found; is the database seeded?")
+
+    async def list(self, client):
+        return await client.get("/api/challenges", params={"page": self.rng.randint(1, 5), "per_page": 10})
+
+    async def list_filtered(self, client):
+        return await client.get("/api/challenges", params={
+            "difficulty": self.rng.choice(["easy", "medium", "hard"]),
+            "category": self.rng.choice(["basics", "strings", "lists", "classes", "algorithms"]),
+        })
+
+    async def list_cursor(self, client):
+        if not self.cursors:
+            return await self.list(client)
+        return await client.get("/api/challenges", params={"cursor": self.rng.choice(self.cursors)})
+
+    async def search(self, client):
+        return await client.get("/api/challenges", params={"search": self.rng.choice(SEARCH_TERMS)})
+
+    async def get(self, client):
+        return await client.get(f"/api/challenges/{self.rng.choice(self.ids)}")
+
+    async def revalidate(self, client):
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        return await client.get("/api/challenges", params={"per_page": 50}, headers=headers)
+
+    async def stats(self, client):
+        return await client.get("/api/challenges-stats")
+
+class SubmissionsScenario(Scenario):
+    name = "submissions"
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.headers = {"x-user-id": options.user_id}
+        self.challenge_ids: List[str] = []
+        self.cursors: List[str] = []
+        self.operations = [
+            ("create", 30, self.create),
+            ("list", 25, self.list),
+            ("list_cursor", 15, self.list_cursor),
+            ("latest", 15, self.latest),
+            ("stats", 15, self.stats),
+        ]
+
+    async def setup(self, client):
+        page = (await client.get("/api/challenges", params={"per_page": 50})).json()
+        self.challenge_ids = [challenge["id"] for challenge in page["challenges"]]
+        if not self.challenge_ids:
+            raise SystemExit("No challenges found; is the database seeded?")
+        cursor = None
+        for _ in range(20):
+            params = {"limit": 50, **({"cursor": cursor} if cursor else {})}
+            response = await client.get("/api/submissions", params=params, headers=self.headers)
+            cursor = response.json().get("next_cursor")
+            if not cursor:
+                break
+            self.cursors.append(cursor)
+
+    async def create(self, client):
+        return await client.post("/api/submissions", headers=self.headers, json={
+            "challenge_id": self.rng.choice(self.challenge_ids),
+            "code": self.rng.choice(PROGRAMS),
+        })
+
+    async def list(self, client):
+        return await client.get("/api/submissions", params={"limit": 20}, headers=self.headers)
+
+    async def list_cursor(self, client):
+        if not self.cursors:
+            return await self.list(client)
+        params = {"limit": 20, "cursor": self.rng.choice(self.cursors)}
+        return await client.get("/api/submissions", params=params, headers=self.headers)
+
+    async def latest(self, client):
+        challenge_id = self.rng.choice(self.challenge_ids)
+        return await client.get(f"/api/submissions/latest/{challenge_id}", headers=self.headers)
+
+    async def stats(self, client):
+        return await client.get("/api/submissions/stats", headers=self.headers)
+
+class ExecuteScenario(Scenario):
+    name = "execute"
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.counter = itertools.count()
+        self.operations = [("run", 1, self.run)]
+
+    async def run(self, client):
+        code = self.rng.choice(PROGRAMS)
+        if self.options.unique_code:
+            # Defeat the result cache so every request reaches the sandbox
+            code += f"// run {next(self.counter)}\n"
+        return await client.post("/api/execute", json={"code": code})
+
+class MixedScenario(Scenario):
+    """Roughly the traffic of students browsing, running and submitting"""
+
+    name = "mixed"
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.parts = [ChallengesScenario(options), SubmissionsScenario(options), ExecuteScenario(options)]
+        for part, weight in zip(self.parts, (60, 25, 15)):
+            total = sum(w for _, w, _ in part.operations)
+            for name, w, call in part.operations:
+                self.operations.append((f"{part.name}.{name}", max(round(weight * w / total), 1), call))
+
+    async def setup(self, client):
+        for part in self.parts:
+            await part.setup(client)
+
+SCENARIOS = {cls.name: cls for cls in (ChallengesScenario, SubmissionsScenario, ExecuteScenario, MixedScenario)}
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, operation: str, seconds: float, status: str):
+        self.latencies[operation].append(seconds)
+        self.statuses[operation][status] += 1
+
+def is_error(status: str) -> bool:
+    return not status.isdigit() or int(status) >= 400
+
+def report(latencies: List[float], statuses: Counter, duration: float) -> Dict:
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if is_error(status)),
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "latency_ms": summarize(latencies, 1000),
+        "status_codes": dict(statuses),
+    }
+
+async def run_workers(
+    scenario: Scenario,
+    client: httpx.AsyncClient,
+    concurrency: int,
+    duration: float,
+    recorder: Optional[Recorder]
+):
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            name, call = scenario.pick()
+            start = time.perf_counter()
+            try:
+                status = str((await call(client)).status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if recorder is not None:
+                recorder.record(name, time.perf_counter() - start, status)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+async def run_scenario(scenario: Scenario, options: argparse.Namespace) -> Dict:
+    limits = httpx.Limits(max_connections=options.concurrency, max_keepalive_connections=options.concurrency)
+    async with httpx.AsyncClient(base_url=options.base_url, timeout=options.timeout, limits=limits) as client:
+        await scenario.setup(client)
+        await run_workers(scenario, client, options.concurrency, options.warmup, None)
+
+        recorder = Recorder()
+        started = time.perf_counter()
+        await run_workers(scenario, client, options.concurrency, options.duration, recorder)
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [seconds for samples in recorder.latencies.values() for seconds in samples]
+    all_statuses = sum(recorder.statuses.values(), Counter())
+    return {
+        **report(all_latencies, all_statuses, elapsed),
+        "operations": {
+            name: report(recorder.latencies[name], recorder.statuses[name], elapsed)
+            for name in sorted(recorder.latencies)
+        },
+    }
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run, repeatable (default: challenges, submissions, execute)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--user-id", default=BENCH_USER_ID)
+    parser.add_argument("--unique-code", action="store_true", help="Make every execute request miss the result cache")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    return parser.parse_args()
+
+async def main():
+    options = parse_args()
+    names = options.scenario or ["challenges", "submissions", "execute"]
+    results = {
+        "meta": metadata(
+            "load",
+            base_url=options.base_url,
+            concurrency=options.concurrency,
+            duration=options.duration,
+            warmup=options.warmup,
+            unique_code=options.unique_code,
+        ),
+        "scenarios": {},
+    }
+    for name in names:
+        results["scenarios"][name] = await run_scenario(SCENARIOS[name](options), options)
+    write_results(results, options.output)
+
+if __name__ == "__main__":
+    asyncio.run(main())
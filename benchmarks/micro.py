@@ -0,0 +1,197 @@
+"""Micro-benchmarks for DartCodeRunner and the service layer
+
+Database calls go to an in-process PostgREST stub and sandbox runs to
+fake_docker.FakeDockerClient, so the numbers are the backend's own
+overhead and are stable enough to compare between releases. Pass
+``--real-docker`` to time DartCodeRunner against the local Docker daemon
+instead.
+
+    python benchmarks/micro.py --output benchmarks/results/micro.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+os.environ.setdefault("SUPABASE_URL", "http://postgrest.invalid")
+
+from stats import metadata, summarize, write_results  # noqa: E402
+from fake_docker import FakeDockerClient  # noqa: E402
+from models.challenge import ChallengeFilters  # noqa: E402
+from services.challenge_catalog import ChallengeCatalog  # noqa: E402
+from services.challenge_service import ChallengeService  # noqa: E402
+from services.database import PooledPostgrestClient  # noqa: E402
+from services.search_index import SearchIndex  # noqa: E402
+from services.submission_service import SubmissionService  # noqa: E402
+from utils.execution_scheduler import ExecutionScheduler  # noqa: E402
+from utils.pagination import decode_cursor, encode_cursor  # noqa: E402
+from utils.result_cache import ResultCache  # noqa: E402
+from utils.sandbox_runner import DartCodeRunner  # noqa: E402
+
+CHALLENGE_COUNT = 500
+USER_ID = "00000000-0000-4000-8000-000000000001"
+PROGRAM = "void main() {\n  print('Hello, Flutter World!');\n}\n"
+
+def challenge_row(index: int) -> Dict:
+    topic = ["lists", "strings", "widgets", "classes", "recursion"][index % 5]
+    return {
+        "id": f"00000000-0000-4000-9000-{index:012d}",
+        "title": f"Benchmark challenge {index}",
+        "description": f"Synthetic challenge {index} about {topic} for load testing the catalog.",
+        "starter_code": "void main() {\n  // Your code here\n}",
+        "test_script": None,
+        "is_premium": index % 4 == 0,
+        "difficulty": ["easy", "medium", "hard"][index % 3],
+        "category": ["basics", "strings", "lists", "classes", "algorithms"][index % 5],
+        "sort_order": 100 + index,
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "updated_at": "2026-01-01T00:00:00+00:00",
+    }
+
+CHALLENGES = [challenge_row(index) for index in range(CHALLENGE_COUNT)]
+NOW = datetime.now(timezone.utc)
+SUBMISSIONS = [
+    {
+        "id": f"00000000-0000-4000-a000-{index:012d}",
+        "user_id": USER_ID,
+        "challenge_id": CHALLENGES[index % 50]["id"],
+        "code_hash": f"{index % 200:064x}",
+        "result": {"success": index % 3 == 0, "output": f"{index % 200}\n"},
+        "is_successful": index % 3 == 0,
+        "created_at": (NOW - timedelta(minutes=index)).isoformat(),
+    }
+    for index in range(101)
+]
+
+def postgrest_stub(request: httpx.Request) -> httpx.Response:
+    """Answer the backend's queries with canned rows, honouring eq filters and paging"""
+    table = request.url.path.rsplit("/", 1)[-1]
+    if table == "catalog_version":
+        return httpx.Response(200, json=[{"version": 1, "updated_at": "2026-01-01T00:00:00+00:00"}])
+    rows = {"challenges": CHALLENGES, "submissions": SUBMISSIONS}.get(table, [])
+    for column, condition in request.url.params.multi_items():
+        if condition.startswith("eq."):
+            value = condition[3:]
+            rows = [row for row in rows if json.dumps(row.get(column)).strip('"') == value]
+
+    offset, limit = 0, len(rows)
+    if "range" in request.headers:
+        first, last = request.headers["range"].split("-")
+        offset, limit = int(first), int(last) - int(first) + 1
+    limit = min(limit, int(request.url.params.get("limit", limit)))
+    page = rows[offset:offset + limit]
+    headers = {"content-range": f"{offset}-{offset + len(page) - 1}/{len(rows)}"}
+    return httpx.Response(200, content=json.dumps(page), headers=headers)
+
+class StubPostgrestClient(PooledPostgrestClient):
+    def create_session(self, base_url, headers, timeout):
+        return httpx.AsyncClient(
+            base_url=base_url, headers=headers, timeout=timeout, transport=httpx.MockTransport(postgrest_stub)
+        )
+
+def stub_database() -> StubPostgrestClient:
+    return StubPostgrestClient("http://postgrest.invalid", headers={})
+
+async def measure(fn: Callable[[], Awaitable], iterations: int, warmup: int) -> Dict:
+    for _ in range(warmup):
+        await fn()
+    samples: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / sum(samples), 1),
+        "latency_us": summarize(samples, 1e6),
+    }
+
+async def runner_benchmarks(options) -> Dict[str, Callable[[], Awaitable]]:
+    client = None if options.real_docker else FakeDockerClient(run_time=0, create_time=0)
+    runner = DartCodeRunner(client)
+    await runner.start()
+    scheduler = ExecutionScheduler(runner, ResultCache(redis_url=""))
+    await scheduler.start()
+    counter = iter(range(10 ** 9))
+
+    async def concurrent():
+        await asyncio.gather(*(runner.run_code(PROGRAM) for _ in range(options.concurrency)))
+
+    async def scheduled_miss():
+        # A comment keeps every run out of the result cache
+        await scheduler.run(PROGRAM + f"// {next(counter)}\n")
+
+    return {
+        "runner.run_code": lambda: runner.run_code(PROGRAM),
+        f"runner.run_code_x{options.concurrency}": concurrent,
+        "scheduler.run_cache_miss": scheduled_miss,
+        "scheduler.run_cache_hit": lambda: scheduler.run(PROGRAM),
+    }
+
+async def service_benchmarks(options) -> Dict[str, Callable[[], Awaitable]]:
+    db = stub_database()
+    catalog = ChallengeCatalog(db)
+    cached = ChallengeService(db, catalog)
+    uncached = ChallengeService(db)
+    submissions = SubmissionService(db)
+    search_index = SearchIndex()
+    for row in CHALLENGES:
+        search_index.add(row["id"], row["title"], row["description"])
+    cursor = encode_cursor((150, CHALLENGES[50]["id"]))
+
+    async def sync(fn, *args):
+        return fn(*args)
+
+    return {
+        "challenge_service.list_catalog": lambda: cached.get_challenges(ChallengeFilters(page=3)),
+        "challenge_service.list_catalog_filtered": lambda: cached.get_challenges(
+            ChallengeFilters(difficulty="medium", category="lists")
+        ),
+        "challenge_service.search_catalog": lambda: cached.get_challenges(ChallengeFilters(search="recur")),
+        "challenge_service.get_catalog": lambda: cached.get_challenge_by_id(CHALLENGES[42]["id"]),
+        "challenge_service.list_db": lambda: uncached.get_challenges(ChallengeFilters(page=3)),
+        "challenge_service.get_db": lambda: uncached.get_challenge_by_id(CHALLENGES[42]["id"]),
+        "submission_service.list": lambda: submissions.get_user_submissions(USER_ID, limit=20),
+        "search_index.search": lambda: sync(search_index.search, "synthetic lis"),
+        "pagination.cursor_roundtrip": lambda: sync(decode_cursor, cursor),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel runs in the concurrent runner benchmark")
+    parser.add_argument("--only", action="append", help="Run benchmarks whose name starts with this, repeatable")
+    parser.add_argument("--real-docker", action="store_true", help="Time DartCodeRunner against the Docker daemon")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    options = parser.parse_args()
+    if options.real_docker:
+        # Real runs take hundreds of milliseconds; keep the suite to minutes
+        options.iterations = min(options.iterations, 50)
+        options.warmup = min(options.warmup, 5)
+
+    benchmarks = {**await runner_benchmarks(options), **await service_benchmarks(options)}
+    results = {
+        "meta": metadata(
+            "micro",
+            iterations=options.iterations,
+            warmup=options.warmup,
+            concurrency=options.concurrency,
+            real_docker=options.real_docker,
+        ),
+        "benchmarks": {},
+    }
+    for name, fn in benchmarks.items():
+        if options.only and not any(name.startswith(prefix) for prefix in options.only):
+            continue
+        results["benchmarks"][name] = await measure(fn, options.iterations, options.warmup)
+    write_results(results, options.output)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+"""Run the API for load tests, optionally against a fake Docker daemon
+
+With ``--fake-docker`` every sandbox run takes ``--run-time`` seconds and
+static analysis is off, which isolates API, queue and pool overhead from
+the Dart VM. ``--fake-hosts N`` spreads those runs over N fake remote
+Docker hosts. Settings still come from the environment (see the bench-api
+target in the Makefile), except that rate limiting is off unless
+RATE_LIMIT_ENABLED says otherwise: the load driver sends every request
+from one address without access tokens, so it would share one small budget.
+"""
+import argparse
+import os
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--fake-docker", action="store_true")
+    parser.add_argument("--run-time", type=float, default=0.2, help="Seconds each fake sandbox run takes")
+    parser.add_argument("--create-time", type=float, default=0.5, help="Seconds each fake container takes to start")
+    parser.add_argument("--fake-hosts", type=int, default=0, help="Fake remote Docker hosts to spread runs over")
+    options = parser.parse_args()
+
+    sys.path.insert(0, BACKEND)
+    # Settings are read at import time, so these have to come first
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    if options.fake_docker:
+        os.environ["ANALYSIS_ENABLED"] = "false"
+        import docker
+        from fake_docker import FakeDockerClient
+        docker.from_env = lambda **kwargs: FakeDockerClient(options.run_time, options.create_time)
+        if options.fake_hosts:
+            os.environ["DOCKER_HOSTS"] = ",".join(
+                f"fake{index}=tcp://fake{index}:2375" for index in range(1, options.fake_hosts + 1)
+            )
+            docker.DockerClient = lambda **kwargs: FakeDockerClient(options.run_time, options.create_time)
+
+    import uvicorn
+    from main import app
+    uvicorn.run(app, host=options.host, port=options.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+-- The parts of Supabase that schema.sql relies on: API roles, auth.users
+-- and auth.uid(). Loaded before schema.sql by docker-compose.yml.
+
+CREATE ROLE anon NOLOGIN;
+CREATE ROLE authenticated NOLOGIN;
+CREATE ROLE service_role NOLOGIN BYPASSRLS;
+CREATE ROLE authenticator LOGIN NOINHERIT PASSWORD 'authenticator';
+GRANT anon, authenticated, service_role TO authenticator;
+
+CREATE SCHEMA auth;
+
+CREATE TABLE auth.users (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    email TEXT,
+    raw_user_meta_data JSONB DEFAULT '{}'::JSONB
+);
+
+-- The user id in the request's JWT, as set by PostgREST
+CREATE FUNCTION auth.uid() RETURNS UUID AS $$
+    SELECT (NULLIF(current_setting('request.jwt.claims', TRUE), '')::JSON->>'sub')::UUID
+$$ LANGUAGE sql STABLE;
+
+GRANT USAGE ON SCHEMA auth TO anon, authenticated, service_role;
+GRANT USAGE ON SCHEMA public TO anon, authenticated, service_role;
+ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT ALL ON TABLES TO anon, authenticated, service_role;
+ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT ALL ON SEQUENCES TO anon, authenticated, service_role;
+ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT EXECUTE ON FUNCTIONS TO anon, authenticated, service_role;
@@ -0,0 +1,39 @@
+-- Benchmark data on top of seed_data.sql: a user with a long submission
+-- history and enough challenges for paging and search to matter.
+
+-- The profile in public.users is created by the on_auth_user_created trigger
+INSERT INTO auth.users (id, email, raw_user_meta_data)
+VALUES ('00000000-0000-4000-8000-000000000001', 'bench@example.com', '{"name": "Benchmark"}');
+
+INSERT INTO public.challenges (
+    title, description, starter_code, is_premium, difficulty, category, sort_order
+)
+SELECT
+    'Benchmark challenge ' || g,
+    'Synthetic challenge ' || g || ' about '
+        || (ARRAY['lists', 'strings', 'widgets', 'classes', 'recursion'])[1 + g % 5]
+        || ' for load testing the catalog.',
+    'void main() {' || E'\n' || '  // Your code here' || E'\n' || '}',
+    g % 4 = 0,
+    (ARRAY['easy', 'medium', 'hard'])[1 + g % 3],
+    (ARRAY['basics', 'strings', 'lists', 'classes', 'algorithms'])[1 + g % 5],
+    100 + g
+FROM generate_series(1, 500) AS g;
+
+-- Resubmissions repeat code, as students do, so code_blobs stays small. Rows go
+-- in oldest first, as they arrive in production, so the progress trigger's
+-- streaks come out right.
+WITH first_challenges AS (
+    SELECT array_agg(id ORDER BY sort_order, id) AS ids
+    FROM (SELECT id, sort_order FROM public.challenges ORDER BY sort_order, id LIMIT 50) AS c
+)
+INSERT INTO public.submissions (user_id, challenge_id, code, result, is_successful, created_at)
+SELECT
+    '00000000-0000-4000-8000-000000000001',
+    first_challenges.ids[1 + g % array_length(first_challenges.ids, 1)],
+    'void main() {' || E'\n' || '  print(' || g % 200 || ');' || E'\n' || '}',
+    jsonb_build_object('success', g % 3 = 0, 'output', (g % 200)::TEXT || E'\n'),
+    g % 3 = 0,
+    NOW() - g * INTERVAL '1 minute'
+FROM generate_series(1, 5000) AS g, first_challenges
+ORDER BY g DESC;
@@ -0,0 +1,23 @@
+-- Checks that every init script ran: `make bench-smoke` runs this against a
+-- freshly created benchmark database.
+
+\set ON_ERROR_STOP on
+
+DO $$
+DECLARE
+    challenge_count BIGINT := (SELECT COUNT(*) FROM public.challenges);
+    submission_count BIGINT := (SELECT COUNT(*) FROM public.submissions);
+    progress public.user_progress;
+BEGIN
+    ASSERT challenge_count >= 500, format('%s challenges, expected the seed plus 500', challenge_count);
+    ASSERT submission_count = 5000, format('%s submissions, expected 5000', submission_count);
+
+    SELECT * INTO STRICT progress FROM public.user_progress
+    WHERE user_id = '00000000-0000-4000-8000-000000000001';
+    ASSERT progress.total_submissions = 5000,
+        format('user_progress counts %s submissions, expected 5000', progress.total_submissions);
+    ASSERT progress.solved_challenges = 50,
+        format('user_progress counts %s solved challenges, expected 50', progress.solved_challenges);
+END $$;
+
+\echo 'bench seed: ok'
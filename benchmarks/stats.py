@@ -0,0 +1,58 @@
+"""Summary statistics and result files shared by the benchmark scripts"""
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+def percentile(sorted_samples: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    if not sorted_samples:
+        return 0.0
+    rank = min(max(math.ceil(fraction * len(sorted_samples)), 1), len(sorted_samples))
+    return sorted_samples[rank - 1]
+
+def summarize(samples: List[float], scale: float = 1.0) -> Dict[str, float]:
+    """p50/p95/p99, mean and max of samples, multiplied by scale (e.g. 1000 for ms)"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    return {
+        "p50": round(percentile(ordered, 0.50) * scale, 3),
+        "p95": round(percentile(ordered, 0.95) * scale, 3),
+        "p99": round(percentile(ordered, 0.99) * scale, 3),
+        "mean": round(sum(ordered) / len(ordered) * scale, 3),
+        "max": round(ordered[-1] * scale, 3),
+    }
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def metadata(kind: str, **options: Any) -> Dict[str, Any]:
+    """What a result file was produced by, so runs can be compared fairly"""
+    return {
+        "kind": kind,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "options": options,
+    }
+
+def write_results(results: Dict[str, Any], output: Optional[str]):
+    """Print results as JSON and also save them to output when given"""
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as f:
+            f.write(text + "\n")
@@ -115,9 +115,46 @@ class Challenge extends Equatable {
   }
 }
 
+/// A challenge as listed by GET /challenges: the summary fields only.
+/// Fetch the full [Challenge] by id to show or solve it.
+@JsonSerializable()
+class ChallengeSummary extends Equatable {
+  final String id;
+  final String title;
+  @JsonKey(name: 'is_premium')
+  final bool isPremium;
+  final DifficultyLevel difficulty;
+  final ChallengeCategory category;
+  @JsonKey(name: 'sort_order')
+  final int sortOrder;
+
+  const ChallengeSummary({
+    required this.id,
+    required this.title,
+    required this.isPremium,
+    required this.difficulty,
+    required this.category,
+    required this.sortOrder,
+  });
+
+  factory ChallengeSummary.fromJson(Map<String, dynamic> json) =>
+      _$ChallengeSummaryFromJson(json);
+  Map<String, dynamic> toJson() => _$ChallengeSummaryToJson(this);
+
+  @override
+  List<Object?> get props => [
+    id,
+    title,
+    isPremium,
+    difficulty,
+    category,
+    sortOrder,
+  ];
+}
+
 @JsonSerializable()
 class ChallengeList extends Equatable {
-  final List<Challenge> challenges;
+  final List<ChallengeSummary> challenges;
   final int total;
   final int page;
   @JsonKey(name: 'per_page')
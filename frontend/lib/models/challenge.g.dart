@@ -52,10 +52,30 @@ const _$ChallengeCategoryEnumMap = {
   ChallengeCategory.animation: 'animation',
 };
 
+ChallengeSummary _$ChallengeSummaryFromJson(Map<String, dynamic> json) =>
+    ChallengeSummary(
+      id: json['id'] as String,
+      title: json['title'] as String,
+      isPremium: json['is_premium'] as bool,
+      difficulty: $enumDecode(_$DifficultyLevelEnumMap, json['difficulty']),
+      category: $enumDecode(_$ChallengeCategoryEnumMap, json['category']),
+      sortOrder: (json['sort_order'] as num).toInt(),
+    );
+
+Map<String, dynamic> _$ChallengeSummaryToJson(ChallengeSummary instance) =>
+    <String, dynamic>{
+      'id': instance.id,
+      'title': instance.title,
+      'is_premium': instance.isPremium,
+      'difficulty': _$DifficultyLevelEnumMap[instance.difficulty]!,
+      'category': _$ChallengeCategoryEnumMap[instance.category]!,
+      'sort_order': instance.sortOrder,
+    };
+
 ChallengeList _$ChallengeListFromJson(Map<String, dynamic> json) =>
     ChallengeList(
       challenges: (json['challenges'] as List<dynamic>)
-          .map((e) => Challenge.fromJson(e as Map<String, dynamic>))
+          .map((e) => ChallengeSummary.fromJson(e as Map<String, dynamic>))
           .toList(),
       total: (json['total'] as num).toInt(),
       page: (json['page'] as num).toInt(),
@@ -85,6 +85,30 @@ class Submission extends Equatable {
   }
 }
 
+/// One page of the current user's submissions, newest first.
+@JsonSerializable()
+class SubmissionPage extends Equatable {
+  final List<Submission> submissions;
+  // Opaque cursors for the older and newer neighbouring pages
+  @JsonKey(name: 'next_cursor')
+  final String? nextCursor;
+  @JsonKey(name: 'prev_cursor')
+  final String? prevCursor;
+
+  const SubmissionPage({
+    required this.submissions,
+    this.nextCursor,
+    this.prevCursor,
+  });
+
+  factory SubmissionPage.fromJson(Map<String, dynamic> json) =>
+      _$SubmissionPageFromJson(json);
+  Map<String, dynamic> toJson() => _$SubmissionPageToJson(this);
+
+  @override
+  List<Object?> get props => [submissions, nextCursor, prevCursor];
+}
+
 @JsonSerializable()
 class CodeExecutionRequest extends Equatable {
   final String challengeId;
@@ -40,6 +40,22 @@ const _$SubmissionStatusEnumMap = {
   SubmissionStatus.error: 'error',
 };
 
+SubmissionPage _$SubmissionPageFromJson(Map<String, dynamic> json) =>
+    SubmissionPage(
+      submissions: (json['submissions'] as List<dynamic>)
+          .map((e) => Submission.fromJson(e as Map<String, dynamic>))
+          .toList(),
+      nextCursor: json['next_cursor'] as String?,
+      prevCursor: json['prev_cursor'] as String?,
+    );
+
+Map<String, dynamic> _$SubmissionPageToJson(SubmissionPage instance) =>
+    <String, dynamic>{
+      'submissions': instance.submissions,
+      'next_cursor': instance.nextCursor,
+      'prev_cursor': instance.prevCursor,
+    };
+
 CodeExecutionRequest _$CodeExecutionRequestFromJson(
   Map<String, dynamic> json,
 ) => CodeExecutionRequest(
@@ -80,6 +80,22 @@ class UserProgress extends Equatable {
 
   factory UserProgress.fromJson(Map<String, dynamic> json) =>
       _$UserProgressFromJson(json);
+
+  /// Reads the `/submissions/stats` response, which the database keeps up
+  /// to date as submissions arrive.
+  factory UserProgress.fromSubmissionStats(Map<String, dynamic> json) {
+    final solved = json['solved_by_difficulty'] as Map<String, dynamic>? ?? {};
+    final lastActive = json['last_active_date'] as String?;
+    return UserProgress(
+      userId: json['user_id'] as String,
+      totalChallengesSolved: (json['solved_challenges'] as num?)?.toInt() ?? 0,
+      easyChallengesSolved: (solved['easy'] as num?)?.toInt() ?? 0,
+      mediumChallengesSolved: (solved['medium'] as num?)?.toInt() ?? 0,
+      hardChallengesSolved: (solved['hard'] as num?)?.toInt() ?? 0,
+      streakDays: (json['current_streak'] as num?)?.toInt() ?? 0,
+      lastSubmissionAt: lastActive == null ? null : DateTime.parse(lastActive),
+    );
+  }
   Map<String, dynamic> toJson() => _$UserProgressToJson(this);
 
   @override
@@ -55,14 +55,9 @@ final userProgressProvider = FutureProvider<UserProgress>((ref) async {
     );
   }
 
-  // Get user progress from API
-  try {
-    final apiService = ref.watch(apiServiceProvider);
-    return await apiService.getUserProgress(user.id);
-  } catch (e) {
-    // Fallback to calculating from submissions
-    return await _calculateProgressFromSubmissions(ref, user.id);
-  }
+  // Solved counts and streaks are kept up to date by the database
+  final apiService = ref.watch(apiServiceProvider);
+  return apiService.getSubmissionStats();
 });
 
 // Progress persistence notifier
@@ -132,71 +127,3 @@ class ProgressPersistenceNotifier extends StateNotifier<AsyncValue<void>> {
     }
   }
 }
-
-// Helper function to calculate progress from submissions
-Future<UserProgress> _calculateProgressFromSubmissions(
-  Ref ref,
-  String userId,
-) async {
-  try {
-    final apiService = ref.read(apiServiceProvider);
-    final submissions = await apiService.getSubmissions(userId: userId);
-
-    final successfulSubmissions = submissions.where(
-      (s) => s.status == SubmissionStatus.passed,
-    );
-    final challengeIds = successfulSubmissions
-        .map((s) => s.challengeId)
-        .toSet();
-
-    // For now, return basic stats - could be enhanced to calculate by difficulty
-    return UserProgress(
-      userId: userId,
-      totalChallengesSolved: challengeIds.length,
-      easyChallengesSolved: challengeIds.length, // Simplified for now
-      mediumChallengesSolved: 0,
-      hardChallengesSolved: 0,
-      streakDays: _calculateStreak(submissions),
-      lastSubmissionAt: submissions.isNotEmpty
-          ? submissions.first.createdAt
-          : null,
-    );
-  } catch (e) {
-    return UserProgress(
-      userId: userId,
-      totalChallengesSolved: 0,
-      easyChallengesSolved: 0,
-      mediumChallengesSolved: 0,
-      hardChallengesSolved: 0,
-      streakDays: 0,
-    );
-  }
-}
-
-int _calculateStreak(List<Submission> submissions) {
-  if (submissions.isEmpty) return 0;
-
-  final now = DateTime.now();
-  final today = DateTime(now.year, now.month, now.day);
-  int streak = 0;
-
-  // Group submissions by date
-  final submissionsByDate = <DateTime, List<Submission>>{};
-  for (final submission in submissions) {
-    final date = DateTime(
-      submission.createdAt.year,
-      submission.createdAt.month,
-      submission.createdAt.day,
-    );
-    submissionsByDate.putIfAbsent(date, () => []).add(submission);
-  }
-
-  // Calculate streak from today backwards
-  var currentDate = today;
-  while (submissionsByDate.containsKey(currentDate)) {
-    streak++;
-    currentDate = currentDate.subtract(const Duration(days: 1));
-  }
-
-  return streak;
-}
@@ -293,7 +293,7 @@ class _ChallengeListScreenState extends ConsumerState<ChallengeListScreen> {
     );
   }
 
-  Widget _buildChallengeCard(Challenge challenge) {
+  Widget _buildChallengeCard(ChallengeSummary challenge) {
     return Card(
       margin: const EdgeInsets.only(bottom: 12),
       child: InkWell(
@@ -340,17 +340,6 @@ class _ChallengeListScreenState extends ConsumerState<ChallengeListScreen> {
                   fontWeight: FontWeight.bold,
                 ),
               ),
-              const SizedBox(height: 8),
-
-              // Description preview
-              Text(
-                challenge.description.length > 120 
-                  ? '${challenge.description.substring(0, 120)}...'
-                  : challenge.description,
-                style: Theme.of(context).textTheme.bodyMedium,
-                maxLines: 3,
-                overflow: TextOverflow.ellipsis,
-              ),
               const SizedBox(height: 12),
 
               // Footer
@@ -19,6 +19,8 @@ class ApiService {
       );
 
   // Challenge endpoints
+
+  /// Lists challenge summaries; use [getChallenge] for the full challenge.
   Future<ChallengeList> getChallenges({
     DifficultyLevel? difficulty,
     ChallengeCategory? category,
@@ -28,7 +30,10 @@ class ApiService {
     int perPage = 10,
   }) async {
     try {
-      final queryParams = <String, dynamic>{'page': page, 'per_page': perPage};
+      final queryParams = <String, dynamic>{
+        'page': page,
+        'per_page': perPage,
+      };
 
       if (difficulty != null) queryParams['difficulty'] = difficulty.name;
       if (category != null) queryParams['category'] = category.name;
@@ -87,30 +92,60 @@ class ApiService {
   }
 
   // Submission endpoints
-  Future<List<Submission>> getSubmissions({
+
+  /// Fetches one page of the current user's submissions, newest first.
+  /// Pass a page's [SubmissionPage.nextCursor] as [cursor] for the next one.
+  Future<SubmissionPage> getSubmissionPage({
     String? challengeId,
-    String? userId,
-    int page = 1,
-    int perPage = 10,
+    String? cursor,
+    int limit = 20,
   }) async {
     try {
-      final queryParams = <String, dynamic>{'page': page, 'per_page': perPage};
+      final queryParams = <String, dynamic>{
+        'limit': limit,
+        // Code is left out of submission listings unless asked for
+        'include_code': true,
+      };
 
       if (challengeId != null) queryParams['challenge_id'] = challengeId;
-      if (userId != null) queryParams['user_id'] = userId;
+      if (cursor != null) queryParams['cursor'] = cursor;
 
       final response = await _dio.get(
         '/submissions',
         queryParameters: queryParams,
       );
-      final List<dynamic> submissionsJson =
-          response.data['submissions'] ?? response.data;
-      return submissionsJson.map((json) => Submission.fromJson(json)).toList();
+      return SubmissionPage.fromJson(response.data);
     } on DioException catch (e) {
       throw ApiException('Failed to fetch submissions: ${e.message}');
     }
   }
 
+  /// Fetches all of the current user's submissions, following page cursors.
+  Future<List<Submission>> getSubmissions({String? challengeId}) async {
+    final submissions = <Submission>[];
+    String? cursor;
+    do {
+      final page = await getSubmissionPage(
+        challengeId: challengeId,
+        cursor: cursor,
+        limit: 100,
+      );
+      submissions.addAll(page.submissions);
+      cursor = page.nextCursor;
+    } while (cursor != null);
+    return submissions;
+  }
+
+  /// Fetches the current user's solved counts and streak.
+  Future<UserProgress> getSubmissionStats() async {
+    try {
+      final response = await _dio.get('/submissions/stats');
+      return UserProgress.fromSubmissionStats(response.data);
+    } on DioException catch (e) {
+      throw ApiException('Failed to fetch submission stats: ${e.message}');
+    }
+  }
+
   Future<Submission> getSubmission(String submissionId) async {
     try {
       final response = await _dio.get('/submissions/$submissionId');
@@ -61,16 +61,19 @@ class SupabaseService {
   Future<Map<String, dynamic>?> getLatestSubmission(String challengeId) async {
     if (currentUser == null) return null;
 
+    // Submissions only keep a hash; the code itself lives in code_blobs
     final response = await _client
         .from('submissions')
-        .select()
+        .select('*, blob:code_blobs(code)')
         .eq('challenge_id', challengeId)
         .eq('user_id', currentUser!.id)
         .order('created_at', ascending: false)
         .limit(1)
         .maybeSingle();
+    if (response == null) return null;
 
-    return response;
+    final blob = response.remove('blob') as Map<String, dynamic>?;
+    return {...response, 'code': blob?['code']};
   }
 
   Future<void> submitFeedback({
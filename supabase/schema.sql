@@ -23,7 +23,19 @@ CREATE TABLE public.challenges (
     category TEXT DEFAULT 'general',
     sort_order INTEGER DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    -- Full-text search over titles (ranked higher) and descriptions
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(title, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(description, '')), 'B')
+    ) STORED
+);
+
+-- Submitted code, stored once per SHA-256 of its UTF-8 text
+CREATE TABLE public.code_blobs (
+    hash TEXT PRIMARY KEY,
+    code TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
 -- Submissions table
@@ -31,12 +43,50 @@ CREATE TABLE public.submissions (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
     user_id UUID REFERENCES public.users(id) ON DELETE CASCADE NOT NULL,
     challenge_id UUID REFERENCES public.challenges(id) ON DELETE CASCADE NOT NULL,
-    code TEXT NOT NULL,
+    code_hash TEXT REFERENCES public.code_blobs(hash) NOT NULL,
+    -- Write-only: store_submission_code moves it into code_blobs on insert
+    code TEXT,
     result JSONB,
     is_successful BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Submissions the API accepted but the database refused to store (e.g. an
+-- unknown user or challenge), kept as sent so they can be inspected or replayed
+CREATE TABLE public.submission_dead_letters (
+    submission_id UUID PRIMARY KEY,
+    payload JSONB NOT NULL,
+    error_code TEXT,
+    error_message TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Per-user progress, maintained by a trigger on submissions
+CREATE TABLE public.user_progress (
+    user_id UUID REFERENCES public.users(id) ON DELETE CASCADE PRIMARY KEY,
+    total_submissions INTEGER NOT NULL DEFAULT 0,
+    successful_submissions INTEGER NOT NULL DEFAULT 0,
+    solved_challenges INTEGER NOT NULL DEFAULT 0,
+    solved_easy INTEGER NOT NULL DEFAULT 0,
+    solved_medium INTEGER NOT NULL DEFAULT 0,
+    solved_hard INTEGER NOT NULL DEFAULT 0,
+    -- Consecutive UTC days with at least one submission
+    current_streak INTEGER NOT NULL DEFAULT 0,
+    longest_streak INTEGER NOT NULL DEFAULT 0,
+    last_active_date DATE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Per-user, per-challenge progress, maintained by the same trigger
+CREATE TABLE public.user_challenge_progress (
+    user_id UUID REFERENCES public.users(id) ON DELETE CASCADE NOT NULL,
+    challenge_id UUID REFERENCES public.challenges(id) ON DELETE CASCADE NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    solved_at TIMESTAMP WITH TIME ZONE,
+    last_attempt_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (user_id, challenge_id)
+);
+
 -- Feedback table
 CREATE TABLE public.feedback (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
@@ -47,20 +97,40 @@ CREATE TABLE public.feedback (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Catalog version, bumped on every change to challenges so API workers
+-- know when their in-memory copy of the catalog is stale
+CREATE TABLE public.catalog_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO public.catalog_version DEFAULT VALUES;
+
 -- Create indexes for better performance
 CREATE INDEX idx_users_email ON public.users(email);
 CREATE INDEX idx_challenges_difficulty ON public.challenges(difficulty);
 CREATE INDEX idx_challenges_category ON public.challenges(category);
 CREATE INDEX idx_challenges_premium ON public.challenges(is_premium);
+CREATE INDEX idx_challenges_sort_order ON public.challenges(sort_order, id);
+CREATE INDEX idx_challenges_search ON public.challenges USING GIN (search_vector);
 CREATE INDEX idx_submissions_user_challenge ON public.submissions(user_id, challenge_id);
 CREATE INDEX idx_submissions_created_at ON public.submissions(created_at);
+CREATE INDEX idx_submissions_user_created ON public.submissions(user_id, created_at DESC, id DESC);
+CREATE INDEX idx_submissions_code_hash ON public.submissions(code_hash, challenge_id, user_id, created_at DESC);
 CREATE INDEX idx_feedback_challenge ON public.feedback(challenge_id);
 
 -- Enable Row Level Security
 ALTER TABLE public.users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.challenges ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.submissions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.code_blobs ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.feedback ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.catalog_version ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.user_progress ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.user_challenge_progress ENABLE ROW LEVEL SECURITY;
+-- No policies: only the service role reads or writes dead letters
+ALTER TABLE public.submission_dead_letters ENABLE ROW LEVEL SECURITY;
 
 -- RLS Policies
 
@@ -83,6 +153,9 @@ CREATE POLICY "Pro users can view premium challenges" ON public.challenges
         )
     );
 
+CREATE POLICY "Anyone can view the catalog version" ON public.catalog_version
+    FOR SELECT USING (TRUE);
+
 -- Submissions are private to the user
 CREATE POLICY "Users can view own submissions" ON public.submissions
     FOR SELECT USING (auth.uid() = user_id);
@@ -93,6 +166,22 @@ CREATE POLICY "Users can insert own submissions" ON public.submissions
 CREATE POLICY "Users can update own submissions" ON public.submissions
     FOR UPDATE USING (auth.uid() = user_id);
 
+-- Code is visible to the users who submitted it
+CREATE POLICY "Users can view own code" ON public.code_blobs
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM public.submissions s
+            WHERE s.code_hash = code_blobs.hash AND s.user_id = auth.uid()
+        )
+    );
+
+-- Progress is private to the user
+CREATE POLICY "Users can view own progress" ON public.user_progress
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can view own challenge progress" ON public.user_challenge_progress
+    FOR SELECT USING (auth.uid() = user_id);
+
 -- Feedback is private to the user
 CREATE POLICY "Users can view own feedback" ON public.feedback
     FOR SELECT USING (auth.uid() = user_id);
@@ -137,14 +226,61 @@ RETURNS TABLE (
 ) AS $$
 BEGIN
     RETURN QUERY
-    SELECT s.id, s.code, s.result, s.is_successful, s.created_at
+    SELECT s.id, b.code, s.result, s.is_successful, s.created_at
     FROM public.submissions s
+    JOIN public.code_blobs b ON b.hash = s.code_hash
     WHERE s.user_id = p_user_id AND s.challenge_id = p_challenge_id
     ORDER BY s.created_at DESC
     LIMIT 1;
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
 
+-- Function to count challenges by difficulty, category and premium status in one pass
+CREATE OR REPLACE FUNCTION public.get_challenge_statistics()
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'total_challenges', COUNT(*),
+        'difficulty_breakdown', jsonb_build_object(
+            'easy', COUNT(*) FILTER (WHERE difficulty = 'easy'),
+            'medium', COUNT(*) FILTER (WHERE difficulty = 'medium'),
+            'hard', COUNT(*) FILTER (WHERE difficulty = 'hard')
+        ),
+        'category_breakdown', COALESCE((
+            SELECT jsonb_object_agg(category, total)
+            FROM (
+                SELECT COALESCE(category, 'general') AS category, COUNT(*) AS total
+                FROM public.challenges
+                GROUP BY 1
+            ) categories
+        ), '{}'::jsonb),
+        'premium_count', COUNT(*) FILTER (WHERE is_premium),
+        'free_count', COUNT(*) FILTER (WHERE is_premium IS NOT TRUE)
+    )
+    FROM public.challenges;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- One page of the challenges matching a full-text query, most relevant first
+-- (title words weigh more than description words), ties in catalog order.
+-- Used for ?search= when the API's in-memory catalog is off.
+CREATE OR REPLACE FUNCTION public.search_challenges(
+    search_query TEXT,
+    filter_difficulty TEXT DEFAULT NULL,
+    filter_category TEXT DEFAULT NULL,
+    filter_premium BOOLEAN DEFAULT NULL,
+    page_limit INTEGER DEFAULT 10,
+    page_offset INTEGER DEFAULT 0
+)
+RETURNS SETOF public.challenges AS $$
+    SELECT c.*
+    FROM public.challenges c, to_tsquery('english', search_query) q
+    WHERE c.search_vector @@ q
+      AND (filter_difficulty IS NULL OR c.difficulty = filter_difficulty)
+      AND (filter_category IS NULL OR c.category = filter_category)
+      AND (filter_premium IS NULL OR c.is_premium = filter_premium)
+    ORDER BY ts_rank(c.search_vector, q) DESC, c.sort_order, c.id
+    LIMIT page_limit OFFSET page_offset;
+$$ LANGUAGE sql STABLE;
+
 -- Triggers
 
 -- Trigger to create user profile on signup
@@ -167,4 +303,135 @@ CREATE TRIGGER update_users_updated_at
 
 CREATE TRIGGER update_challenges_updated_at
     BEFORE UPDATE ON public.challenges
-    FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
\ No newline at end of file
+    FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column();
+
+-- Bump the catalog version whenever challenges change
+CREATE OR REPLACE FUNCTION public.bump_catalog_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE public.catalog_version SET version = version + 1, updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE TRIGGER bump_catalog_version_on_challenges
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.challenges
+    FOR EACH STATEMENT EXECUTE FUNCTION public.bump_catalog_version();
+
+-- Store submitted code in code_blobs and keep only its hash on the submission
+CREATE OR REPLACE FUNCTION public.store_submission_code()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.code IS NOT NULL THEN
+        NEW.code_hash := encode(sha256(convert_to(NEW.code, 'UTF8')), 'hex');
+        INSERT INTO public.code_blobs (hash, code)
+        VALUES (NEW.code_hash, NEW.code)
+        ON CONFLICT (hash) DO NOTHING;
+        NEW.code := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE TRIGGER store_submission_code_on_write
+    BEFORE INSERT OR UPDATE OF code ON public.submissions
+    FOR EACH ROW EXECUTE FUNCTION public.store_submission_code();
+
+-- Give an ungraded submission the grading of the latest graded submission of
+-- the same code to the same challenge by the same user (rows earlier in the
+-- same INSERT count). Clients can send a result, so a grading is never taken
+-- from another user's submission.
+CREATE OR REPLACE FUNCTION public.reuse_submission_grading()
+RETURNS TRIGGER AS $$
+DECLARE
+    graded RECORD;
+BEGIN
+    IF NEW.result IS NULL THEN
+        SELECT s.result, s.is_successful INTO graded
+        FROM public.submissions s
+        WHERE s.code_hash = NEW.code_hash
+          AND s.challenge_id = NEW.challenge_id
+          AND s.user_id = NEW.user_id
+          AND s.result IS NOT NULL
+        ORDER BY s.created_at DESC
+        LIMIT 1;
+        IF FOUND THEN
+            NEW.result := graded.result;
+            NEW.is_successful := graded.is_successful;
+        END IF;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Named to fire after store_submission_code_on_write (triggers run in name
+-- order), which sets code_hash
+CREATE TRIGGER submission_grading_on_insert
+    BEFORE INSERT ON public.submissions
+    FOR EACH ROW EXECUTE FUNCTION public.reuse_submission_grading();
+
+-- Keep user_progress and user_challenge_progress up to date as submissions arrive
+CREATE OR REPLACE FUNCTION public.record_submission_progress()
+RETURNS TRIGGER AS $$
+DECLARE
+    newly_solved BOOLEAN := FALSE;
+    solved_difficulty TEXT;
+    active_date DATE := (NEW.created_at AT TIME ZONE 'UTC')::DATE;
+BEGIN
+    INSERT INTO public.user_challenge_progress AS p (user_id, challenge_id, attempts, last_attempt_at)
+    VALUES (NEW.user_id, NEW.challenge_id, 1, NEW.created_at)
+    ON CONFLICT (user_id, challenge_id) DO UPDATE
+        SET attempts = p.attempts + 1,
+            last_attempt_at = GREATEST(p.last_attempt_at, EXCLUDED.last_attempt_at);
+
+    IF NEW.is_successful THEN
+        UPDATE public.user_challenge_progress
+        SET solved_at = NEW.created_at
+        WHERE user_id = NEW.user_id AND challenge_id = NEW.challenge_id AND solved_at IS NULL;
+        newly_solved := FOUND;
+    END IF;
+
+    IF newly_solved THEN
+        SELECT difficulty INTO solved_difficulty FROM public.challenges WHERE id = NEW.challenge_id;
+    END IF;
+
+    INSERT INTO public.user_progress AS p (
+        user_id, total_submissions, successful_submissions, solved_challenges,
+        solved_easy, solved_medium, solved_hard,
+        current_streak, longest_streak, last_active_date
+    )
+    -- solved_difficulty is NULL unless this is a first solve, and NOT NULL is
+    -- checked on these values before ON CONFLICT, so default every flag to 0
+    VALUES (
+        NEW.user_id, 1, COALESCE(NEW.is_successful, FALSE)::INTEGER, newly_solved::INTEGER,
+        COALESCE((solved_difficulty = 'easy')::INTEGER, 0),
+        COALESCE((solved_difficulty = 'medium')::INTEGER, 0),
+        COALESCE((solved_difficulty = 'hard')::INTEGER, 0),
+        1, 1, active_date
+    )
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_submissions = p.total_submissions + 1,
+        successful_submissions = p.successful_submissions + EXCLUDED.successful_submissions,
+        solved_challenges = p.solved_challenges + EXCLUDED.solved_challenges,
+        solved_easy = p.solved_easy + EXCLUDED.solved_easy,
+        solved_medium = p.solved_medium + EXCLUDED.solved_medium,
+        solved_hard = p.solved_hard + EXCLUDED.solved_hard,
+        current_streak = CASE
+            WHEN EXCLUDED.last_active_date = p.last_active_date + 1 THEN p.current_streak + 1
+            WHEN p.last_active_date IS NULL OR EXCLUDED.last_active_date > p.last_active_date + 1 THEN 1
+            ELSE p.current_streak
+        END,
+        longest_streak = GREATEST(p.longest_streak, CASE
+            WHEN EXCLUDED.last_active_date = p.last_active_date + 1 THEN p.current_streak + 1
+            ELSE 1
+        END),
+        last_active_date = GREATEST(p.last_active_date, EXCLUDED.last_active_date),
+        updated_at = NOW();
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE TRIGGER record_submission_progress_on_insert
+    AFTER INSERT ON public.submissions
+    FOR EACH ROW EXECUTE FUNCTION public.record_submission_progress();
@@ -0,0 +1,63 @@
+-- Checks reuse_submission_grading: an ungraded submission of code the same
+-- user had graded before for the same challenge takes that grading, including
+-- from a row earlier in the same INSERT, and another user's (possibly forged)
+-- grading is never taken. Rolled back like the other checks.
+
+\set ON_ERROR_STOP on
+
+BEGIN;
+
+INSERT INTO auth.users (id, email)
+VALUES ('00000000-0000-4000-8000-00000000f002', 'grading-test@example.com'),
+       ('00000000-0000-4000-8000-00000000f003', 'grading-forger@example.com');
+
+INSERT INTO public.challenges (id, title, description, starter_code, difficulty)
+VALUES ('00000000-0000-4000-8000-00000000c002', 'Grading test', 'Test', 'void main() {}', 'easy'),
+       ('00000000-0000-4000-8000-00000000c003', 'Other challenge', 'Test', 'void main() {}', 'easy');
+
+INSERT INTO public.submissions (id, user_id, challenge_id, code, result, is_successful, created_at)
+VALUES ('00000000-0000-4000-8000-0000000a0001', '00000000-0000-4000-8000-00000000f002',
+        '00000000-0000-4000-8000-00000000c002', 'void main() { print(1); }',
+        '{"success": true}', TRUE, '2024-01-01 10:00:00+00'),
+       -- Same code in the same statement, without a result
+       ('00000000-0000-4000-8000-0000000a0002', '00000000-0000-4000-8000-00000000f002',
+        '00000000-0000-4000-8000-00000000c002', 'void main() { print(1); }',
+        NULL, FALSE, '2024-01-01 10:01:00+00');
+
+-- Another user posts a passing grading of other code, then this user submits it
+INSERT INTO public.submissions (id, user_id, challenge_id, code, result, is_successful, created_at)
+VALUES ('00000000-0000-4000-8000-0000000a0005', '00000000-0000-4000-8000-00000000f003',
+        '00000000-0000-4000-8000-00000000c002', 'void main() { print(2); }',
+        '{"success": true}', TRUE, '2024-01-01 11:00:00+00');
+INSERT INTO public.submissions (id, user_id, challenge_id, code, created_at)
+VALUES ('00000000-0000-4000-8000-0000000a0006', '00000000-0000-4000-8000-00000000f002',
+        '00000000-0000-4000-8000-00000000c002', 'void main() { print(2); }', '2024-01-01 12:00:00+00');
+
+-- Later, in separate statements: the same code again, and to another challenge
+INSERT INTO public.submissions (id, user_id, challenge_id, code, created_at)
+VALUES ('00000000-0000-4000-8000-0000000a0003', '00000000-0000-4000-8000-00000000f002',
+        '00000000-0000-4000-8000-00000000c002', 'void main() { print(1); }', '2024-01-02 10:00:00+00');
+INSERT INTO public.submissions (id, user_id, challenge_id, code, created_at)
+VALUES ('00000000-0000-4000-8000-0000000a0004', '00000000-0000-4000-8000-00000000f002',
+        '00000000-0000-4000-8000-00000000c003', 'void main() { print(1); }', '2024-01-02 10:00:00+00');
+
+DO $$
+DECLARE s public.submissions;
+BEGIN
+    FOR s IN SELECT * FROM public.submissions
+             WHERE id IN ('00000000-0000-4000-8000-0000000a0002', '00000000-0000-4000-8000-0000000a0003')
+    LOOP
+        ASSERT s.result = '{"success": true}' AND s.is_successful,
+            format('submission %s did not reuse the grading: %s', s.id, s.result);
+    END LOOP;
+
+    SELECT * INTO STRICT s FROM public.submissions WHERE id = '00000000-0000-4000-8000-0000000a0004';
+    ASSERT s.result IS NULL AND NOT s.is_successful, 'grading reused across challenges';
+
+    SELECT * INTO STRICT s FROM public.submissions WHERE id = '00000000-0000-4000-8000-0000000a0006';
+    ASSERT s.result IS NULL AND NOT s.is_successful, 'grading reused across users';
+END $$;
+
+\echo 'submission_grading: ok'
+
+ROLLBACK;
@@ -0,0 +1,67 @@
+-- Checks record_submission_progress against a database loaded with schema.sql:
+-- failed submissions, a first solve and a repeat solve. Runs in a transaction
+-- that is rolled back, so it leaves no data behind. `make test-db` runs it
+-- against the benchmark database; any failed check aborts with an error.
+
+\set ON_ERROR_STOP on
+
+BEGIN;
+
+INSERT INTO auth.users (id, email)
+VALUES ('00000000-0000-4000-8000-00000000f001', 'progress-test@example.com');
+
+INSERT INTO public.challenges (id, title, description, starter_code, difficulty)
+VALUES ('00000000-0000-4000-8000-00000000c001', 'Progress test', 'Test', 'void main() {}', 'medium');
+
+-- A user's first submission fails
+INSERT INTO public.submissions (user_id, challenge_id, code, is_successful, created_at)
+VALUES ('00000000-0000-4000-8000-00000000f001', '00000000-0000-4000-8000-00000000c001',
+        'void main() { fail(); }', FALSE, '2024-01-01 10:00:00+00');
+
+DO $$
+DECLARE p public.user_progress;
+BEGIN
+    SELECT * INTO STRICT p FROM public.user_progress WHERE user_id = '00000000-0000-4000-8000-00000000f001';
+    ASSERT p.total_submissions = 1 AND p.successful_submissions = 0 AND p.solved_challenges = 0,
+        'failed first submission counted wrongly';
+    ASSERT p.solved_easy = 0 AND p.solved_medium = 0 AND p.solved_hard = 0,
+        'failed first submission counted as solved';
+END $$;
+
+-- Another failure, then the first solve the next day
+INSERT INTO public.submissions (user_id, challenge_id, code, is_successful, created_at)
+VALUES ('00000000-0000-4000-8000-00000000f001', '00000000-0000-4000-8000-00000000c001',
+        'void main() { fail(); }', FALSE, '2024-01-01 11:00:00+00'),
+       ('00000000-0000-4000-8000-00000000f001', '00000000-0000-4000-8000-00000000c001',
+        'void main() {}', TRUE, '2024-01-02 09:00:00+00');
+
+-- Solving it again changes nothing but the submission counts
+INSERT INTO public.submissions (user_id, challenge_id, code, is_successful, created_at)
+VALUES ('00000000-0000-4000-8000-00000000f001', '00000000-0000-4000-8000-00000000c001',
+        'void main() {}', TRUE, '2024-01-02 10:00:00+00');
+
+DO $$
+DECLARE
+    p public.user_progress;
+    c public.user_challenge_progress;
+BEGIN
+    SELECT * INTO STRICT p FROM public.user_progress WHERE user_id = '00000000-0000-4000-8000-00000000f001';
+    ASSERT p.total_submissions = 4, format('total_submissions is %s, not 4', p.total_submissions);
+    ASSERT p.successful_submissions = 2, format('successful_submissions is %s, not 2', p.successful_submissions);
+    ASSERT p.solved_challenges = 1, format('solved_challenges is %s, not 1', p.solved_challenges);
+    ASSERT p.solved_easy = 0 AND p.solved_medium = 1 AND p.solved_hard = 0,
+        format('solved by difficulty is %s/%s/%s, not 0/1/0', p.solved_easy, p.solved_medium, p.solved_hard);
+    ASSERT p.current_streak = 2 AND p.longest_streak = 2,
+        format('streak is %s (longest %s), not 2', p.current_streak, p.longest_streak);
+    ASSERT p.last_active_date = '2024-01-02', format('last_active_date is %s', p.last_active_date);
+
+    SELECT * INTO STRICT c FROM public.user_challenge_progress
+    WHERE user_id = '00000000-0000-4000-8000-00000000f001'
+      AND challenge_id = '00000000-0000-4000-8000-00000000c001';
+    ASSERT c.attempts = 4, format('attempts is %s, not 4', c.attempts);
+    ASSERT c.solved_at = '2024-01-02 09:00:00+00', format('solved_at is %s', c.solved_at);
+END $$;
+
+\echo 'submission_progress: ok'
+
+ROLLBACK;